@@ -3,13 +3,18 @@
 """
 Usage:
 
-  get_xs.py SAMPLE [SAMPLE [SAMPLE ...]]
+  get_xs.py [--as-of=TIME] SAMPLE [SAMPLE [SAMPLE ...]]
 
 Print the cross sections for a list of samples.
 The output is sent to STDOUT, and separated by newlines.
 
+With --as-of, print the cross sections as they were at TIME instead,
+which is given as 'YYYY-MM-DD HH:MM:SS' or 'YYYY-MM-DD' for the start of a day.
+
 By default, the my.cnf configuration file is a centrally maintained one.
 To point to your own file, set the environment variable $XSECCONF to the location.
+To print a profile of the time spent on the database to STDERR, set $XSECPROFILE=1.
+To read from a snapshot made by xs_snapshot.py instead of the database, set $XSECSNAPSHOT to its location.
 
 Also by default, the samples are read off of the 13 TeV table.
 To change energies, set the environment variable $ENERGY to something different.
@@ -17,6 +22,7 @@ To change energies, set the environment variable $ENERGY to something different.
 Example:
 
   XSECCONF=$HOME/my.cnf ENERGY=8 get_xs.py sample_i_definitely_stored_elsewhere
+  get_xs.py --as-of='2017-06-01 12:00:00' WJetsToLNu_TuneCUETP8M1_13TeV-amcatnloFXFX-pythia8
 
 Author:
 
@@ -26,17 +32,32 @@ Author:
 import os
 import sys
 
+from CrossSecDB.asof import parse_time
 from CrossSecDB.reader import get_xsec
 
 if __name__ == '__main__':
 
-    if len(sys.argv) == 1 or sys.argv[1] in ['-h', '--help']:
+    options = {}
+    while len(sys.argv) > 1 and sys.argv[1].startswith('--'):
+        flag = sys.argv.pop(1).split('=')
+        options[flag[0]] = '='.join(flag[1:])
+
+    if len(sys.argv) == 1 or sys.argv[1] == '-h' or '--help' in options:
         print __doc__
         exit(0)
 
     energy = int(os.environ.get('ENERGY', 13))
 
-    output = get_xsec(sys.argv[1:], energy=energy)
+    as_of = options.get('--as-of') or None
+    if as_of is not None:
+        try:
+            as_of = parse_time(as_of)
+        except ValueError as err:
+            print err
+            print __doc__
+            exit(1)
+
+    output = get_xsec(sys.argv[1:], energy=energy, as_of=as_of)
 
     if isinstance(output, list):
         for xs in output:
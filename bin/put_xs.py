@@ -3,7 +3,8 @@
 """
 Usage:
 
-  put_xs.py [--comments=COMMENTS] SOURCE SAMPLE XSEC [SAMPLE XSEC [SAMPLE XSEC]]]
+  put_xs.py [--comments=COMMENTS] [--no-email] SOURCE SAMPLE XSEC [SAMPLE XSEC [SAMPLE XSEC]]]
+  put_xs.py --file=FILE [--format=FORMAT] [--chunk-size=N] [--dry-run] [--no-email] [--comments=COMMENTS] [SOURCE]
 
 Put the cross sections for a sample or list of samples into the central database.
 The comments flag is optional. The SOURCE parameter is not.
@@ -11,8 +12,23 @@ Remeber that arguments with spaces should be in quotes.
 
 To add a sample with uncertainties, place a '+-' inside of the XSEC argument.
 
+To load many cross sections at once, give a file with the --file flag, or '-' for STDIN.
+Each row of the file has a sample, cross section, uncertainty, source, and comments,
+in that order. Everything after the cross section is optional,
+and SOURCE and COMMENTS from the command line are used for rows without them.
+FORMAT can be 'csv', 'tsv', or 'jsonl'. By default, it is guessed from the file extension.
+JSON lines are objects with the keys 'sample', 'cross_section', 'uncertainty', 'source', and 'comments'.
+Every row is checked before anything is written, so the file is read twice.
+STDIN is copied to a temporary file for this, instead of being held in memory.
+Rows are then written in chunks of N (default 1000), each in its own transaction.
+If a chunk fails, the number of rows already committed is printed, so the load can be resumed.
+With --dry-run, the file is only checked.
+A single email is sent for the whole file.
+With --no-email, no email is sent about the new cross sections, with or without a file.
+
 By default, the my.cnf configuration file is a centrally maintained one.
 To point to your own file, set the environment variable $XSECCONF to the location.
+To print a profile of the time spent on the database to STDERR, set $XSECPROFILE=1.
 
 Also by default, the samples are read off of the 13 TeV table.
 To change energies, set the environment variable $ENERGY to something different.
@@ -21,6 +37,7 @@ Examples:
 
   put_xs.py "Source is uncertain" example_sample 10.0 example_with_uncertainty 10.0+-2.0
   XSECCONF=$HOME/my.cnf ENERGY=8 put_xs.py --comments="This is old, I know" "My memory" sample_i_want_to_store_elsewhere 0.5
+  put_xs.py --file=campaign.csv --chunk-size=5000 "Campaign summary table"
 
 Author:
 
@@ -29,18 +46,109 @@ Author:
 
 import os
 import sys
+import shutil
+import tempfile
 
 from CrossSecDB.inserter import put_xsec
+from CrossSecDB import bulk
+from CrossSecDB import notify
+
+
+def load_file(file_name, fmt, chunk_size, dry_run, no_email, source, comments, energy):
+    """
+    Load a file of cross sections into the database and report the timing.
+    """
+
+    fmt = fmt or bulk.guess_format(file_name)
+
+    # The file is read once to check it, and again to write it, so it is never all in memory.
+    # STDIN can only be read once, so it is copied to a temporary file first.
+    if file_name == '-':
+        stream = tempfile.TemporaryFile(mode='w+')
+        shutil.copyfileobj(sys.stdin, stream)
+        stream.seek(0)
+    else:
+        stream = open(file_name, 'r')
+
+    with stream:
+        # Check every row first, so a bad row does not leave part of the file in the database
+        num_rows = 0
+        try:
+            for _ in bulk.read_rows(stream, fmt, source, comments):
+                num_rows += 1
+        except bulk.BadInput as err:
+            print 'Nothing written: %s' % err
+            exit(1)
+
+        if dry_run:
+            print 'Checked %i rows' % num_rows
+            return
+
+        stream.seek(0)
+
+        # The last row read when a chunk is committed is the last row of that chunk
+        last_read = [None]
+        committed = [0, None]
+
+        def rows():
+            for row in bulk.read_rows(stream, fmt, source, comments):
+                last_read[0] = row[0]
+                yield row
+
+        def report_chunk(chunk_num, num_rows, seconds):
+            committed[0] += num_rows
+            committed[1] = last_read[0]
+            print 'Chunk %i: %i rows in %.3f seconds' % (chunk_num, num_rows, seconds)
+
+        # Collect all of the chunks into one email
+        notifier = notify.NullNotifier() if no_email else notify.DigestNotifier(interval=None)
+
+        try:
+            report = bulk.load_rows(rows(), chunk_size, energy=energy,
+                                    callback=report_chunk, notifier=notifier)
+        except Exception:
+            print 'Failed after committing the first %i rows (up to sample %s)' % tuple(committed)
+            raise
+        finally:
+            notifier.flush()
+
+    print 'Loaded %i rows in %.3f seconds (%.1f rows/second)' % \
+        (report['rows'], report['seconds'], report['rows_per_second'])
+
 
 if __name__ == '__main__':
 
-    if len(sys.argv) < 4 or sys.argv[1] in ['-h', '--help']:
+    if len(sys.argv) < 2 or sys.argv[1] in ['-h', '--help']:
         print __doc__
         exit(0)
 
-    # Get the comments, if there
-    comments = '='.join(sys.argv.pop(1).split('=')[1:]) \
-        if sys.argv[1].startswith('--comments=') else ''
+    # Get the flags, if there
+
+    options = {}
+    while len(sys.argv) > 1 and sys.argv[1].startswith('--'):
+        flag = sys.argv.pop(1).split('=')
+        options[flag[0]] = '='.join(flag[1:])
+
+    comments = options.get('--comments', '')
+
+    # Get the energy
+    energy = int(os.environ.get('ENERGY', 13))
+
+    if '--file' in options:
+        try:
+            chunk_size = int(options.get('--chunk-size', 1000))
+        except ValueError:
+            print 'Chunk size must be an integer, not %s' % options['--chunk-size']
+            print __doc__
+            exit(1)
+
+        load_file(options['--file'], options.get('--format'), chunk_size,
+                  '--dry-run' in options, '--no-email' in options, ' '.join(sys.argv[1:2]), comments, energy)
+        exit(0)
+
+    if len(sys.argv) < 4:
+        print __doc__
+        exit(0)
 
     # Get the source
     source = sys.argv[1]
@@ -60,7 +168,5 @@ if __name__ == '__main__':
         else:
             unc.append(0.0)
 
-    # Finally, get the energy
-    energy = int(os.environ.get('ENERGY', 13))
-
-    put_xsec(samples, xs, source, comments, energy=energy, uncertainties=unc)
+    put_xsec(samples, xs, source, comments, energy=energy, uncertainties=unc,
+             notifier=notify.NullNotifier() if '--no-email' in options else None)
@@ -16,6 +16,7 @@ If you do this, all arguments will be used to generate lists with LIKE.
 
 By default, the my.cnf configuration file is a centrally maintained one.
 To point to your own file, set the environment variable $XSECCONF to the location.
+To print a profile of the time spent on the database to STDERR, set $XSECPROFILE=1.
 
 Also by default, the samples are read off of the 13 TeV table.
 To change energies, set the environment variable $ENERGY to something different.
@@ -33,23 +34,77 @@ import os
 import sys
 import curses
 import textwrap
+import itertools
 
 from CrossSecDB import reader
 from CrossSecDB import inserter
+from CrossSecDB.history import HistoryPrefetcher
 
 
 ENERGY = int(os.environ.get('ENERGY', 13))
 
 
-def main(stdscr, history_dump):
+class ScrollingText(object):
+    """
+    Lines of text shown through a pad that is only the size of the screen.
+    Only the visible lines are drawn, so there is no limit to the number of lines.
+    """
+
+    def __init__(self, height, width):
+        self.pad = curses.newpad(height + 1, width)
+        self.width = width
+        self.lines = [[]]
+        self.top = 0
+
+    def erase(self):
+        self.lines = [[]]
+        self.top = 0
+
+    def addstr(self, text, attr=curses.A_NORMAL):
+        """
+        Add text to the end, like the addstr of a curses window.
+        Lines longer than the pad wrap around.
+        """
+
+        for line_num, piece in enumerate(text.split('\n')):
+            if line_num:
+                self.lines.append([])
+
+            while piece:
+                room = self.width - 1 - sum([len(segment) for segment, _ in self.lines[-1]])
+                if room <= 0:
+                    self.lines.append([])
+                    continue
+
+                self.lines[-1].append((piece[:room], attr))
+                piece = piece[room:]
+
+    def scroll(self, amount):
+        self.top = max(min(self.top + amount, len(self.lines) - 1), 0)
+
+    def refresh(self, screen_top, screen_left, screen_bottom, screen_right):
+        self.pad.erase()
+
+        for row, line in enumerate(self.lines[self.top:self.top + screen_bottom - screen_top + 1]):
+            self.pad.move(row, 0)
+            for segment, attr in line:
+                self.pad.addstr(segment, attr)
+
+        self.pad.refresh(0, 0, screen_top, screen_left, screen_bottom, screen_right)
+
+
+def main(stdscr, histories, num_samples):
     """
     Parameters:
     -----------
       stdscr (curses screen): The result of curses.initscr().
                               This allows the function to be wrapped.
 
-      history_dump (dict): A dictionary of historic information for datasets.
-                           It is the output of CrossSecDB.reader.dump_history.
+      histories (iterator): Gives tuples of (index, sample, history) for each sample to show,
+                            like CrossSecDB.history.HistoryPrefetcher.
+                            Each history is a value from CrossSecDB.reader.dump_history.
+
+      num_samples (int): The total number of samples, for showing progress.
 
     Returns:
     --------
@@ -63,7 +118,7 @@ def main(stdscr, history_dump):
     master_pad = curses.newpad(max_y, max_x - 8)
 
     # Historic information is displayed here
-    history_pad = curses.newpad(1024, max_x - 12)
+    history_pad = ScrollingText(max_y, max_x - 12)
 
     # User input is displayed here
     input_pad = curses.newpad(1, max_x - 8)
@@ -90,9 +145,6 @@ def main(stdscr, history_dump):
         """
         buff = ''
         current_char = 0
-        
-        # This is the top relative to the pad
-        history_pad_top = 0
 
         if confirmation:
             # These are the top and bottom on the screen
@@ -100,7 +152,7 @@ def main(stdscr, history_dump):
             valid_chars = [110, 121]
         else:
             hist_top, hist_bot = (6, bottom - 8)
-            valid_chars = range(48, 57) + [105, 113]
+            valid_chars = range(48, 58) + [105, 113]
 
         while current_char not in [curses.KEY_ENTER, 10, 13]:
             # There are a limited number of valid options for each screen
@@ -113,11 +165,9 @@ def main(stdscr, history_dump):
             elif current_char in [curses.KEY_UP, curses.KEY_DOWN]:
                 adjustment = 14 - bottom if current_char == curses.KEY_UP else \
                     (bottom - 14)/2
-                history_pad_top = max(history_pad_top + adjustment, 0)
+                history_pad.scroll(adjustment)
 
-                history_pad.refresh(history_pad_top, 0,
-                                    hist_top, 6,
-                                    hist_bot, max_x - 12)
+                history_pad.refresh(hist_top, 6, hist_bot, max_x - 12)
                 
             # Refresh input pad with every key press
             input_pad.erase()
@@ -134,14 +184,11 @@ def main(stdscr, history_dump):
     # (sample, new_xs, new_source, new_comments, old_xs)
     output = []
 
-    which_dataset = 0
-
-    # Go through all the samples in alphabetical order
-    for key in sorted(history_dump):
+    # Go through all the samples in the order given
+    for index, key, history in histories:
         master_pad.erase()
         history_pad.erase()
-        which_dataset += 1
-        master_pad.addstr('(%s/%s) ' % (which_dataset, len(history_dump)))
+        master_pad.addstr('(%s/%s) ' % (index + 1, num_samples))
         master_pad.addstr(' %s \n\n' % key,  curses.A_STANDOUT)
         master_pad.addstr('Options from history (use up and down keys to scroll)', curses.A_BOLD)
 
@@ -153,7 +200,7 @@ def main(stdscr, history_dump):
             }
 
         # List all the historic entries
-        for index, entry in enumerate(history_dump[key]):
+        for index, entry in enumerate(history):
             if not index:
                 history_pad.addstr('Current entry\n', curses.A_BOLD)
             history_pad.addstr('%s:' % index, curses.A_BOLD)
@@ -163,7 +210,7 @@ def main(stdscr, history_dump):
             history_pad.addstr('\n   Comments: %s\n' % \
                                    ('\n' + ' '*13).join(textwrap.wrap(entry['comments'], max_x - 25)))
 
-            history_pad.addstr('-' * (max_x - 12))
+            history_pad.addstr('-' * (max_x - 13) + '\n')
 
             options[str(index)] = entry
 
@@ -175,7 +222,7 @@ def main(stdscr, history_dump):
         master_pad.addstr('Quit revert attempt')
 
         master_pad.refresh(0, 0, 2, 4, bottom, max_x - 8)
-        history_pad.refresh(0, 0, 6, 6, bottom - 8, max_x - 12)
+        history_pad.refresh(6, 6, bottom - 8, max_x - 12)
 
         chosen = process_input('Select cross section (default 0, the current entry): ')
 
@@ -206,7 +253,7 @@ def main(stdscr, history_dump):
             history_pad.addstr('%s: %s +- %s ===> %s +- %s\n' % (sample, old_xs, old_unc, xs, unc))
 
         master_pad.refresh(0, 0, 2, 4, bottom, max_x - 8)
-        history_pad.refresh(0, 0, 4, 6, bottom - 2, max_x - 12)
+        history_pad.refresh(4, 6, bottom - 2, max_x - 12)
 
         submission = process_input('Submit these changes? (y/n, default n): ', True)
 
@@ -229,13 +276,18 @@ if __name__ == '__main__':
         print 'No datasets matched your --like parameters.'
         exit(1)
 
-    history_dump = reader.dump_history(args, energy=ENERGY)
+    # Go through the samples in alphabetical order.
+    # History is read while the user looks at each sample, instead of all at the start.
+    to_show = sorted(set(args))
+    histories = iter(HistoryPrefetcher(to_show, energy=ENERGY))
+
+    first = next(histories, None)
 
-    if not history_dump:
+    if first is None:
         print 'No history found for any of your arguments: %s' % args
         exit(2)
 
-    values_to_change = curses.wrapper(main, history_dump)
+    values_to_change = curses.wrapper(main, itertools.chain([first], histories), len(to_show))
 
     samples = []
     cross_sections = []
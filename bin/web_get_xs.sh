@@ -21,28 +21,24 @@ then
 
 fi
 
-exitcode=0
+# Send all of the samples in a single request
 
-while [ "$SAMPLE" != "" ]
+ARGS=()
+
+for SAMPLE in "$@"
 do
 
-    # Get the result from the database
-    output=`curl "http://t3serv001.mit.edu/~dabercro/CrossSecDB/?sample=$SAMPLE&energy=$ENERGY" 2> /dev/null`
+    ARGS+=(--data-urlencode "samples[]=$SAMPLE")
 
-    # Check that the output is valid
-    # If not, increment the exit code
-    if grep ERROR <(echo $output) > /dev/null
-    then
-        exitcode=$(($exitcode + 1))
-    fi
+done
 
-    # Echo the output, no matter what it was
-    echo $output
+output=`curl "http://t3serv001.mit.edu/~dabercro/CrossSecDB/?energy=$ENERGY&format=text" "${ARGS[@]}" 2> /dev/null`
 
-    shift              # Get the next sample
-    SAMPLE=$1
+# Echo the output, no matter what it was
+echo "$output"
 
-done
+# Each invalid line increments the exit code
+exitcode=`grep -c ERROR <(echo "$output")`
 
 exit $exitcode
 
@@ -67,6 +63,12 @@ To change energies, set the environment variable C<$ENERGY> to something differe
 
 =head1 Important Notes
 
+All of the samples are sent in a single request to the bulk interface of the web API.
+Scripts that want uncertainties too can ask the web API for JSON directly:
+
+    curl --data-urlencode "samples[]=sample1" --data-urlencode "samples[]=sample2" \
+        "http://t3serv001.mit.edu/~dabercro/CrossSecDB/?energy=13"
+
 This should be used from remote locations, such as LXPLUS.
 If running on the T3, it will probably be faster to use F<get_xs.py>.
 However, the nice part of this script is that is can be run from any
@@ -0,0 +1,71 @@
+#! /usr/bin/python
+
+"""
+Usage:
+
+  xs_archive.py [--days=DAYS] [--keep=N] [--energies=ENERGIES] [--dry-run]
+  xs_archive.py --info [--energies=ENERGIES]
+
+Move history entries older than DAYS days (default 365) to the archive tables,
+so the history tables do not keep growing.
+The newest N entries (default 3) of each sample always stay in the history, no matter how old.
+ENERGIES is a comma separated list. By default, all energies are archived.
+
+Archived entries are not deleted. They can be read with
+CrossSecDB.reader.dump_history(samples, include_archive=True).
+
+With --dry-run, only print how many entries would be moved.
+With --info, print the number of entries in the history and archive tables.
+
+By default, the my.cnf configuration file is a centrally maintained one.
+To point to your own file, set the environment variable $XSECCONF to the location.
+
+Examples:
+
+  xs_archive.py --dry-run
+  xs_archive.py --days=180 --keep=5 --energies=13
+
+Author:
+
+  Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import sys
+
+from CrossSecDB import archive
+from CrossSecDB.connection import ENERGIES
+
+
+if __name__ == '__main__':
+
+    options = {}
+    while len(sys.argv) > 1 and sys.argv[1].startswith('--'):
+        flag = sys.argv.pop(1).split('=')
+        options[flag[0]] = '='.join(flag[1:])
+
+    if len(sys.argv) != 1 or '--help' in options:
+        print __doc__
+        exit(0)
+
+    energies = ENERGIES
+    if options.get('--energies'):
+        energies = [int(energy) for energy in options['--energies'].split(',')]
+
+    if '--info' in options:
+        for energy, (history, archived) in sorted(archive.table_sizes(energies=energies).items()):
+            print '%i TeV: %i history entries, %i archived' % (energy, history, archived)
+        exit(0)
+
+    dry_run = '--dry-run' in options
+
+    try:
+        moved = archive.archive_history(energies=energies,
+                                        days=float(options.get('--days') or 365),
+                                        keep=int(options.get('--keep') or 3),
+                                        dry_run=dry_run)
+    except archive.BadArchiveInput as err:
+        print err
+        exit(1)
+
+    for energy, count in sorted(moved.items()):
+        print '%s %i entries at %i TeV' % ('Would archive' if dry_run else 'Archived', count, energy)
@@ -0,0 +1,112 @@
+#! /usr/bin/python
+
+"""
+Usage:
+
+  xs_changes.py [--since=TIME | --cursor=CURSOR] [--cursor-file=FILE] [--energies=ENERGIES] [--lag=SECONDS] [--follow [--interval=SECONDS]]
+
+Print every change to the database after a time or cursor, as JSON lines.
+Each line has the sample, energy, cross_section, uncertainty, last_updated,
+source, comments, and the cursor of the change.
+Changes are printed in the order they were made.
+
+TIME is given as 'YYYY-MM-DD HH:MM:SS'. Without TIME or CURSOR, all of history is printed.
+ENERGIES is a comma separated list. By default, all energies are included.
+
+With --cursor-file, the cursor is read from FILE, if it exists,
+and the cursor of the last change printed is written back to it.
+This lets a cron job keep a copy of the database up to date.
+
+Changes from the last few seconds (default 5, set with --lag) are left for the next run,
+since writes from then can still be committing and would be skipped otherwise.
+
+With --follow, the database is checked for new changes every SECONDS (default 10) until interrupted.
+
+By default, the my.cnf configuration file is a centrally maintained one.
+To point to your own file, set the environment variable $XSECCONF to the location.
+
+Examples:
+
+  xs_changes.py --since='2017-06-01 00:00:00' --energies=8,13
+  xs_changes.py --cursor-file=$HOME/.xs_cursor >> changes.jsonl
+
+Author:
+
+  Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import os
+import sys
+import json
+import time
+import datetime
+
+from CrossSecDB.changes import get_changes, TIME_FORMAT, DEFAULT_LAG
+from CrossSecDB.connection import ENERGIES
+
+
+def print_changes(changes):
+    """
+    Print the changes and return the cursor of the last one, or None if there were none.
+    """
+
+    cursor = None
+
+    for change in changes:
+        change['last_updated'] = change['last_updated'].strftime(TIME_FORMAT)
+        print json.dumps(change, sort_keys=True)
+        cursor = change['cursor']
+
+    sys.stdout.flush()
+
+    return cursor
+
+
+if __name__ == '__main__':
+
+    options = {}
+    for arg in sys.argv[1:]:
+        if arg in ['-h', '--help'] or not arg.startswith('--'):
+            print __doc__
+            exit(0)
+
+        flag = arg.split('=')
+        options[flag[0]] = '='.join(flag[1:])
+
+    since = None
+    if options.get('--since'):
+        since = datetime.datetime.strptime(options['--since'], TIME_FORMAT)
+
+    cursor = options.get('--cursor')
+    cursor_file = options.get('--cursor-file')
+
+    if cursor_file and not cursor and os.path.exists(cursor_file):
+        with open(cursor_file, 'r') as input_file:
+            cursor = input_file.read().strip() or None
+
+    energies = ENERGIES
+    if options.get('--energies'):
+        energies = [int(energy) for energy in options['--energies'].split(',')]
+
+    interval = float(options.get('--interval', 10))
+    lag = float(options.get('--lag', DEFAULT_LAG))
+
+    while True:
+        last = print_changes(get_changes(since=since, cursor=cursor, energies=energies, lag=lag))
+
+        if last is not None:
+            cursor = last
+
+            if cursor_file:
+                # Write the new cursor atomically, so a crash does not lose it
+                with open(cursor_file + '.tmp', 'w') as output_file:
+                    output_file.write(cursor + '\n')
+                os.rename(cursor_file + '.tmp', cursor_file)
+
+        if '--follow' not in options:
+            break
+
+        try:
+            time.sleep(interval)
+        except KeyboardInterrupt:
+            break
@@ -0,0 +1,35 @@
+#! /usr/bin/python
+
+"""
+Usage:
+
+  xs_helper.py
+
+Start a process that answers cross section lookups over STDIN and STDOUT.
+Each request and response is a single line of JSON.
+See the documentation of CrossSecDB.helper for the format.
+The process exits when STDIN is closed.
+
+This is started automatically by CrossSecDB.reader_cmssw.
+It lets CMSSW jobs pay the Python and database connection startup only once.
+
+By default, the my.cnf configuration file is a centrally maintained one.
+To point to your own file, set the environment variable $XSECCONF to the location,
+or give a 'cnf' parameter in the request.
+
+Author:
+
+  Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import sys
+
+from CrossSecDB import helper
+
+if __name__ == '__main__':
+
+    if len(sys.argv) > 1 and sys.argv[1] in ['-h', '--help']:
+        print __doc__
+        exit(0)
+
+    helper.serve(sys.stdin, sys.stdout)
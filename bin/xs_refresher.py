@@ -0,0 +1,62 @@
+#! /usr/bin/python
+
+"""
+Usage:
+
+  xs_refresher.py [--energies=ENERGIES] [--interval=SECONDS] [--once] FILE
+
+Keep a snapshot of the database at FILE for every process on this node to read.
+The database is checked every SECONDS (default 60), and a new snapshot is written
+whenever a table has changed. New snapshots replace the old one atomically.
+With --once, the snapshot is only brought up to date once.
+ENERGIES is a comma separated list. By default, all energies are included.
+
+Workers read from the snapshot, instead of the database, when the environment variable
+$XSECSNAPSHOT is set to FILE. They notice a new snapshot within a second.
+
+By default, the my.cnf configuration file is a centrally maintained one.
+To point to your own file, set the environment variable $XSECCONF to the location.
+
+Example:
+
+  xs_refresher.py --interval=300 /dev/shm/xsec.snap &
+  XSECSNAPSHOT=/dev/shm/xsec.snap ./run_my_workers.sh
+
+Author:
+
+  Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import sys
+import logging
+
+from CrossSecDB.nodecache import Refresher
+from CrossSecDB.connection import ENERGIES
+
+
+if __name__ == '__main__':
+
+    options = {}
+    while len(sys.argv) > 1 and sys.argv[1].startswith('--'):
+        flag = sys.argv.pop(1).split('=')
+        options[flag[0]] = '='.join(flag[1:])
+
+    if len(sys.argv) != 2 or '--help' in options:
+        print __doc__
+        exit(0)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    energies = ENERGIES
+    if options.get('--energies'):
+        energies = [int(energy) for energy in options['--energies'].split(',')]
+
+    refresher = Refresher(sys.argv[1], energies, interval=float(options.get('--interval', 60)))
+
+    if '--once' in options:
+        refresher.refresh()
+    else:
+        try:
+            refresher.run()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,49 @@
+#! /usr/bin/python
+
+"""
+Usage:
+
+  xs_service.py [--host=HOST] [--port=PORT] [--quiet]
+
+Run an HTTP server for reading cross sections as JSON.
+See the documentation of CrossSecDB.service for the endpoints.
+HOST defaults to localhost and PORT defaults to 8080.
+The --quiet flag stops the server from logging every request.
+
+By default, the my.cnf configuration file is a centrally maintained one.
+To point to your own file, set the environment variable $XSECCONF to the location.
+
+Example:
+
+  XSECCONF=test/my.cnf xs_service.py --port=8000 &
+  curl 'http://localhost:8000/xsec?energy=13&samples=TestDataset'
+
+Author:
+
+  Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import sys
+
+from CrossSecDB import service
+
+if __name__ == '__main__':
+
+    if len(sys.argv) > 1 and sys.argv[1] in ['-h', '--help']:
+        print __doc__
+        exit(0)
+
+    options = {}
+    for arg in sys.argv[1:]:
+        flag = arg.split('=')
+        options[flag[0]] = '='.join(flag[1:])
+
+    server = service.make_server(options.get('--host', 'localhost'), int(options.get('--port', 8080)),
+                                 quiet='--quiet' in options)
+
+    print 'Serving on http://%s:%i' % server.server_address
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,65 @@
+#! /usr/bin/python
+
+"""
+Usage:
+
+  xs_snapshot.py [--energies=ENERGIES] FILE
+  xs_snapshot.py --info FILE
+
+Write the current cross sections in the database to a snapshot file,
+which can be shipped with jobs that cannot reach the database.
+ENERGIES is a comma separated list. By default, all energies are included.
+The file is replaced atomically, so jobs reading an old snapshot are not disturbed.
+
+With --info, print the contents of an existing snapshot instead.
+
+To read cross sections from the snapshot, set the environment variable $XSECSNAPSHOT to its location.
+Then get_xs.py and CrossSecDB.reader.get_xsec do not connect to the database.
+
+By default, the my.cnf configuration file is a centrally maintained one.
+To point to your own file, set the environment variable $XSECCONF to the location.
+
+Examples:
+
+  xs_snapshot.py --energies=13 xsec.snap
+  XSECSNAPSHOT=xsec.snap get_xs.py WJetsToLNu_TuneCUETP8M1_13TeV-amcatnloFXFX-pythia8
+
+Author:
+
+  Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import sys
+
+from CrossSecDB import snapshot
+from CrossSecDB.connection import ENERGIES
+
+
+if __name__ == '__main__':
+
+    options = {}
+    while len(sys.argv) > 1 and sys.argv[1].startswith('--'):
+        flag = sys.argv.pop(1).split('=')
+        options[flag[0]] = '='.join(flag[1:])
+
+    if len(sys.argv) != 2 or '--help' in options:
+        print __doc__
+        exit(0)
+
+    file_name = sys.argv[1]
+
+    if '--info' in options:
+        with snapshot.Snapshot(file_name) as snap:
+            print 'Created: %s UTC' % snap.created
+            for energy in snap.energies:
+                last_updated, count = snap.version(energy)
+                print '%i TeV: %i samples, last updated %s, %i history entries' % \
+                    (energy, snap.size(energy), last_updated, count)
+        exit(0)
+
+    energies = ENERGIES
+    if options.get('--energies'):
+        energies = [int(energy) for energy in options['--energies'].split(',')]
+
+    for energy, count in sorted(snapshot.export(file_name, energies).items()):
+        print 'Wrote %i samples at %i TeV' % (count, energy)
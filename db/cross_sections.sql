@@ -30,6 +30,9 @@ CREATE TABLE xs_14TeV LIKE template;
 ALTER TABLE template DROP PRIMARY KEY;
 ALTER TABLE template ADD PRIMARY KEY (sample, last_updated);
 
+-- Lets the change feed read everything after a time without a full scan
+ALTER TABLE template ADD INDEX last_updated (last_updated);
+
 DROP TABLE IF EXISTS xs_7TeV_history;
 DROP TABLE IF EXISTS xs_8TeV_history;
 DROP TABLE IF EXISTS xs_13TeV_history;
@@ -39,3 +42,15 @@ CREATE TABLE xs_7TeV_history LIKE template;
 CREATE TABLE xs_8TeV_history LIKE template;
 CREATE TABLE xs_13TeV_history LIKE template;
 CREATE TABLE xs_14TeV_history LIKE template;
+
+-- Old history is moved here by CrossSecDB.archive, so the history tables stay small
+
+DROP TABLE IF EXISTS xs_7TeV_history_archive;
+DROP TABLE IF EXISTS xs_8TeV_history_archive;
+DROP TABLE IF EXISTS xs_13TeV_history_archive;
+DROP TABLE IF EXISTS xs_14TeV_history_archive;
+
+CREATE TABLE xs_7TeV_history_archive LIKE template;
+CREATE TABLE xs_8TeV_history_archive LIKE template;
+CREATE TABLE xs_13TeV_history_archive LIKE template;
+CREATE TABLE xs_14TeV_history_archive LIKE template;
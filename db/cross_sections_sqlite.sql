@@ -0,0 +1,157 @@
+--
+-- The same tables as cross_sections.sql, for the SQLite backend.
+-- Like the MySQL file, this drops all existing tables, so only use it for fresh installs and tests.
+-- Sample names use NOCASE to match the default MySQL collation.
+--
+
+DROP TABLE IF EXISTS xs_7TeV;
+
+CREATE TABLE xs_7TeV (
+  sample VARCHAR(144) NOT NULL COLLATE NOCASE,
+  cross_section DOUBLE NOT NULL,
+  uncertainty DOUBLE DEFAULT 0.0,
+  last_updated DATETIME NOT NULL,
+  source VARCHAR(512) NOT NULL,
+  comments VARCHAR(2048),
+  PRIMARY KEY (sample)
+);
+
+DROP TABLE IF EXISTS xs_8TeV;
+
+CREATE TABLE xs_8TeV (
+  sample VARCHAR(144) NOT NULL COLLATE NOCASE,
+  cross_section DOUBLE NOT NULL,
+  uncertainty DOUBLE DEFAULT 0.0,
+  last_updated DATETIME NOT NULL,
+  source VARCHAR(512) NOT NULL,
+  comments VARCHAR(2048),
+  PRIMARY KEY (sample)
+);
+
+DROP TABLE IF EXISTS xs_13TeV;
+
+CREATE TABLE xs_13TeV (
+  sample VARCHAR(144) NOT NULL COLLATE NOCASE,
+  cross_section DOUBLE NOT NULL,
+  uncertainty DOUBLE DEFAULT 0.0,
+  last_updated DATETIME NOT NULL,
+  source VARCHAR(512) NOT NULL,
+  comments VARCHAR(2048),
+  PRIMARY KEY (sample)
+);
+
+DROP TABLE IF EXISTS xs_14TeV;
+
+CREATE TABLE xs_14TeV (
+  sample VARCHAR(144) NOT NULL COLLATE NOCASE,
+  cross_section DOUBLE NOT NULL,
+  uncertainty DOUBLE DEFAULT 0.0,
+  last_updated DATETIME NOT NULL,
+  source VARCHAR(512) NOT NULL,
+  comments VARCHAR(2048),
+  PRIMARY KEY (sample)
+);
+
+DROP TABLE IF EXISTS xs_7TeV_history;
+
+CREATE TABLE xs_7TeV_history (
+  sample VARCHAR(144) NOT NULL COLLATE NOCASE,
+  cross_section DOUBLE NOT NULL,
+  uncertainty DOUBLE DEFAULT 0.0,
+  last_updated DATETIME NOT NULL,
+  source VARCHAR(512) NOT NULL,
+  comments VARCHAR(2048),
+  PRIMARY KEY (sample, last_updated)
+);
+
+CREATE INDEX xs_7TeV_history_last_updated ON xs_7TeV_history (last_updated);
+
+DROP TABLE IF EXISTS xs_8TeV_history;
+
+CREATE TABLE xs_8TeV_history (
+  sample VARCHAR(144) NOT NULL COLLATE NOCASE,
+  cross_section DOUBLE NOT NULL,
+  uncertainty DOUBLE DEFAULT 0.0,
+  last_updated DATETIME NOT NULL,
+  source VARCHAR(512) NOT NULL,
+  comments VARCHAR(2048),
+  PRIMARY KEY (sample, last_updated)
+);
+
+CREATE INDEX xs_8TeV_history_last_updated ON xs_8TeV_history (last_updated);
+
+DROP TABLE IF EXISTS xs_13TeV_history;
+
+CREATE TABLE xs_13TeV_history (
+  sample VARCHAR(144) NOT NULL COLLATE NOCASE,
+  cross_section DOUBLE NOT NULL,
+  uncertainty DOUBLE DEFAULT 0.0,
+  last_updated DATETIME NOT NULL,
+  source VARCHAR(512) NOT NULL,
+  comments VARCHAR(2048),
+  PRIMARY KEY (sample, last_updated)
+);
+
+CREATE INDEX xs_13TeV_history_last_updated ON xs_13TeV_history (last_updated);
+
+DROP TABLE IF EXISTS xs_14TeV_history;
+
+CREATE TABLE xs_14TeV_history (
+  sample VARCHAR(144) NOT NULL COLLATE NOCASE,
+  cross_section DOUBLE NOT NULL,
+  uncertainty DOUBLE DEFAULT 0.0,
+  last_updated DATETIME NOT NULL,
+  source VARCHAR(512) NOT NULL,
+  comments VARCHAR(2048),
+  PRIMARY KEY (sample, last_updated)
+);
+
+CREATE INDEX xs_14TeV_history_last_updated ON xs_14TeV_history (last_updated);
+
+DROP TABLE IF EXISTS xs_7TeV_history_archive;
+
+CREATE TABLE xs_7TeV_history_archive (
+  sample VARCHAR(144) NOT NULL COLLATE NOCASE,
+  cross_section DOUBLE NOT NULL,
+  uncertainty DOUBLE DEFAULT 0.0,
+  last_updated DATETIME NOT NULL,
+  source VARCHAR(512) NOT NULL,
+  comments VARCHAR(2048),
+  PRIMARY KEY (sample, last_updated)
+);
+
+DROP TABLE IF EXISTS xs_8TeV_history_archive;
+
+CREATE TABLE xs_8TeV_history_archive (
+  sample VARCHAR(144) NOT NULL COLLATE NOCASE,
+  cross_section DOUBLE NOT NULL,
+  uncertainty DOUBLE DEFAULT 0.0,
+  last_updated DATETIME NOT NULL,
+  source VARCHAR(512) NOT NULL,
+  comments VARCHAR(2048),
+  PRIMARY KEY (sample, last_updated)
+);
+
+DROP TABLE IF EXISTS xs_13TeV_history_archive;
+
+CREATE TABLE xs_13TeV_history_archive (
+  sample VARCHAR(144) NOT NULL COLLATE NOCASE,
+  cross_section DOUBLE NOT NULL,
+  uncertainty DOUBLE DEFAULT 0.0,
+  last_updated DATETIME NOT NULL,
+  source VARCHAR(512) NOT NULL,
+  comments VARCHAR(2048),
+  PRIMARY KEY (sample, last_updated)
+);
+
+DROP TABLE IF EXISTS xs_14TeV_history_archive;
+
+CREATE TABLE xs_14TeV_history_archive (
+  sample VARCHAR(144) NOT NULL COLLATE NOCASE,
+  cross_section DOUBLE NOT NULL,
+  uncertainty DOUBLE DEFAULT 0.0,
+  last_updated DATETIME NOT NULL,
+  source VARCHAR(512) NOT NULL,
+  comments VARCHAR(2048),
+  PRIMARY KEY (sample, last_updated)
+);
@@ -0,0 +1,11 @@
+--
+-- Adds the index on last_updated to the history tables of an existing database.
+-- New databases made from cross_sections.sql already have it.
+--
+--   mysql --defaults-file=my.cnf --defaults-group-suffix=-crosssec-writer -Dcross_sections < db/migrations/001_history_last_updated.sql
+--
+
+ALTER TABLE xs_7TeV_history ADD INDEX last_updated (last_updated);
+ALTER TABLE xs_8TeV_history ADD INDEX last_updated (last_updated);
+ALTER TABLE xs_13TeV_history ADD INDEX last_updated (last_updated);
+ALTER TABLE xs_14TeV_history ADD INDEX last_updated (last_updated);
@@ -0,0 +1,11 @@
+--
+-- Adds the index on last_updated to the history tables of an existing SQLite database.
+-- New databases made from cross_sections_sqlite.sql already have it.
+--
+--   sqlite3 xsec.db < db/migrations/001_history_last_updated_sqlite.sql
+--
+
+CREATE INDEX IF NOT EXISTS xs_7TeV_history_last_updated ON xs_7TeV_history (last_updated);
+CREATE INDEX IF NOT EXISTS xs_8TeV_history_last_updated ON xs_8TeV_history (last_updated);
+CREATE INDEX IF NOT EXISTS xs_13TeV_history_last_updated ON xs_13TeV_history (last_updated);
+CREATE INDEX IF NOT EXISTS xs_14TeV_history_last_updated ON xs_14TeV_history (last_updated);
@@ -0,0 +1,11 @@
+--
+-- Adds the history archive tables to an existing database.
+-- New databases made from cross_sections.sql already have them.
+--
+--   mysql --defaults-file=my.cnf --defaults-group-suffix=-crosssec-writer -Dcross_sections < db/migrations/002_history_archive.sql
+--
+
+CREATE TABLE IF NOT EXISTS xs_7TeV_history_archive LIKE xs_7TeV_history;
+CREATE TABLE IF NOT EXISTS xs_8TeV_history_archive LIKE xs_8TeV_history;
+CREATE TABLE IF NOT EXISTS xs_13TeV_history_archive LIKE xs_13TeV_history;
+CREATE TABLE IF NOT EXISTS xs_14TeV_history_archive LIKE xs_14TeV_history;
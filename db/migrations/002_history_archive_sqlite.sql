@@ -0,0 +1,46 @@
+--
+-- Adds the history archive tables to an existing SQLite database.
+-- New databases made from cross_sections_sqlite.sql already have them.
+--
+--   sqlite3 xsec.db < db/migrations/002_history_archive_sqlite.sql
+--
+
+CREATE TABLE IF NOT EXISTS xs_7TeV_history_archive (
+  sample VARCHAR(144) NOT NULL COLLATE NOCASE,
+  cross_section DOUBLE NOT NULL,
+  uncertainty DOUBLE DEFAULT 0.0,
+  last_updated DATETIME NOT NULL,
+  source VARCHAR(512) NOT NULL,
+  comments VARCHAR(2048),
+  PRIMARY KEY (sample, last_updated)
+);
+
+CREATE TABLE IF NOT EXISTS xs_8TeV_history_archive (
+  sample VARCHAR(144) NOT NULL COLLATE NOCASE,
+  cross_section DOUBLE NOT NULL,
+  uncertainty DOUBLE DEFAULT 0.0,
+  last_updated DATETIME NOT NULL,
+  source VARCHAR(512) NOT NULL,
+  comments VARCHAR(2048),
+  PRIMARY KEY (sample, last_updated)
+);
+
+CREATE TABLE IF NOT EXISTS xs_13TeV_history_archive (
+  sample VARCHAR(144) NOT NULL COLLATE NOCASE,
+  cross_section DOUBLE NOT NULL,
+  uncertainty DOUBLE DEFAULT 0.0,
+  last_updated DATETIME NOT NULL,
+  source VARCHAR(512) NOT NULL,
+  comments VARCHAR(2048),
+  PRIMARY KEY (sample, last_updated)
+);
+
+CREATE TABLE IF NOT EXISTS xs_14TeV_history_archive (
+  sample VARCHAR(144) NOT NULL COLLATE NOCASE,
+  cross_section DOUBLE NOT NULL,
+  uncertainty DOUBLE DEFAULT 0.0,
+  last_updated DATETIME NOT NULL,
+  source VARCHAR(512) NOT NULL,
+  comments VARCHAR(2048),
+  PRIMARY KEY (sample, last_updated)
+);
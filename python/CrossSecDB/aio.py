@@ -0,0 +1,200 @@
+"""
+An asyncio interface to CrossSecDB.reader, for Python 3.5 and later.
+The blocking reader functions run on a bounded thread pool, so they do not
+block the event loop, and large lookups are split into chunks that run at the same time.
+
+    import asyncio
+    from CrossSecDB import aio
+
+    async def main():
+        async with aio.AsyncReader(max_workers=8) as xs_reader:
+            xs_8, xs_13 = await asyncio.gather(
+                xs_reader.get_xsec(samples, energy=8),
+                xs_reader.get_xsec(samples, energy=13))
+
+    asyncio.get_event_loop().run_until_complete(main())
+
+The module level functions use one shared AsyncReader with the default settings.
+
+Cancelling a task stops any of its queries that have not started yet.
+Queries already sent to the database finish in their thread, and the results are dropped.
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import weakref
+import asyncio
+import logging
+
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+from . import reader
+from .connection import chunks, DEFAULT_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+class AsyncReader(object):
+    """
+    Runs reader functions on its own thread pool.
+    Use it as an async context manager, or call close() when done.
+    """
+
+    def __init__(self, max_workers=4, concurrency=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Parameters:
+        -----------
+          max_workers (int) - The number of threads, which is also the most connections
+                              that can be in use at once. (default 4)
+
+          concurrency (int) - The most queries from this reader that can be waiting
+                              or running at once. (default max_workers)
+
+          chunk_size (int) - The maximum number of samples to look up in a single query.
+                             (default DEFAULT_CHUNK_SIZE in CrossSecDB.connection)
+        """
+
+        if max_workers < 1:
+            raise ValueError('Need at least one worker, not %s' % max_workers)
+
+        self.concurrency = concurrency or max_workers
+        self.chunk_size = chunk_size
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+        # Semaphores belong to an event loop, so one is made for each loop that uses this reader
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _semaphore(self):
+        loop = asyncio.get_event_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.concurrency)
+
+        return self._semaphores[loop]
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Run a blocking function on the thread pool, once there is room under the concurrency limit.
+        """
+
+        async with self._semaphore():
+            return await asyncio.get_event_loop().run_in_executor(
+                self.executor, partial(func, *args, **kwargs))
+
+    async def lookup_xsec(self, samples, cnf=None, energy=13, get_uncert=False):
+        """
+        The same as CrossSecDB.reader.lookup_xsec, with each chunk of samples queried at once.
+        """
+
+        if not isinstance(samples, list):
+            samples = [samples]
+
+        results = await asyncio.gather(*[
+                self.run(reader.lookup_xsec, chunk, cnf, energy, get_uncert, len(chunk))
+                for chunk in chunks(samples, self.chunk_size)])
+
+        found = {}
+        for result in results:
+            found.update(result)
+
+        return found
+
+    async def get_xsec(self, samples, cnf=None, energy=13, get_uncert=False):
+        """
+        The same as CrossSecDB.reader.get_xsec, with each chunk of samples queried at once.
+        """
+
+        if not isinstance(samples, list):
+            samples = [samples]
+
+        if isinstance(energy, (list, tuple)):
+            results = await asyncio.gather(*[
+                    self.run(reader.lookup_xsec_energies, chunk, cnf, energy, get_uncert, len(chunk))
+                    for chunk in chunks(samples, self.chunk_size)])
+
+            found = {}
+            for result in results:
+                found.update(result)
+
+            return reader.mark_xsec(samples, energy, found)
+
+        return reader.order_xsec(samples, await self.lookup_xsec(samples, cnf, energy, get_uncert), energy)
+
+    async def dump_history(self, samples, cnf=None, energy=13, include_archive=False):
+        """
+        The same as CrossSecDB.reader.dump_history, with each chunk of samples queried at once.
+        """
+
+        if not isinstance(samples, list):
+            samples = [samples]
+
+        results = await asyncio.gather(*[
+                self.run(reader.dump_history, chunk, cnf, energy, include_archive)
+                for chunk in chunks(samples, self.chunk_size)])
+
+        output = {}
+        for result in results:
+            output.update(result)
+
+        return output
+
+    async def get_samples_like(self, patterns, cnf=None, energy=13, history=True, kind='like'):
+        """
+        The same as CrossSecDB.reader.get_samples_like.
+        Patterns are matched in memory, so they all go to the same thread.
+        """
+
+        return await self.run(reader.get_samples_like, patterns, cnf, energy, history, kind)
+
+    def close(self, wait=True):
+        """
+        Shut down the thread pool.
+
+        Parameters:
+        -----------
+          wait (bool) - If True, wait for running queries to finish. (default True)
+        """
+
+        self.executor.shutdown(wait=wait)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+_READER = None
+
+def default_reader():
+    """
+    Returns:
+    --------
+      The AsyncReader used by the module level functions.
+    """
+
+    global _READER
+    if _READER is None:
+        _READER = AsyncReader()
+
+    return _READER
+
+async def get_xsec(samples, cnf=None, energy=13, get_uncert=False):
+    """
+    See AsyncReader.get_xsec.
+    """
+
+    return await default_reader().get_xsec(samples, cnf, energy, get_uncert)
+
+async def dump_history(samples, cnf=None, energy=13, include_archive=False):
+    """
+    See AsyncReader.dump_history.
+    """
+
+    return await default_reader().dump_history(samples, cnf, energy, include_archive)
+
+async def get_samples_like(patterns, cnf=None, energy=13, history=True, kind='like'):
+    """
+    See AsyncReader.get_samples_like.
+    """
+
+    return await default_reader().get_samples_like(patterns, cnf, energy, history, kind)
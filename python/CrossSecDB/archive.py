@@ -0,0 +1,169 @@
+"""
+Moves old history into archive tables, so the history tables stay small.
+Every put_xsec copies into the history tables, and those are scanned by
+dump_history, the web page, the change feed, and the sample index.
+
+An entry is archived when it is older than the retention window,
+and it is not one of the newest versions of its sample:
+
+    from CrossSecDB import archive
+
+    moved = archive.archive_history(days=365, keep=3)
+
+Nothing is deleted. Archived entries are moved to xs_{E}TeV_history_archive,
+which has the same columns as the history tables, and can be read back with
+CrossSecDB.reader.dump_history(samples, include_archive=True).
+
+Existing databases need the tables from db/migrations/002_history_archive.sql.
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import logging
+import datetime
+
+from .backends import as_datetime
+from .connection import get_connection, chunks, ENERGIES
+
+logger = logging.getLogger(__name__)
+
+class BadArchiveInput(Exception):
+    pass
+
+def find_archivable(conn, energy, before, keep):
+    """
+    Find the history entries to archive.
+
+    Parameters:
+    -----------
+      conn (CrossSecDB.connection.XSecConnection) - An open connection.
+
+      energy (int) - Energy to determine the history table.
+
+      before (datetime.datetime) - Only entries from before this time are archived.
+
+      keep (int) - The number of newest entries of each sample that are never archived.
+
+    Returns:
+    --------
+      A list of tuples of (sample, time, count).
+      The count is the number of entries of the sample from before the time, which are all to be archived.
+    """
+
+    table = 'xs_{0}TeV_history'.format(energy)
+
+    # Only samples with more than keep entries can have any to archive
+    conn.curs.execute("""
+                      SELECT sample FROM {0} WHERE sample IN
+                      (SELECT sample FROM {0} WHERE last_updated < %s)
+                      GROUP BY sample HAVING COUNT(*) > %s
+                      """.format(table), (before, keep))
+
+    samples = [sample for sample, in conn.curs.fetchall()]
+
+    output = []
+
+    for chunk in chunks(samples):
+        conn.curs.execute(
+            'SELECT sample, last_updated FROM {0} WHERE sample IN ({1})'.format(table, ', '.join(['%s'] * len(chunk))),
+            chunk)
+
+        # Sample names are not case sensitive in the database
+        times = {}
+        for sample, last_updated in conn.curs.fetchall():
+            times.setdefault(sample.lower(), (sample, []))[1].append(as_datetime(last_updated))
+
+        for sample, updates in times.values():
+            updates.sort(reverse=True)
+            # Everything older than the oldest entry to keep, and older than the window
+            limit = min(before, updates[keep - 1])
+            count = len([update for update in updates if update < limit])
+
+            if count:
+                output.append((sample, limit, count))
+
+    return output
+
+def archive_history(cnf=None, energies=ENERGIES, days=365, keep=3, dry_run=False):
+    """
+    Move old entries from the history tables to the archive tables.
+    Each chunk of samples is moved in one transaction, so no entry is ever in both tables or neither.
+
+    Parameters:
+    -----------
+      cnf (str) - Location of the MySQL connection configuration file.
+                  (default None, see XSecConnection.__init__)
+
+      energies (list) - The energies of the tables to archive. (default all of them)
+
+      days (float) - Entries updated within this many days are kept. (default 365)
+
+      keep (int) - The newest keep entries of each sample are kept, no matter how old.
+                   This must be at least 1, so the current value is always in the history. (default 3)
+
+      dry_run (bool) - If True, only count the entries that would be moved. (default False)
+
+    Returns:
+    --------
+      A dictionary from energy to the number of entries moved (or that would be moved).
+
+    Raises:
+    -------
+      BadArchiveInput - If keep or days is too small.
+    """
+
+    if keep < 1:
+        raise BadArchiveInput('At least one entry of each sample must be kept, not %s' % keep)
+    if days < 0:
+        raise BadArchiveInput('Retention window cannot be negative: %s days' % days)
+
+    before = datetime.datetime.now() - datetime.timedelta(days=days)
+    before = before.replace(microsecond=0)
+
+    moved = {}
+
+    move_stmt = """
+                INSERT INTO xs_{0}TeV_history_archive
+                SELECT * FROM xs_{0}TeV_history WHERE sample=%s AND last_updated < %s
+                """
+    delete_stmt = 'DELETE FROM xs_{0}TeV_history WHERE sample=%s AND last_updated < %s'
+
+    with get_connection(write=not dry_run, cnf=cnf) as conn:
+        for energy in energies:
+            to_move = find_archivable(conn, energy, before, keep)
+            moved[energy] = sum([count for _, _, count in to_move])
+
+            logger.info('%i entries of %i samples to archive at %i TeV', moved[energy], len(to_move), energy)
+
+            if dry_run:
+                continue
+
+            for chunk in chunks(to_move):
+                params = [(sample, limit) for sample, limit, _ in chunk]
+
+                conn.curs.executemany(move_stmt.format(energy), params)
+                conn.curs.executemany(delete_stmt.format(energy), params)
+
+                conn.conn.commit()
+
+    return moved
+
+def table_sizes(cnf=None, energies=ENERGIES):
+    """
+    Returns:
+    --------
+      A dictionary from energy to a tuple of the number of entries in the history and archive tables.
+    """
+
+    output = {}
+
+    with get_connection(write=False, cnf=cnf) as conn:
+        for energy in energies:
+            sizes = []
+            for table in ['xs_{0}TeV_history', 'xs_{0}TeV_history_archive']:
+                conn.curs.execute('SELECT COUNT(*) FROM {0}'.format(table.format(energy)))
+                sizes.append(conn.curs.fetchone()[0])
+
+            output[energy] = tuple(sizes)
+
+    return output
@@ -0,0 +1,203 @@
+"""
+Cross sections as NumPy arrays, for weighting many events at once.
+NumPy is only needed to use this module. The rest of CrossSecDB works without it.
+
+    from CrossSecDB.arrays import XSecTable
+
+    table = XSecTable(['sample_a', 'sample_b'])
+    # event_codes is an integer array of positions in the list of samples
+    xs, uncert = table.gather(event_codes)
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import logging
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . import reader
+from .connection import DEFAULT_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+ON_ERROR = ['raise', 'nan']
+
+def _require_numpy():
+    if numpy is None:
+        raise ImportError('NumPy is needed for CrossSecDB.arrays. Install it with "pip install numpy".')
+
+def as_str(name):
+    """
+    Turn a sample name from an array into a str.
+    Names from arrays of bytes are decoded, instead of becoming "b'...'" on Python 3.
+    """
+
+    if isinstance(name, bytes) and not isinstance(name, str):
+        return name.decode('utf-8')
+
+    return str(name)
+
+def get_xsec_arrays(samples, cnf=None, energy=13, on_error='raise', chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Get the cross sections and uncertainties of samples as arrays.
+    Each distinct sample is only looked up once, so samples can be as long as a list of events.
+
+    Parameters:
+    -----------
+      samples (list or numpy.ndarray) - The sample names to get cross sections for.
+
+      cnf (str) - Location of the MySQL connection configuration file.
+                  (default None, see XSecConnection.__init__)
+
+      energy (int) - Energy to determine the table to look up cross sections from.
+                     (default 13)
+
+      on_error (str) - What to do with missing samples and samples with a cross section of 0.
+                       If 'raise', raise the same errors as CrossSecDB.reader.get_xsec.
+                       If 'nan', put NaN in the arrays for them. (default 'raise')
+
+      chunk_size (int) - The maximum number of samples to look up in a single query.
+                         (default DEFAULT_CHUNK_SIZE in CrossSecDB.connection)
+
+    Returns:
+    --------
+      A tuple of two float64 arrays, cross sections and uncertainties, parallel to samples.
+
+    Raises:
+    -------
+      ImportError - If NumPy is not installed.
+
+      ValueError - If on_error is not one of ON_ERROR.
+
+      NoMatchingDataset - If on_error is 'raise' and any of the samples are not in the database.
+
+      InvalidDataset - If on_error is 'raise' and any of the samples have a cross section of 0.
+    """
+
+    _require_numpy()
+
+    if on_error not in ON_ERROR:
+        raise ValueError('on_error must be one of %s, not %s' % (ON_ERROR, on_error))
+
+    names = numpy.asarray(samples)
+    if not names.size:
+        return numpy.zeros(names.shape), numpy.zeros(names.shape)
+
+    unique, first, inverse = numpy.unique(names.ravel(), return_index=True, return_inverse=True)
+    unique = [as_str(name) for name in unique]
+
+    found = reader.lookup_xsec(unique, cnf, energy, get_uncert=True, chunk_size=chunk_size)
+
+    if on_error == 'raise':
+        # Check the samples in the order they first appear, so errors match get_xsec.
+        # Only the cross sections are passed, since zero is what makes a sample invalid.
+        reader.order_xsec([unique[index] for index in numpy.argsort(first)],
+                          dict([(name, value[0]) for name, value in found.items()]), energy)
+
+    unique_xs = numpy.empty(len(unique))
+    unique_uncert = numpy.empty(len(unique))
+
+    for index, name in enumerate(unique):
+        xs, uncert = found.get(name, (0.0, None))
+        if xs:
+            unique_xs[index] = xs
+            unique_uncert[index] = uncert or 0.0
+        else:
+            unique_xs[index] = unique_uncert[index] = numpy.nan
+
+    inverse = inverse.reshape(names.shape)
+
+    return unique_xs[inverse], unique_uncert[inverse]
+
+def gather(codes, *values):
+    """
+    Gather values for each event from arrays indexed by sample code.
+
+    Parameters:
+    -----------
+      codes (numpy.ndarray) - An integer array with the sample code of each event.
+                              Codes are positions in the value arrays.
+
+      values (numpy.ndarray) - Any number of arrays with one value per sample code.
+
+    Returns:
+    --------
+      An array for each array in values, with the same shape as codes.
+      If only one array is given, just that one array is returned.
+
+    Raises:
+    -------
+      ImportError - If NumPy is not installed.
+
+      TypeError - If codes are not integers.
+
+      IndexError - If any code is negative or too large for the value arrays.
+    """
+
+    _require_numpy()
+
+    codes = numpy.asarray(codes)
+
+    if codes.size and not numpy.issubdtype(codes.dtype, numpy.integer):
+        raise TypeError('Sample codes must be integers, not %s' % codes.dtype)
+
+    if codes.size:
+        low, high = codes.min(), codes.max()
+        for array in values:
+            if low < 0 or high >= len(array):
+                raise IndexError('Sample codes go from %i to %i, but there are only %i values' %
+                                 (low, high, len(array)))
+
+    output = [numpy.take(numpy.asarray(array), codes) for array in values]
+
+    return output[0] if len(output) == 1 else tuple(output)
+
+
+class XSecTable(object):
+    """
+    The cross sections of a list of samples, where each sample is identified by its position in the list.
+    """
+
+    def __init__(self, samples, cnf=None, energy=13, on_error='raise', chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        The cross sections are looked up right away.
+        Parameters are the same as get_xsec_arrays, but samples should not repeat.
+        """
+
+        self.samples = [as_str(sample) for sample in samples]
+        self.energy = energy
+        self.codes = dict([(sample, code) for code, sample in enumerate(self.samples)])
+
+        if len(self.codes) != len(self.samples):
+            raise ValueError('Samples in an XSecTable cannot repeat')
+
+        self.xs, self.uncert = get_xsec_arrays(self.samples, cnf, energy, on_error, chunk_size)
+
+    def encode(self, names):
+        """
+        Turn an array of sample names into an array of codes for this table.
+
+        Raises:
+        -------
+          KeyError - If a name is not in the table.
+        """
+
+        _require_numpy()
+
+        names = numpy.asarray(names)
+        unique, inverse = numpy.unique(names.ravel(), return_inverse=True)
+        unique_codes = numpy.array([self.codes[as_str(name)] for name in unique], dtype=numpy.intp)
+
+        return unique_codes[inverse].reshape(names.shape)
+
+    def gather(self, codes):
+        """
+        Returns:
+        --------
+          Arrays of cross sections and uncertainties for each event code. See the gather function.
+        """
+
+        return gather(codes, self.xs, self.uncert)
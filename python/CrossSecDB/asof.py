@@ -0,0 +1,262 @@
+"""
+Cross sections as they were at some time in the past, read from the history tables.
+
+    from CrossSecDB.reader import get_xsec
+
+    print get_xsec(samples, as_of='2017-06-01 12:00:00')
+
+Each chunk of samples is read with one query, which uses the (sample, last_updated) key of the history
+to find the latest entry of each sample at or before the time.
+Samples without an entry that old in the history are looked for in the archive tables (see CrossSecDB.archive).
+
+Once the time is a few seconds (SAFETY_LAG) before the last write to a table, the answers for that time
+should not change anymore, since any write from before then has had time to commit.
+These are kept in memory for the life of the process, so asking again for the same time does not query the database.
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import logging
+import datetime
+import threading
+
+from .backends import as_datetime
+from .connection import get_connection, chunks, default_cnf, DEFAULT_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Stored for samples that did not exist yet at the time
+MISSING = object()
+
+# The number of times to keep answers for
+MAX_SNAPSHOTS = 16
+
+# Seconds before the last write that a time must be to be kept, since writes can commit late
+SAFETY_LAG = 5
+
+TIME_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d')
+
+def parse_time(value):
+    """
+    Parameters:
+    -----------
+      value (datetime.datetime, datetime.date, or str) - A time, or a string in one of the TIME_FORMATS.
+                                                         A date without a time is the start of that day.
+
+    Returns:
+    --------
+      A datetime.datetime, to the second, since that is the precision of the database.
+
+    Raises:
+    -------
+      ValueError - If the value is not a time or a string in one of the formats.
+    """
+
+    if isinstance(value, datetime.datetime):
+        return value.replace(microsecond=0)
+
+    if isinstance(value, datetime.date):
+        return datetime.datetime(value.year, value.month, value.day)
+
+    try:
+        text = value.strip().replace('T', ' ')
+    except AttributeError:
+        raise ValueError('Time %r is not a datetime or a string' % (value,))
+
+    for time_format in TIME_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, time_format)
+        except ValueError:
+            pass
+
+    raise ValueError('Time %s is not in one of the formats %s' % (value, TIME_FORMATS))
+
+
+class AsOfSnapshot(object):
+    """
+    The cross sections in one table at one time.
+    Samples are read from the database the first time they are asked for.
+    """
+
+    def __init__(self, cnf=None, energy=13, as_of=None):
+        """
+        Parameters:
+        -----------
+          cnf (str) - Location of the MySQL connection configuration file.
+                      (default None, see XSecConnection.__init__)
+
+          energy (int) - Energy to determine the table to look up cross sections from. (default 13)
+
+          as_of (datetime.datetime or str) - The time to get the cross sections at. See parse_time.
+        """
+
+        self.cnf = cnf
+        self.energy = energy
+        self.as_of = parse_time(as_of)
+
+        # Lower case sample name: (cross section, uncertainty) or MISSING
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _query(self, conn, table, chunk):
+        """
+        Get the latest entry at or before as_of of each sample in one table.
+
+        Returns:
+        --------
+          A dictionary from lower case sample name to (cross section, uncertainty).
+        """
+
+        query = """
+                SELECT history.sample, history.cross_section, history.uncertainty
+                FROM {0} AS history JOIN
+                (SELECT sample, MAX(last_updated) AS last_updated FROM {0}
+                 WHERE sample IN ({1}) AND last_updated <= %s GROUP BY sample) AS latest
+                ON history.sample = latest.sample AND history.last_updated = latest.last_updated
+                """.format(table, ', '.join(['%s'] * len(chunk)))
+
+        logger.debug('About to execute: %s \nwith %s', query, chunk)
+        conn.curs.execute(query, list(chunk) + [self.as_of])
+
+        return dict([(sample.lower(), (xs, uncert)) for sample, xs, uncert in conn.curs.fetchall()])
+
+    def lookup_xsec(self, samples, get_uncert=False, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Look up the cross sections of many samples at the time of this snapshot.
+
+        Parameters:
+        -----------
+          samples (list) - A list of samples to get cross sections for.
+
+          get_uncert (bool) - Determines whether or not to return uncertainties too.
+
+          chunk_size (int) - The maximum number of samples to look up in a single query.
+                             (default DEFAULT_CHUNK_SIZE in CrossSecDB.connection)
+
+        Returns:
+        --------
+          The same as CrossSecDB.reader.lookup_xsec.
+        """
+
+        with self._lock:
+            to_query = sorted(set([sample.lower() for sample in samples
+                                   if sample.lower() not in self._values]))
+
+        if to_query:
+            found = {}
+
+            with get_connection(write=False, cnf=self.cnf) as conn:
+                for chunk in chunks(to_query, chunk_size):
+                    found.update(self._query(conn, 'xs_{0}TeV_history'.format(self.energy), chunk))
+
+                    # Only samples with no entry this old in the history can have one in the archive
+                    archived = [sample for sample in chunk if sample not in found]
+                    if archived:
+                        found.update(self._query(conn, 'xs_{0}TeV_history_archive'.format(self.energy), archived))
+
+            with self._lock:
+                for sample in to_query:
+                    self._values[sample] = found.get(sample, MISSING)
+
+        output = {}
+
+        for sample in samples:
+            value = self._values[sample.lower()]
+            if value is not MISSING:
+                output[sample] = value if get_uncert else value[0]
+
+        return output
+
+
+_SNAPSHOTS = {}
+
+# Keys of _SNAPSHOTS, from oldest to newest
+_ORDER = []
+
+# (cnf, energy): The last write to the table seen
+_LATEST = {}
+
+_SNAPSHOTS_LOCK = threading.Lock()
+
+def _latest_write(cnf, energy):
+    with get_connection(write=False, cnf=cnf) as conn:
+        conn.curs.execute('SELECT MAX(last_updated) FROM xs_{0}TeV_history'.format(energy))
+        return as_datetime(conn.curs.fetchone()[0])
+
+def get_snapshot(cnf=None, energy=13, as_of=None):
+    """
+    Get the snapshot of a table at a time.
+    If the time is at least SAFETY_LAG seconds before the last write to the table,
+    the snapshot is kept for later calls.
+    Otherwise, a new or late write could still change the answers, so a new snapshot is made each time.
+
+    Parameters:
+    -----------
+      The same as AsOfSnapshot.__init__.
+
+    Returns:
+    --------
+      An AsOfSnapshot.
+    """
+
+    as_of = parse_time(as_of)
+    lag = datetime.timedelta(seconds=SAFETY_LAG)
+    table = (default_cnf(cnf), energy)
+    key = table + (as_of,)
+
+    with _SNAPSHOTS_LOCK:
+        snapshot = _SNAPSHOTS.get(key)
+        if snapshot is not None:
+            return snapshot
+
+        latest = _LATEST.get(table)
+
+    if latest is None or as_of >= latest - lag:
+        # Writes only get later, so this only needs to be checked until the time is settled
+        latest = _latest_write(cnf, energy)
+
+        if latest is None or as_of >= latest - lag:
+            return AsOfSnapshot(cnf, energy, as_of)
+
+    with _SNAPSHOTS_LOCK:
+        _LATEST[table] = max(latest, _LATEST.get(table, latest))
+
+        snapshot = _SNAPSHOTS.get(key)
+        if snapshot is None:
+            snapshot = AsOfSnapshot(cnf, energy, as_of)
+            _SNAPSHOTS[key] = snapshot
+            _ORDER.append(key)
+
+            while len(_ORDER) > MAX_SNAPSHOTS:
+                del _SNAPSHOTS[_ORDER.pop(0)]
+
+    return snapshot
+
+def lookup_xsec(samples, as_of, cnf=None, energy=13, get_uncert=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Look up the cross sections of many samples at a time, without checking that they exist or are valid.
+
+    Parameters:
+    -----------
+      samples (list) - A list of samples to get cross sections for.
+
+      as_of (datetime.datetime or str) - The time to get the cross sections at. See parse_time.
+
+      The rest are the same as CrossSecDB.reader.lookup_xsec.
+
+    Returns:
+    --------
+      The same as CrossSecDB.reader.lookup_xsec.
+    """
+
+    return get_snapshot(cnf, energy, as_of).lookup_xsec(samples, get_uncert, chunk_size)
+
+def clear():
+    """
+    Drop every kept snapshot. This is needed after tables are dropped and made again, like by create_tables.
+    """
+
+    with _SNAPSHOTS_LOCK:
+        _SNAPSHOTS.clear()
+        del _ORDER[:]
+        _LATEST.clear()
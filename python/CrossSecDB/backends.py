@@ -0,0 +1,221 @@
+"""
+Storage backends for the cross section database.
+
+The backend is picked from the configuration file location (see XSecConnection.__init__).
+Locations starting with "sqlite:" or ending with .db, .sqlite, or .sqlite3 are SQLite databases.
+Everything else is a MySQL option file.
+
+All queries in this package are written with %s placeholders, like MySQLdb expects.
+The SQLite backend translates them for the sqlite3 module.
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import os
+import sqlite3
+import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+DB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'db')
+
+SQLITE_EXTENSIONS = ['.db', '.sqlite', '.sqlite3']
+
+def read_statements(file_name):
+    """
+    Quickly parse one of our .sql files into a list of statements.
+    Comment lines start with '--', and statements are separated by ';'.
+    """
+
+    with open(file_name, 'r') as sql_file:
+        return [statement for statement in \
+                    ' '.join([line.strip() for line in sql_file if line[:2] != '--']).split(';') \
+                    if statement.strip()]
+
+def as_datetime(value):
+    """
+    Make sure a time from the database is a datetime.datetime.
+    SQLite gives back strings from aggregate functions like MAX.
+    """
+
+    if value is None or isinstance(value, datetime.datetime):
+        return value
+
+    return datetime.datetime.strptime(str(value).split('.')[0], '%Y-%m-%d %H:%M:%S')
+
+
+class Backend(object):
+    """
+    The interface for storage backends.
+    """
+
+    # SQL expression for the current time
+    now = 'NOW()'
+
+    # The file with the statements that create all of the tables
+    schema_file = None
+
+    def connect(self, location, write):
+        """
+        Open a connection.
+
+        Parameters:
+        -----------
+          location (str) - The configuration file or database file.
+
+          write (bool) - Whether or not this connection is used to write.
+
+        Returns:
+        --------
+          A DB-API connection.
+        """
+
+        raise NotImplementedError
+
+    def cursor(self, conn):
+        """
+        Returns:
+        --------
+          A cursor for the connection that takes queries with %s placeholders.
+        """
+
+        return conn.cursor()
+
+    def ping(self, conn):
+        """
+        Raises one of the backend errors if the connection is not alive.
+        """
+
+        raise NotImplementedError
+
+    def errors(self):
+        """
+        Returns:
+        --------
+          A tuple of (base error class, error class for lost connections).
+        """
+
+        raise NotImplementedError
+
+
+class MySQLBackend(Backend):
+    """
+    The central MySQL server. MySQLdb is only imported when this is used.
+    """
+
+    schema_file = os.path.join(DB_DIR, 'cross_sections.sql')
+
+    def connect(self, location, write):
+        import MySQLdb
+
+        return MySQLdb.connect(read_default_file=location,
+                               read_default_group='mysql-crosssec-%s' % ('writer' if write else 'reader'),
+                               db='cross_sections')
+
+    def ping(self, conn):
+        conn.ping()
+
+    def errors(self):
+        import MySQLdb
+
+        return MySQLdb.Error, MySQLdb.OperationalError
+
+
+class SQLiteCursor(object):
+    """
+    Wraps a sqlite3 cursor to take %s placeholders.
+    """
+
+    def __init__(self, curs):
+        self.curs = curs
+
+    def execute(self, query, params=()):
+        return self.curs.execute(query.replace('%s', '?'), tuple(params))
+
+    def executemany(self, query, seq_of_params):
+        return self.curs.executemany(query.replace('%s', '?'), seq_of_params)
+
+    def __getattr__(self, name):
+        return getattr(self.curs, name)
+
+    def __iter__(self):
+        return iter(self.curs)
+
+
+class SQLiteBackend(Backend):
+    """
+    A single SQLite file, with the same tables as the MySQL database.
+    Useful for fast local reads from a copied database, and for tests without a server.
+    """
+
+    now = "datetime('now', 'localtime')"
+
+    schema_file = os.path.join(DB_DIR, 'cross_sections_sqlite.sql')
+
+    def __init__(self):
+        # Store and read back times the same way as MySQLdb
+        sqlite3.register_adapter(datetime.datetime, lambda value: value.strftime('%Y-%m-%d %H:%M:%S'))
+        sqlite3.register_converter('DATETIME', lambda value: as_datetime(value.decode('utf-8')))
+
+    def connect(self, location, write):
+        path = config_path(location)
+
+        # Readers should not make an empty database by accident
+        if not write and not os.path.exists(path):
+            raise sqlite3.OperationalError('Database file %s does not exist' % path)
+
+        conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES,
+                               timeout=30, check_same_thread=False)
+
+        # Match the case sensitivity of MySQL's default collation in LIKE
+        conn.execute('PRAGMA case_sensitive_like = OFF')
+
+        return conn
+
+    def cursor(self, conn):
+        return SQLiteCursor(conn.cursor())
+
+    def ping(self, conn):
+        conn.execute('SELECT 1')
+
+    def errors(self):
+        return sqlite3.Error, sqlite3.OperationalError
+
+
+def config_path(location):
+    """
+    Get the path of the file that a configuration location points to.
+    """
+
+    return location[len('sqlite:'):] if location.startswith('sqlite:') else location
+
+def is_sqlite(location):
+    """
+    Check if a configuration location points to a SQLite database.
+    """
+
+    return location.startswith('sqlite:') or \
+        os.path.splitext(location)[1].lower() in SQLITE_EXTENSIONS
+
+_BACKENDS = {}
+
+def get_backend(location):
+    """
+    Get the backend for a configuration location.
+
+    Parameters:
+    -----------
+      location (str) - The configuration file or database file.
+
+    Returns:
+    --------
+      A Backend instance.
+    """
+
+    backend_class = SQLiteBackend if is_sqlite(location) else MySQLBackend
+
+    if backend_class not in _BACKENDS:
+        _BACKENDS[backend_class] = backend_class()
+
+    return _BACKENDS[backend_class]
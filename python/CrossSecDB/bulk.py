@@ -0,0 +1,197 @@
+"""
+Tools for loading large numbers of cross sections from a file.
+Rows are read and checked one at a time, and written in chunks with put_xsec.
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import os
+import csv
+import json
+import math
+import time
+import logging
+
+from .inserter import put_xsec, BadInput
+from .profiling import profiled
+
+logger = logging.getLogger(__name__)
+
+# The order of columns in CSV and TSV files, and the keys of JSON lines
+COLUMNS = ('sample', 'cross_section', 'uncertainty', 'source', 'comments')
+
+FORMATS = {
+    '.csv': 'csv',
+    '.tsv': 'tsv',
+    '.txt': 'tsv',
+    '.json': 'jsonl',
+    '.jsonl': 'jsonl'
+    }
+
+def guess_format(file_name):
+    """
+    Guess the format of a file from its extension.
+
+    Returns:
+    --------
+      'csv', 'tsv', or 'jsonl'. Defaults to 'csv' for unknown extensions and STDIN.
+    """
+
+    return FORMATS.get(os.path.splitext(file_name)[1].lower(), 'csv')
+
+def _raw_rows(stream, fmt):
+    """
+    Generator of (line number, dictionary) for each entry in the stream.
+    """
+
+    if fmt == 'jsonl':
+        for line_num, line in enumerate(stream, 1):
+            if line.strip():
+                try:
+                    entry = json.loads(line)
+                except ValueError as err:
+                    raise BadInput('Line %i: %s' % (line_num, err))
+                if not isinstance(entry, dict):
+                    raise BadInput('Line %i: Expected a JSON object' % line_num)
+                yield line_num, entry
+
+    elif fmt in ['csv', 'tsv']:
+        for line_num, row in enumerate(csv.reader(stream, delimiter=',' if fmt == 'csv' else '\t'), 1):
+            # Skip empty lines, comments, and a header
+            if not row or row[0].startswith('#') or (line_num == 1 and row[0].strip() == COLUMNS[0]):
+                continue
+            if len(row) > len(COLUMNS):
+                raise BadInput('Line %i: Too many columns (%i)' % (line_num, len(row)))
+            yield line_num, dict(zip(COLUMNS, [field.strip() for field in row]))
+
+    else:
+        raise BadInput('Unknown format %s' % fmt)
+
+def read_rows(stream, fmt='csv', source='', comments=''):
+    """
+    Generator that reads and checks rows from an open file.
+
+    Parameters:
+    -----------
+      stream (file) - An open file or other iterable of lines, like sys.stdin.
+
+      fmt (str) - The format of the file. Can be 'csv', 'tsv', or 'jsonl'.
+                  CSV and TSV files have columns in the order of COLUMNS.
+                  Everything after the cross section column is optional.
+                  JSON lines are objects with the keys in COLUMNS.
+
+      source (str) - The source for rows that do not give their own.
+
+      comments (str) - The comments for rows that do not give their own.
+
+    Returns:
+    --------
+      Yields tuples of (sample, cross section, uncertainty, source, comments).
+
+    Raises:
+    -------
+      BadInput - For the first bad row, with its line number.
+                 Rows before that have already been yielded.
+    """
+
+    seen = {}
+
+    for line_num, entry in _raw_rows(stream, fmt):
+        sample = entry.get('sample')
+        if not sample:
+            raise BadInput('Line %i: Missing sample name' % line_num)
+
+        if sample in seen:
+            raise BadInput('Line %i: Sample %s was already given on line %i' % (line_num, sample, seen[sample]))
+        seen[sample] = line_num
+
+        try:
+            xs = float(entry.get('cross_section'))
+            unc = float(entry.get('uncertainty') or 0.0)
+        except (TypeError, ValueError):
+            raise BadInput('Line %i: Cross section and uncertainty must be numbers' % line_num)
+
+        for value in (xs, unc):
+            if math.isnan(value) or math.isinf(value):
+                raise BadInput('Line %i: Cross section and uncertainty must be finite, not %s' % (line_num, value))
+
+        if xs < 0:
+            raise BadInput('Line %i: Negative cross section %s detected' % (line_num, xs))
+
+        row_source = entry.get('source') or source
+        if not row_source:
+            raise BadInput('Line %i: Source of cross sections recommended for proper documentation.' % line_num)
+
+        yield (sample, xs, unc, row_source, entry.get('comments') or comments)
+
+@profiled('bulk.load_rows')
+def load_rows(rows, chunk_size=1000, cnf=None, energy=13, callback=None, notifier=None):
+    """
+    Put rows into the database with one put_xsec call for each chunk of rows.
+
+    Parameters:
+    -----------
+      rows (iterable) - Tuples of (sample, cross section, uncertainty, source, comments),
+                        like the ones from read_rows.
+
+      chunk_size (int) - The number of rows to write in each transaction. (default 1000)
+
+      cnf (str) - Location of the MySQL connection configuration file.
+                  (default None, see XSecConnection.__init__)
+
+      energy (int) - Energy to determine the table to insert the cross sections into.
+                     (default 13)
+
+      callback (function) - If given, called after each chunk is committed with
+                            (chunk number, number of rows, seconds taken).
+                            If a later chunk fails, the chunks given to the callback stay committed.
+
+      notifier (CrossSecDB.notify.Notifier) - Reports the entries of each chunk.
+                                              (default None, see put_xsec)
+
+    Returns:
+    --------
+      A dictionary summarizing the load with the following keys:
+
+        - rows: The total number of rows written
+        - seconds: The total time taken, including reading the input
+        - rows_per_second: The average rate
+        - chunks: A list of (number of rows, seconds) for each chunk
+    """
+
+    if chunk_size < 1:
+        raise BadInput('Chunk size must be positive, not %s' % chunk_size)
+
+    report = {'rows': 0, 'chunks': []}
+    start = time.time()
+
+    def write(chunk):
+        chunk_start = time.time()
+
+        samples, cross_sections, uncertainties, sources, commentses = [list(column) for column in zip(*chunk)]
+        put_xsec(samples, cross_sections, sources, commentses, cnf=cnf, energy=energy,
+                 uncertainties=uncertainties, notifier=notifier)
+
+        elapsed = time.time() - chunk_start
+        report['rows'] += len(chunk)
+        report['chunks'].append((len(chunk), elapsed))
+
+        logger.debug('Chunk %i: %i rows in %f seconds', len(report['chunks']), len(chunk), elapsed)
+        if callback is not None:
+            callback(len(report['chunks']), len(chunk), elapsed)
+
+    chunk = []
+
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            write(chunk)
+            chunk = []
+
+    if chunk:
+        write(chunk)
+
+    report['seconds'] = time.time() - start
+    report['rows_per_second'] = report['rows']/report['seconds'] if report['seconds'] else 0.0
+
+    return report
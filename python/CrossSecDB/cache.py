@@ -0,0 +1,229 @@
+"""
+An optional in-process cache for cross section lookups.
+It is off by default. Turn it on with enable():
+
+    from CrossSecDB import cache
+    cache.enable(max_size=5000, ttl=600)
+
+After that, CrossSecDB.reader.get_xsec answers repeated lookups from memory,
+and CrossSecDB.inserter.put_xsec drops the entries it writes.
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import time
+import threading
+
+from .connection import default_cnf
+
+# Stored for samples that are not in the database, so they do not hit the database every time
+MISSING = object()
+
+# Returned by XSecCache.get when the key is not cached
+NOT_CACHED = object()
+
+# Positions inside each node of the linked list
+_PREV, _NEXT, _KEY, _VALUE, _EXPIRES = range(5)
+
+class XSecCache(object):
+    """
+    A thread-safe least recently used cache where each entry also expires after some time.
+    Keys are (cnf, energy, sample, get_uncert).
+    """
+
+    def __init__(self, max_size=10000, ttl=300, negative_ttl=None):
+        """
+        Parameters:
+        -----------
+          max_size (int) - The maximum number of entries to keep.
+                           The least recently used entry is dropped first. (default 10000)
+
+          ttl (float) - Number of seconds before a cached cross section expires.
+                        If None, entries never expire. (default 300)
+
+          negative_ttl (float) - Number of seconds before a cached missing sample expires.
+                                 (default None, which uses the same value as ttl)
+        """
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        # Circular doubly linked list, with the most recently used entry right after the root
+        self._root = [None, None, None, None, None]
+        self._root[_PREV] = self._root[_NEXT] = self._root
+        self._nodes = {}
+
+    def _unlink(self, node):
+        node[_PREV][_NEXT] = node[_NEXT]
+        node[_NEXT][_PREV] = node[_PREV]
+
+    def _link_front(self, node):
+        root = self._root
+        node[_PREV] = root
+        node[_NEXT] = root[_NEXT]
+        root[_NEXT][_PREV] = node
+        root[_NEXT] = node
+
+    def _remove(self, node):
+        self._unlink(node)
+        del self._nodes[node[_KEY]]
+
+    @staticmethod
+    def make_key(cnf, energy, sample, get_uncert):
+        """
+        Build the key for a lookup, so that all ways of pointing to the default cnf match.
+        Sample names are matched without regard to case, like the database does.
+        """
+
+        return (default_cnf(cnf), energy, sample.lower(), bool(get_uncert))
+
+    def get(self, key):
+        """
+        Get a value from the cache.
+
+        Returns:
+        --------
+          The cached value, MISSING if the sample is known to not exist,
+          or NOT_CACHED if the key is not in the cache or has expired.
+        """
+
+        with self._lock:
+            node = self._nodes.get(key)
+
+            if node is not None and node[_EXPIRES] is not None and node[_EXPIRES] < time.time():
+                self._remove(node)
+                node = None
+
+            if node is None:
+                self.misses += 1
+                return NOT_CACHED
+
+            self.hits += 1
+            self._unlink(node)
+            self._link_front(node)
+
+            return node[_VALUE]
+
+    def put(self, key, value):
+        """
+        Store a value in the cache.
+        Store MISSING to remember that a sample does not exist.
+        """
+
+        ttl = self.negative_ttl if value is MISSING else self.ttl
+        expires = None if ttl is None else time.time() + ttl
+
+        with self._lock:
+            node = self._nodes.get(key)
+
+            if node is not None:
+                self._unlink(node)
+                node[_VALUE] = value
+                node[_EXPIRES] = expires
+            else:
+                node = [None, None, key, value, expires]
+                self._nodes[key] = node
+
+            self._link_front(node)
+
+            while len(self._nodes) > self.max_size:
+                self._remove(self._root[_PREV])
+                self.evictions += 1
+
+    def invalidate(self, cnf, energy, samples):
+        """
+        Drop any cached values for samples at a given energy.
+
+        Parameters:
+        -----------
+          cnf (str) - The configuration file used to connect. (see XSecConnection.__init__)
+
+          energy (int) - The energy of the table the samples were written to.
+
+          samples (list) - The samples to drop from the cache.
+        """
+
+        with self._lock:
+            for sample in samples:
+                for get_uncert in (False, True):
+                    node = self._nodes.get(self.make_key(cnf, energy, sample, get_uncert))
+                    if node is not None:
+                        self._remove(node)
+
+    def clear(self):
+        """
+        Drop everything in the cache. The counters are not reset.
+        """
+
+        with self._lock:
+            self._clear()
+
+    def stats(self):
+        """
+        Returns:
+        --------
+          A dictionary with the current size of the cache,
+          and the number of hits, misses, and evictions so far.
+        """
+
+        with self._lock:
+            return {
+                'size': len(self._nodes),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+                }
+
+
+_CACHE = None
+
+def enable(max_size=10000, ttl=300, negative_ttl=None):
+    """
+    Start caching reads made through CrossSecDB.reader.get_xsec in this process.
+    Parameters are the same as XSecCache.__init__.
+
+    Returns:
+    --------
+      The XSecCache that is now in use.
+    """
+
+    global _CACHE
+    _CACHE = XSecCache(max_size=max_size, ttl=ttl, negative_ttl=negative_ttl)
+
+    return _CACHE
+
+def disable():
+    """
+    Stop caching reads and drop the cache.
+    """
+
+    global _CACHE
+    _CACHE = None
+
+def current():
+    """
+    Returns:
+    --------
+      The XSecCache in use, or None if caching is not enabled.
+    """
+
+    return _CACHE
+
+def invalidate(cnf, energy, samples):
+    """
+    Drop cached values for samples, if caching is enabled.
+    See XSecCache.invalidate for the parameters.
+    """
+
+    xs_cache = _CACHE
+    if xs_cache is not None:
+        xs_cache.invalidate(cnf, energy, samples)
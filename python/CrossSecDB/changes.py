@@ -0,0 +1,207 @@
+"""
+A feed of the changes to the database, for keeping copies of it up to date.
+Every write is copied into the history tables, so the feed reads those.
+
+    from CrossSecDB.changes import get_changes
+
+    for change in get_changes(cursor=last_cursor):
+        apply_to_my_copy(change)
+        last_cursor = change['cursor']
+
+Changes come out in order of (last_updated, energy, sample).
+Each change has a cursor, which is a string that can be stored
+and passed back to get_changes to continue right after that change.
+
+The time of a write is set when it starts, but other readers only see it once it commits.
+A write that commits late, or finishes during the same second as the last change read,
+can land before a cursor that was already handed out and be skipped.
+To avoid this, changes are only read up to a few seconds (lag) before the current time of the database.
+A write that takes longer than the lag to commit can still be skipped.
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import heapq
+import logging
+import datetime
+
+from .backends import as_datetime
+from .connection import get_connection, ENERGIES
+
+logger = logging.getLogger(__name__)
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Seconds before the current time of the database to stop reading at
+DEFAULT_LAG = 5
+
+COLUMNS = ('sample', 'cross_section', 'uncertainty', 'last_updated', 'source', 'comments')
+
+class BadCursor(Exception):
+    pass
+
+def make_cursor(last_updated, energy, sample):
+    """
+    Returns:
+    --------
+      The cursor string for a change.
+    """
+
+    return '%s|%i|%s' % (last_updated.strftime(TIME_FORMAT), energy, sample)
+
+def parse_cursor(cursor):
+    """
+    Parameters:
+    -----------
+      cursor (str) - A cursor from make_cursor.
+
+    Returns:
+    --------
+      A tuple of (last_updated, energy, sample).
+
+    Raises:
+    -------
+      BadCursor - If the cursor could not be read.
+    """
+
+    try:
+        last_updated, energy, sample = cursor.split('|', 2)
+        return datetime.datetime.strptime(last_updated, TIME_FORMAT), int(energy), sample
+    except ValueError:
+        raise BadCursor('Could not read cursor: %s' % cursor)
+
+def _energy_changes(energy, start, cnf, until, page_size):
+    """
+    Generator of (last_updated, energy, sample, change) for one energy, starting after start.
+
+    Parameters:
+    -----------
+      energy (int) - The energy of the history table to read.
+
+      start (tuple) - The (last_updated, energy, sample) of the last change already read.
+                      The energy and sample can be None to start after all changes at last_updated.
+    """
+
+    last_updated, start_energy, sample = start
+
+    # Start right after the cursor, keeping the index on last_updated useful
+
+    if last_updated is None:
+        where = '1 = 1'
+        params = []
+    elif start_energy is None or energy < start_energy:
+        where = 'last_updated > %s'
+        params = [last_updated]
+    elif energy > start_energy:
+        where = 'last_updated >= %s'
+        params = [last_updated]
+    else:
+        where = 'last_updated >= %s AND (last_updated > %s OR sample > %s)'
+        params = [last_updated, last_updated, sample]
+
+    until_where = ''
+    until_params = []
+    if until is not None:
+        until_where = ' AND last_updated <= %s'
+        until_params = [until]
+
+    while True:
+        query = 'SELECT {0} FROM xs_{1}TeV_history WHERE {2}{3} ORDER BY last_updated, sample LIMIT {4}'.format(
+            ', '.join(COLUMNS), energy, where, until_where, page_size)
+
+        # Only hold a connection while reading a page, since the consumer can take its time
+        with get_connection(write=False, cnf=cnf) as conn:
+            logger.debug('About to execute: %s \nwith %s', query, params + until_params)
+            conn.curs.execute(query, params + until_params)
+            rows = conn.curs.fetchall()
+
+        for row in rows:
+            change = dict(zip(COLUMNS, row))
+            change['last_updated'] = as_datetime(change['last_updated'])
+            change['energy'] = energy
+            change['cursor'] = make_cursor(change['last_updated'], energy, change['sample'])
+
+            yield change['last_updated'], energy, change['sample'], change
+
+        if len(rows) < page_size:
+            break
+
+        # The next page starts after the last change of this one
+        where = 'last_updated >= %s AND (last_updated > %s OR sample > %s)'
+        params = [rows[-1][3], rows[-1][3], rows[-1][0]]
+
+def _database_time(cnf):
+    """
+    Get the current time of the database, which is the clock that last_updated is set with.
+    """
+
+    with get_connection(write=False, cnf=cnf) as conn:
+        conn.curs.execute('SELECT {0}'.format(conn.backend.now))
+        return as_datetime(conn.curs.fetchone()[0])
+
+def get_changes(since=None, cursor=None, energies=ENERGIES, cnf=None, until=None, page_size=1000,
+                lag=DEFAULT_LAG):
+    """
+    Generator of all of the changes after a time or cursor, across energies.
+    Changes are read from the database one page at a time, as they are needed.
+
+    Parameters:
+    -----------
+      since (datetime.datetime) - Only give changes after this time.
+                                  If neither since nor cursor is given, every change is given.
+
+      cursor (str) - Only give changes after the change with this cursor.
+                     Takes precedence over since.
+
+      energies (list) - The energies to give changes for.
+                        (default ENERGIES in CrossSecDB.connection, which is all of them)
+
+      cnf (str) - Location of the MySQL connection configuration file.
+                  (default None, see XSecConnection.__init__)
+
+      until (datetime.datetime) - If given, only give changes up to and including this time.
+
+      page_size (int) - The number of changes to read from each table at once. (default 1000)
+
+      lag (float) - Only give changes at least this many seconds older than the current time of the database,
+                    so that writes still being committed are not skipped. (default DEFAULT_LAG)
+
+    Returns:
+    --------
+      A generator of dictionaries, in order of last_updated, then energy, then sample.
+      Each dictionary has the keys:
+
+        - sample
+        - energy
+        - cross_section
+        - uncertainty
+        - last_updated
+        - source
+        - comments
+        - cursor
+
+    Raises:
+    -------
+      BadCursor - If the cursor could not be read.
+
+      ValueError - If there is no table for one of the energies.
+    """
+
+    for energy in energies:
+        if energy not in ENERGIES:
+            raise ValueError('There is no table for energy %s. Valid energies are %s' % (energy, ENERGIES))
+
+    if cursor:
+        start = parse_cursor(cursor)
+    else:
+        start = (since, None, None)
+
+    if lag:
+        # Changes after this can still be committing, so the cursor should not pass them yet
+        settled = _database_time(cnf) - datetime.timedelta(seconds=lag)
+        until = settled if until is None else min(until, settled)
+
+    # Each table is already in order, so they only need to be merged
+    streams = [_energy_changes(energy, start, cnf, until, page_size) for energy in sorted(set(energies))]
+
+    return (change for _, _, _, change in heapq.merge(*streams))
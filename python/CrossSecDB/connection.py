@@ -0,0 +1,383 @@
+"""
+Connections to the cross section database, and a pool to reuse them.
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import os
+import time
+import atexit
+import logging
+import threading
+
+from contextlib import contextmanager
+
+from . import profiling
+from .backends import get_backend, read_statements
+
+logger = logging.getLogger(__name__)
+
+# The energies that have tables in the database
+ENERGIES = [7, 8, 13, 14]
+
+# Number of samples placed into a single "WHERE sample IN (...)" clause
+DEFAULT_CHUNK_SIZE = 500
+
+def chunks(values, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Generator that splits a list into lists of at most chunk_size elements.
+
+    Parameters:
+    -----------
+      values (list) - The list to split up.
+
+      chunk_size (int) - The maximum length of each yielded list.
+                         (default DEFAULT_CHUNK_SIZE)
+    """
+
+    if chunk_size < 1:
+        raise ValueError('Chunk size must be positive, not %s' % chunk_size)
+
+    for start in range(0, len(values), chunk_size):
+        yield values[start:start + chunk_size]
+
+def default_cnf(cnf=None):
+    """
+    Get the location of the configuration file that will be used for a given cnf argument.
+    """
+
+    return cnf or os.environ.get('XSECCONF', '/home/dabercro/xsec.cnf')
+
+class XSecConnection(object):
+    """
+    A simple connector for cross section database.
+    The connection is closed by close() or by leaving a with block.
+    Use the pool, through get_connection, to reuse connections.
+    """
+
+    def __init__(self, write=False, cnf=None):
+        """
+        Parameters:
+        -----------
+          write (bool) - Lets the connection know what permissions to log onto the server with.
+                         (default False)
+
+          cnf (str) - The location of the configuration file with the default login parameters.
+                      The default location should be maintained to log onto a central server.
+                      If this starts with 'sqlite:' or ends with .db, .sqlite, or .sqlite3,
+                      it is instead a SQLite database file. See CrossSecDB.backends.
+        """
+
+        default_file = default_cnf(cnf)
+        which_user = 'writer' if write else 'reader'
+
+        self.key = (default_file, which_user)
+        self.logger = logging.getLogger('Connection_%s_%s' % (which_user, default_file))
+
+        self.backend = get_backend(default_file)
+        self.Error, self.OperationalError = self.backend.errors()
+
+        self.logger.debug('Opening connection')
+        start = time.time()
+        self.conn = self.backend.connect(default_file, write)
+
+        profiler = profiling.current()
+        if profiler is not None:
+            profiler.record('connect', '%s (%s)' % self.key, time.time() - start)
+
+        # The cursor records statements when profiling is enabled
+        self.curs = profiling.ProfiledCursor(self.backend.cursor(self.conn))
+
+        # Kept for the pool to tell how long this connection has been idle
+        self.last_used = time.time()
+        self.closed = False
+
+    def ping(self):
+        """
+        Check if the connection to the server is still alive.
+
+        Returns:
+        --------
+          True if the server answered, False otherwise.
+        """
+
+        try:
+            self.backend.ping(self.conn)
+        except self.Error as err:
+            self.logger.debug('Ping failed: %s', err)
+            return False
+
+        return True
+
+    def close(self):
+        """
+        Close the connection, if it is not closed already.
+        """
+
+        if not self.closed:
+            self.logger.debug('Closing connection')
+            self.closed = True
+            try:
+                self.conn.close()
+            except self.Error as err:
+                self.logger.debug('Error while closing: %s', err)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __del__(self):
+        # Only a fallback for connections that were never closed explicitly
+        if not getattr(self, 'closed', True):
+            self.close()
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool(object):
+    """
+    A thread-safe pool of idle XSecConnection objects.
+    Connections are kept separately for each (cnf, reader/writer) pair.
+    """
+
+    def __init__(self, max_size=4, idle_timeout=300, max_open=None, wait_timeout=30):
+        """
+        Parameters:
+        -----------
+          max_size (int) - The maximum number of idle connections kept for each
+                           (cnf, reader/writer) pair. Extra connections are closed when returned.
+                           This does not limit the number of connections in use. (default 4)
+
+          idle_timeout (float) - The number of seconds a connection can sit unused in the pool
+                                 before it is closed instead of reused.
+                                 (default 300)
+
+          max_open (int) - The maximum number of connections open at once, in use or idle,
+                           for each (cnf, reader/writer) pair. When this many are open,
+                           acquire waits for one to be released. (default None, for no limit)
+
+          wait_timeout (float) - The number of seconds acquire waits for a connection
+                                 when max_open are already open. (default 30)
+        """
+
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_open = max_open
+        self.wait_timeout = wait_timeout
+
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+        self._idle = {}
+        # Number of connections from this pool that are open, in use or idle
+        self._open = {}
+        self._pid = os.getpid()
+
+    def _check_fork(self):
+        """
+        Forget, without closing, connections that were opened by a parent process.
+        Must be called while holding the lock.
+        """
+
+        if self._pid != os.getpid():
+            for conns in self._idle.values():
+                for conn in conns:
+                    # The socket belongs to the parent, so don't say goodbye to the server
+                    conn.closed = True
+            self._idle = {}
+            self._open = {}
+            self._pid = os.getpid()
+
+    def _closed(self, key):
+        """
+        Count a connection as closed, and wake up anyone waiting for one.
+        """
+
+        with self._lock:
+            if self._open.get(key):
+                self._open[key] -= 1
+            self._released.notify()
+
+    def acquire(self, write=False, cnf=None):
+        """
+        Get a live connection from the pool, or open a new one.
+
+        Parameters:
+        -----------
+          write (bool) - Whether to get a writer connection. (default False)
+
+          cnf (str) - The location of the configuration file. (default None, see XSecConnection.__init__)
+
+        Returns:
+        --------
+          An XSecConnection. Give it back with release when done.
+
+        Raises:
+        -------
+          PoolTimeout - If max_open connections stay in use for longer than wait_timeout.
+        """
+
+        key = (default_cnf(cnf), 'writer' if write else 'reader')
+        now = time.time()
+
+        while True:
+            with self._lock:
+                self._check_fork()
+                deadline = time.time() + self.wait_timeout
+
+                while True:
+                    idle = self._idle.get(key)
+                    conn = idle.pop() if idle else None
+
+                    if conn is not None or self.max_open is None or self._open.get(key, 0) < self.max_open:
+                        break
+
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise PoolTimeout('All %i connections to %s are in use' % (self.max_open, key[0]))
+                    self._released.wait(remaining)
+                    self._check_fork()
+
+                if conn is None:
+                    # Take the slot before connecting, so other threads do not go over the limit
+                    self._open[key] = self._open.get(key, 0) + 1
+
+            if conn is None:
+                try:
+                    return XSecConnection(write=write, cnf=cnf)
+                except Exception:
+                    self._closed(key)
+                    raise
+
+            # Throw away connections that have been sitting around or have died
+            if now - conn.last_used > self.idle_timeout:
+                logger.debug('Connection idle for too long')
+                conn.close()
+                self._closed(key)
+            elif not conn.ping():
+                logger.debug('Reconnecting')
+                conn.close()
+                self._closed(key)
+            else:
+                return conn
+
+    def release(self, conn, broken=False):
+        """
+        Give a connection back to the pool.
+        Any open transaction is rolled back, so the next user gets a fresh view of the database.
+
+        Parameters:
+        -----------
+          conn (XSecConnection) - The connection acquired from this pool.
+
+          broken (bool) - If True, the connection is closed instead of reused.
+        """
+
+        if conn.closed:
+            self._closed(conn.key)
+            return
+
+        if not broken:
+            try:
+                conn.conn.rollback()
+            except conn.Error as err:
+                logger.debug('Rollback failed: %s', err)
+                broken = True
+
+        if not broken:
+            conn.last_used = time.time()
+            with self._lock:
+                self._check_fork()
+                idle = self._idle.setdefault(conn.key, [])
+                if len(idle) < self.max_size:
+                    idle.append(conn)
+                    self._released.notify()
+                    return
+
+        conn.close()
+        self._closed(conn.key)
+
+    @contextmanager
+    def connection(self, write=False, cnf=None):
+        """
+        Context manager that acquires a connection and always returns it to the pool.
+        If a database OperationalError leaves the with block, the connection is
+        assumed to be lost and is closed instead of returned.
+
+        Parameters:
+        -----------
+          write (bool) - Whether to get a writer connection. (default False)
+
+          cnf (str) - The location of the configuration file. (default None, see XSecConnection.__init__)
+        """
+
+        conn = self.acquire(write=write, cnf=cnf)
+        broken = False
+
+        try:
+            yield conn
+        except conn.OperationalError:
+            broken = True
+            raise
+        finally:
+            self.release(conn, broken)
+
+    def clear(self):
+        """
+        Close all of the idle connections in the pool.
+        """
+
+        with self._lock:
+            self._check_fork()
+            idle = self._idle
+            self._idle = {}
+
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+                self._closed(conn.key)
+
+
+# The process-wide pool used by the reader and inserter functions
+POOL = ConnectionPool()
+atexit.register(POOL.clear)
+
+def get_connection(write=False, cnf=None):
+    """
+    Get a context manager for a pooled connection from the process-wide pool.
+
+    Example:
+    --------
+      with get_connection(cnf=cnf) as conn:
+          conn.curs.execute('SELECT cross_section FROM xs_13TeV WHERE sample=%s', (sample,))
+
+    Parameters:
+    -----------
+      write (bool) - Whether to get a writer connection. (default False)
+
+      cnf (str) - The location of the configuration file. (default None, see XSecConnection.__init__)
+    """
+
+    return POOL.connection(write=write, cnf=cnf)
+
+
+def create_tables(cnf=None):
+    """
+    Drop and recreate all of the tables in a database.
+    Only use this for fresh installs and tests.
+
+    Parameters:
+    -----------
+      cnf (str) - The location of the configuration file or SQLite database.
+                  (default None, see XSecConnection.__init__)
+    """
+
+    with get_connection(write=True, cnf=cnf) as conn:
+        for statement in read_statements(conn.backend.schema_file):
+            logger.debug('About to execute line:\n%s', statement)
+            conn.curs.execute(statement)
+
+        conn.conn.commit()
@@ -0,0 +1,549 @@
+"""
+Runs the GenXSecAnalyzer over many datasets at once, and puts the results into the database.
+The files of each dataset are found with das_client, split into jobs of a few files each,
+and every job runs cmsRun in a pool of worker processes.
+The cross sections from all of the datasets are then put into the database with a single call to put_xsec.
+
+    from CrossSecDB.genxsec import run_datasets, ingest
+
+    results = run_datasets(datasets, workers=8, timeout=3600)
+    ingest(results)
+
+Logs from cmsRun jobs that were run some other way can be read with read_logs, and put in with ingest as well.
+Logs are read one line at a time, so they can be any size, and can come from a pipe.
+
+The cmsRun and das_client executables can be replaced, which is how this module is tested without CMSSW.
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import os
+import re
+import sys
+import time
+import signal
+import logging
+import threading
+import subprocess
+import multiprocessing
+
+from .inserter import put_xsec
+
+logger = logging.getLogger(__name__)
+
+# The line of cmsRun output with the cross section, after any generator filter
+FINAL_XSEC = 'final cross section'
+
+# Gives the number of events that a job ran over, like:
+#   Filter efficiency (event-level)= (161939) / (161939) = 1.000e+00 +- 0.000e+00
+EVENT_LEVEL = re.compile(r'Filter efficiency \(event-level\)\s*=\s*\(\s*([-+.\deE]+)\s*\)\s*/\s*\(\s*([-+.\deE]+)\s*\)')
+
+REDIRECTOR = 'root://cms-xrd-global.cern.ch/'
+
+SOURCE = 'unmodified GenXSecAnalyzer'
+
+class GenXSecError(Exception):
+    pass
+
+def cms_name(dataset):
+    """
+    Parameters:
+    -----------
+      dataset (str) - A dataset in CMS notation (/Process/Conditions/DataTier)
+                      or MIT notation (Process+Conditions+DataTier).
+
+    Returns:
+    --------
+      The dataset in CMS notation.
+    """
+
+    if dataset.startswith('/'):
+        return dataset
+
+    return '/' + dataset.replace('+', '/')
+
+def sample_name(dataset):
+    """
+    Returns:
+    --------
+      The name of the sample in the database for a dataset, which is the process name.
+    """
+
+    return cms_name(dataset).split('/')[1]
+
+def check_samples(datasets):
+    """
+    Make sure that no two datasets would be put into the database as the same sample.
+    Sample names are compared without regard to case, like the database does.
+
+    Parameters:
+    -----------
+      datasets (list) - The datasets, in either notation of cms_name, without repeats.
+
+    Raises:
+    -------
+      GenXSecError - If two datasets have the same process name.
+    """
+
+    by_sample = {}
+    for dataset in datasets:
+        by_sample.setdefault(sample_name(dataset).lower(), []).append(cms_name(dataset))
+
+    clashes = [', '.join(names) for _, names in sorted(by_sample.items()) if len(names) > 1]
+    if clashes:
+        raise GenXSecError('Datasets would be put in as the same sample: %s' % '; '.join(clashes))
+
+def run_command(command, timeout=None, parse=list):
+    """
+    Run a command and read its output one line at a time, so long logs are never held in memory.
+
+    Parameters:
+    -----------
+      command (list) - The executable and its arguments.
+
+      timeout (float) - Seconds to let the command run before killing it. (default None, for no limit)
+
+      parse (function) - Takes an iterator over the lines of STDOUT and STDERR, and returns the result.
+                         Any lines that it does not read are skipped. (default list)
+
+    Returns:
+    --------
+      The output of parse.
+
+    Raises:
+    -------
+      GenXSecError - If the command could not be run, was killed by the timeout, or failed.
+    """
+
+    logger.debug('Running: %s', command)
+
+    try:
+        # In its own process group, so that the timeout kills any children too
+        proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                universal_newlines=True, preexec_fn=os.setsid)
+    except OSError as err:
+        raise GenXSecError('Could not run %s: %s' % (command[0], err))
+
+    # Python 2 subprocess does not have a timeout, so a timer kills the process instead
+    killed = []
+
+    def kill():
+        killed.append(True)
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+    timer = None
+    if timeout:
+        timer = threading.Timer(timeout, kill)
+        timer.start()
+
+    finished = False
+
+    try:
+        lines = iter(proc.stdout.readline, '')
+        output = parse(lines)
+        # Keep reading, so that the command does not block on a full pipe
+        for _ in lines:
+            pass
+        proc.wait()
+        finished = True
+    finally:
+        if not finished:
+            # Do not leave the command running, or as a zombie, when its output could not be read
+            kill()
+            proc.wait()
+        if timer is not None:
+            timer.cancel()
+        proc.stdout.close()
+
+    if killed:
+        raise GenXSecError('%s timed out after %s seconds' % (command[0], timeout))
+    if proc.returncode:
+        raise GenXSecError('%s exited with code %i' % (command[0], proc.returncode))
+
+    return output
+
+def list_files(dataset, das_client='das_client', timeout=None, limit=None):
+    """
+    Get the files of a dataset from DAS.
+
+    Parameters:
+    -----------
+      dataset (str) - The dataset, in either notation of cms_name.
+
+      das_client (str) - The das_client executable. (default 'das_client')
+
+      timeout (float) - Seconds to wait for das_client. (default None, for no limit)
+
+      limit (int) - If given, only this many files are listed.
+
+    Returns:
+    --------
+      A list of logical file names, starting with /store.
+    """
+
+    command = [das_client, '--query', 'file dataset=%s' % cms_name(dataset)]
+    if limit:
+        command.append('--limit=%i' % limit)
+
+    return run_command(command, timeout, lambda lines: [line.strip() for line in lines if '/store' in line])
+
+def split_files(files, files_per_job):
+    """
+    Split a list of files into lists of at most files_per_job files each.
+    """
+
+    files_per_job = max(files_per_job, 1)
+    return [files[start:start + files_per_job] for start in range(0, len(files), files_per_job)]
+
+def _read_xsec(line):
+    """
+    Returns:
+    --------
+      A tuple of the cross section and uncertainty in pb, read from a line like:
+
+        After filter: final cross section = 6.149e+04 +- 1.849e+02 pb
+    """
+
+    fields = line.split('=', 1)[-1].split()
+    try:
+        xs = float(fields[0])
+        uncert = float(fields[2]) if len(fields) > 2 and fields[1] == '+-' else 0.0
+    except (ValueError, IndexError):
+        raise GenXSecError('Could not read cross section from: %s' % line.strip())
+
+    return xs, uncert
+
+def parse_log(lines):
+    """
+    Generator that reads the results of GenXSecAnalyzer jobs from cmsRun output.
+    Lines are read one at a time, so the output can be any length.
+    Logs of several jobs can be read one after another in one stream.
+
+    Parameters:
+    -----------
+      lines (iterable) - The lines of output, like an open file, sys.stdin, or the STDOUT of cmsRun.
+
+    Returns:
+    --------
+      A generator of dictionaries, one for each job, with the keys:
+
+        - cross_section: The final cross section in pb
+        - uncertainty: The uncertainty of the cross section in pb
+        - events: The number of events the job ran over, or None if it was not in the log
+        - line: The line the cross section was read from
+
+    Raises:
+    -------
+      GenXSecError - If a cross section line could not be read.
+    """
+
+    events = None
+
+    for line in lines:
+        if 'Filter efficiency (event-level)' in line:
+            match = EVENT_LEVEL.search(line)
+            if match is not None:
+                events = int(float(match.group(2)))
+
+        elif FINAL_XSEC in line:
+            xs, uncert = _read_xsec(line)
+            yield {'cross_section': xs, 'uncertainty': uncert, 'events': events, 'line': line.strip()}
+            events = None
+
+def combine(jobs):
+    """
+    Combine the results of jobs that ran over different files of the same dataset.
+    Each job is weighted by its number of events, and uncertainties are propagated through the weighted mean.
+    If any job is missing its number of events, every job has the same weight.
+
+    Parameters:
+    -----------
+      jobs (list) - Dictionaries from parse_log.
+
+    Returns:
+    --------
+      A tuple of the cross section, its uncertainty, and the total number of events, which may be None.
+
+    Raises:
+    -------
+      GenXSecError - If there are no jobs or no events.
+    """
+
+    if not jobs:
+        raise GenXSecError('No jobs to combine')
+
+    events = [job['events'] for job in jobs]
+
+    if None in events:
+        logger.warning('Not every job has a number of events, so jobs are weighted equally')
+        weights = [1] * len(jobs)
+        events = None
+    else:
+        weights = events
+        events = sum(events)
+
+    total = float(sum(weights))
+    if not total:
+        raise GenXSecError('No events in any of the jobs')
+
+    xs = sum([weight * job['cross_section'] for weight, job in zip(weights, jobs)])/total
+    uncert = sum([(weight * job['uncertainty'])**2 for weight, job in zip(weights, jobs)])**0.5/total
+
+    return xs, uncert, events
+
+def _new_result(name):
+    return {'dataset': name, 'sample': sample_name(name), 'cross_section': None,
+            'uncertainty': None, 'events': None, 'jobs': 0, 'comments': '', 'error': None}
+
+def _combine_result(result, jobs):
+    """
+    Fill a result of run_datasets or read_logs with the combination of its jobs.
+    """
+
+    try:
+        result['cross_section'], result['uncertainty'], result['events'] = combine(jobs)
+    except GenXSecError as err:
+        result['error'] = str(err)
+        return result
+
+    result['jobs'] = len(jobs)
+
+    if len(jobs) == 1:
+        result['comments'] = '%s ---> %s' % (result['dataset'], jobs[0]['line'])
+    elif result['events'] is None:
+        result['comments'] = '%s ---> average of %i jobs' % (result['dataset'], len(jobs))
+    else:
+        result['comments'] = '%s ---> average of %i jobs weighted by %i events' % \
+            (result['dataset'], len(jobs), result['events'])
+
+    return result
+
+def read_logs(dataset, logs):
+    """
+    Combine the cmsRun logs of the jobs of one dataset.
+
+    Parameters:
+    -----------
+      dataset (str) - The dataset, in either notation of cms_name.
+
+      logs (list) - Names of log files, or '-' for STDIN. Each file can have the logs of many jobs.
+
+    Returns:
+    --------
+      A result in the same format as the results of run_datasets, which can be passed to ingest.
+    """
+
+    result = _new_result(cms_name(dataset))
+    jobs = []
+
+    for log in logs:
+        stream = sys.stdin if log == '-' else open(log, 'r')
+        try:
+            found = list(parse_log(stream))
+        except GenXSecError as err:
+            result['error'] = '%s: %s' % (log, err)
+            return result
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        if not found:
+            logger.warning('No "%s" in %s', FINAL_XSEC, log)
+        jobs.extend(found)
+
+    return _combine_result(result, jobs)
+
+def _list_job(args):
+    """
+    Worker for the pool that lists files. Errors are returned instead of raised.
+    The time limit of the dataset starts here, so this also returns the time the dataset has to finish by.
+    """
+
+    dataset, das_client, timeout, limit = args
+
+    deadline = time.time() + timeout if timeout else None
+
+    try:
+        return dataset, list_files(dataset, das_client, timeout, limit), deadline, None
+    except GenXSecError as err:
+        return dataset, [], deadline, str(err)
+
+def _xsec_job(args):
+    """
+    Worker for the pool that runs cmsRun on one list of files. Errors are returned instead of raised.
+    """
+
+    dataset, index, files, cmsrun, config, redirector, timeout, deadline = args
+
+    timed_out = (dataset, index, None, 'The dataset timed out after %s seconds' % timeout)
+
+    remaining = None
+    if deadline is not None:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return timed_out
+
+    command = [cmsrun, config] + ['inputFiles=%s%s' % (redirector, lfn) for lfn in files]
+
+    try:
+        jobs = run_command(command, remaining, lambda lines: list(parse_log(lines)))
+        if not jobs:
+            raise GenXSecError('No "%s" in the cmsRun output' % FINAL_XSEC)
+        return dataset, index, jobs[-1], None
+    except GenXSecError as err:
+        if deadline is not None and time.time() >= deadline:
+            return timed_out
+        return dataset, index, None, str(err)
+
+def run_datasets(datasets, workers=4, files_per_job=50, timeout=None,
+                 cmsrun='cmsRun', das_client='das_client', config='genxsec.py',
+                 redirector=REDIRECTOR, limit=None):
+    """
+    Run the GenXSecAnalyzer on many datasets in parallel.
+
+    Parameters:
+    -----------
+      datasets (list) - The datasets, in either notation of cms_name.
+
+      workers (int) - The number of processes running das_client and cmsRun at once. (default 4)
+
+      files_per_job (int) - The maximum number of files to give each cmsRun job. (default 50)
+
+      timeout (float) - Seconds each dataset can take, from when its files start being listed
+                        until its last cmsRun job is done. When the time is up, its running jobs
+                        are killed, the rest are not started, and the dataset fails.
+                        (default None, for no limit)
+
+      cmsrun (str) - The cmsRun executable. (default 'cmsRun')
+
+      das_client (str) - The das_client executable. (default 'das_client')
+
+      config (str) - The location of the cmsRun configuration, genxsec.py in scripts/genxsecanalyzer.
+                     (default 'genxsec.py')
+
+      redirector (str) - The prefix added to the logical file names. (default REDIRECTOR)
+
+      limit (int) - If given, only this many files of each dataset are run over.
+
+    Returns:
+    --------
+      A list with a result for each dataset, in the order of datasets, without repeats.
+      Each result is a dictionary with the keys:
+
+        - dataset: The dataset, in CMS notation
+        - sample: The name of the sample for the database
+        - cross_section: The cross section, or None if the dataset failed
+        - uncertainty: The uncertainty of the cross section
+        - events: The number of events the cross section was calculated with, if cmsRun gave them all
+        - jobs: The number of cmsRun jobs
+        - comments: The cmsRun output the cross section came from
+        - error: A description of why the dataset failed, or None
+
+      Jobs of a dataset are combined with the combine function.
+
+    Raises:
+    -------
+      GenXSecError - If two datasets would be the same sample. See check_samples.
+    """
+
+    names = []
+    for dataset in datasets:
+        name = cms_name(dataset)
+        if name not in names:
+            names.append(name)
+
+    # Checked before anything runs, since ingest would refuse the results anyway
+    check_samples(names)
+
+    results = dict([(name, _new_result(name)) for name in names])
+
+    if not names:
+        return []
+
+    pool = multiprocessing.Pool(max(workers, 1))
+
+    try:
+        jobs = []
+        for name, files, deadline, error in pool.imap_unordered(
+                _list_job, [(name, das_client, timeout, limit) for name in names]):
+            if error is None and not files:
+                error = 'No files found'
+            if error:
+                logger.error('%s: %s', name, error)
+                results[name]['error'] = error
+                continue
+
+            groups = split_files(files, files_per_job)
+            results[name]['jobs'] = len(groups)
+
+            # The time of the dataset is already running, so its jobs start without waiting for the other lists
+            jobs.extend([pool.apply_async(_xsec_job,
+                                          [(name, index, group, cmsrun, config, redirector, timeout, deadline)])
+                         for index, group in enumerate(groups)])
+
+        outputs = dict([(name, {}) for name in names])
+        for job in jobs:
+            name, index, output, error = job.get()
+            if error:
+                logger.error('%s job %i: %s', name, index, error)
+                results[name]['error'] = results[name]['error'] or 'Job %i: %s' % (index, error)
+            else:
+                logger.info('%s job %i: %s', name, index, output['line'])
+                outputs[name][index] = output
+
+    finally:
+        pool.close()
+        pool.join()
+
+    for name in names:
+        result = results[name]
+        if result['error'] is not None:
+            continue
+
+        _combine_result(result, [outputs[name][index] for index in sorted(outputs[name])])
+
+    return [results[name] for name in names]
+
+def ingest(results, source=SOURCE, cnf=None, energy=13, notifier=None):
+    """
+    Put the cross sections of successful results into the database, with a single call to put_xsec.
+
+    Parameters:
+    -----------
+      results (list) - The output of run_datasets, or results from read_logs.
+
+      source (str) - The source of the cross sections. (default SOURCE)
+
+      cnf (str) - Location of the MySQL connection configuration file.
+                  (default None, see XSecConnection.__init__)
+
+      energy (int) - Energy to determine the table to insert the cross sections into.
+                     (default 13)
+
+      notifier (CrossSecDB.notify.Notifier) - Reports the new entries.
+                                              (default None, which uses CrossSecDB.notify.get_notifier())
+
+    Returns:
+    --------
+      The list of samples that were put into the database.
+
+    Raises:
+    -------
+      GenXSecError - If two successful results would be the same sample. See check_samples.
+    """
+
+    good = [result for result in results if result['error'] is None]
+
+    check_samples([result['dataset'] for result in good])
+
+    if good:
+        put_xsec([result['sample'] for result in good],
+                 [result['cross_section'] for result in good],
+                 source, [result['comments'] for result in good],
+                 cnf=cnf, energy=energy, notifier=notifier,
+                 uncertainties=[result['uncertainty'] for result in good])
+
+    return [result['sample'] for result in good]
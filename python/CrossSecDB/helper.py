@@ -0,0 +1,108 @@
+"""
+A long-lived lookup process for clients that cannot import MySQLdb, like CMSSW jobs.
+It is started by CrossSecDB.reader_cmssw through the xs_helper.py script.
+
+The protocol is one JSON object per line in each direction.
+A request looks like:
+
+    {"id": 1, "method": "get_xsec", "params": {"samples": ["sample1", "sample2"], "energy": 13, "get_uncert": true}}
+
+and gets a response with the same id and either a result or an error:
+
+    {"id": 1, "result": [[61527.0, 0.0], [35.85, 0.0]]}
+    {"id": 1, "error": {"type": "NoMatchingDataset", "message": "...", "samples": ["sample2"]}}
+
+Results of get_xsec are always lists, parallel to the samples, even for a single sample.
+The helper exits when its input is closed.
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import json
+import logging
+
+from . import reader
+
+logger = logging.getLogger(__name__)
+
+def _get_xsec(samples, cnf=None, energy=13, get_uncert=False):
+    if not isinstance(samples, list):
+        samples = [samples]
+
+    if not samples:
+        return []
+
+    output = reader.get_xsec(samples, cnf=cnf, energy=energy, get_uncert=get_uncert)
+
+    return output if len(samples) > 1 else [output]
+
+METHODS = {
+    'get_xsec': _get_xsec,
+    'get_samples_like': reader.get_samples_like,
+    'ping': lambda: 'pong'
+    }
+
+def handle(request):
+    """
+    Handle a single request.
+
+    Parameters:
+    -----------
+      request (dict) - The parsed request.
+
+    Returns:
+    --------
+      The response as a dictionary.
+    """
+
+    response = {'id': request.get('id')}
+
+    try:
+        method = METHODS.get(request.get('method'))
+        if method is None:
+            raise ValueError('Unknown method %s' % request.get('method'))
+
+        params = request.get('params') or {}
+        # JSON keys could be unicode, which Python 2.6 does not take as keyword arguments
+        response['result'] = method(**dict([(str(key), value) for key, value in params.items()]))
+
+    except Exception as err:
+        logger.debug('Error in request %s: %s', request, err)
+        response['error'] = {
+            'type': err.__class__.__name__,
+            'message': str(err),
+            'samples': getattr(err, 'samples', [])
+            }
+
+    return response
+
+def serve(instream, outstream):
+    """
+    Answer requests until instream is closed.
+
+    Parameters:
+    -----------
+      instream (file) - Where to read requests from.
+
+      outstream (file) - Where to write responses to.
+    """
+
+    while True:
+        line = instream.readline()
+        if not line:
+            break
+
+        if not line.strip():
+            continue
+
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('Request must be a JSON object')
+        except ValueError as err:
+            response = {'id': None, 'error': {'type': 'BadRequest', 'message': str(err), 'samples': []}}
+        else:
+            response = handle(request)
+
+        outstream.write(json.dumps(response) + '\n')
+        outstream.flush()
@@ -0,0 +1,148 @@
+"""
+Tools for going through the history of many samples without loading all of it at once.
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import logging
+import threading
+
+try:
+    from Queue import Queue
+except ImportError:
+    from queue import Queue
+
+from . import reader
+
+logger = logging.getLogger(__name__)
+
+class HistoryPrefetcher(object):
+    """
+    Gets the history of a list of samples one at a time, in order.
+    A background thread reads the histories of the next few samples
+    while the current one is being used, so callers rarely wait.
+    Histories are dropped once they have been given out, so memory use does not grow with the list.
+    """
+
+    def __init__(self, samples, cnf=None, energy=13, lookahead=20, chunk_size=5, include_archive=False):
+        """
+        Parameters:
+        -----------
+          samples (list) - The samples to get histories for, in the order they will be used.
+
+          cnf (str) - Location of the MySQL connection configuration file.
+                      (default None, see XSecConnection.__init__)
+
+          energy (int) - Energy to determine the table to look up history from.
+                         (default 13)
+
+          lookahead (int) - The number of samples after the current one to read ahead of time.
+                            (default 20)
+
+          chunk_size (int) - The number of samples to read the history of in each call to
+                             CrossSecDB.reader.dump_history. (default 5)
+
+          include_archive (bool) - Whether to include archived history. See CrossSecDB.reader.dump_history.
+                                   (default False)
+        """
+
+        self.samples = list(samples)
+        self.cnf = cnf
+        self.energy = energy
+        self.lookahead = lookahead
+        self.chunk_size = max(chunk_size, 1)
+        self.include_archive = include_archive
+
+        # Index: history list for samples that have been read, but not given out yet
+        self._results = {}
+        # Samples before this index have been sent to the background thread
+        self._requested = 0
+        self._error = None
+
+        self._cond = threading.Condition()
+        self._queue = Queue()
+        self._thread = None
+
+    def _work(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                return
+
+            start, end = chunk
+            try:
+                dump = reader.dump_history(self.samples[start:end], self.cnf, self.energy,
+                                           self.include_archive)
+            except Exception as err:
+                logger.exception('Failed to read history for samples %i to %i', start, end)
+                with self._cond:
+                    self._error = err
+                    self._cond.notify_all()
+                return
+
+            with self._cond:
+                for index in range(start, end):
+                    self._results[index] = dump.get(self.samples[index], [])
+                self._cond.notify_all()
+
+    def _request(self, end):
+        """
+        Make sure that every sample before end is read or being read.
+        """
+
+        end = min(end, len(self.samples))
+
+        if self._thread is None and self._requested < end:
+            self._thread = threading.Thread(target=self._work)
+            self._thread.daemon = True
+            self._thread.start()
+
+        while self._requested < end:
+            chunk_end = min(self._requested + self.chunk_size, len(self.samples))
+            self._queue.put((self._requested, chunk_end))
+            self._requested = chunk_end
+
+    def get(self, index):
+        """
+        Get the history of one sample, waiting for it if it has not been read yet.
+        Each index can only be gotten once.
+
+        Parameters:
+        -----------
+          index (int) - The position of the sample in the samples list.
+
+        Returns:
+        --------
+          The history of the sample, in the same format as the values of CrossSecDB.reader.dump_history.
+          The list is empty if the sample has no history.
+        """
+
+        self._request(index + 1 + self.lookahead)
+
+        with self._cond:
+            while index not in self._results and self._error is None:
+                # With a timeout, so Python 2 can still be interrupted
+                self._cond.wait(1.0)
+
+            if index not in self._results:
+                raise self._error
+
+            return self._results.pop(index)
+
+    def __iter__(self):
+        """
+        Generator of (index, sample, history) for each sample that has a history.
+        """
+
+        for index, sample in enumerate(self.samples):
+            history = self.get(index)
+            if history:
+                yield index, sample, history
+
+    def close(self):
+        """
+        Stop the background thread once it reads the histories already requested.
+        """
+
+        if self._thread is not None:
+            self._queue.put(None)
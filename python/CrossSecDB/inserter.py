@@ -4,11 +4,12 @@ Author: Daniel Abercrombie <dabercro@mit.edu>
 
 import os
 import logging
-import subprocess
-import socket
-import MySQLdb
 
-from email.mime.text import MIMEText
+from . import cache
+from . import notify
+from .backends import config_path
+from .profiling import profiled
+from .connection import XSecConnection, get_connection, chunks, DEFAULT_CHUNK_SIZE, ENERGIES
 
 logger = logging.getLogger(__name__)
 
@@ -18,81 +19,18 @@ ABS_UNCERTAINTY, REL_UNCERTAINTY = range(2)
 class BadInput(Exception):
     pass
 
-class XSecConnection(object):
-    """
-    A simple short-lived connector for cross section database
-    """
-
-    def __init__(self, write=False, cnf=None):
-        """
-        Parameters:
-        -----------
-          write (bool) - Lets the connection know what permissions to log onto the server with.
-                         (default False)
-
-          cnf (str) - The location of the configuration file with the default login parameters.
-                      The default location should be maintained to log onto a central server.
-        """
-
-        default_file = cnf or os.environ.get('XSECCONF', '/home/dabercro/xsec.cnf')
-        which_user = 'writer' if write else 'reader'
-
-        self.logger = logging.getLogger('Connection_%s_%s' % (which_user, default_file))
-
-        self.logger.debug('Opening connection')
-        self.conn = MySQLdb.connect(read_default_file=default_file,
-                                    read_default_group='mysql-crosssec-%s' % which_user,
-                                    db='cross_sections')
-        self.curs = self.conn.cursor()
-
-    def __del__(self):
-        self.logger.debug('Closing connection')
-        self.conn.close()
-
 def send_email(samples, cross_sections, uncertainties, updated, source, comments, energy):
     """
     Sends email reporting what was added to the database.
     """
 
-    with open(os.path.join(os.path.dirname(__file__), 'emails.txt'), 'r') as email_file:
-        emails = [line.strip() for line in email_file \
-                      if line.strip() not in ['', 'email@example.com']]
-
-    if emails:
-
-        samples_string = '\n'
-        for sample, xs in zip(samples, zip(cross_sections, uncertainties)):
-            if sample in updated:
-                samples_string += 'UPDATED '
-            else:
-                samples_string += 'NEW     '
-
-            samples_string += '%s ---> %s +- %s\n' % (sample, xs[0], xs[1])
-
-        email_text = """
-User %s has made the following entries into the cross section database at energy %i TeV:
-%s
-SOURCE:
-
-%s
-
-COMMENTS:
-
-%s
-""" % (os.environ.get('USER', '???'), energy, samples_string,
-       '\n\n'.join(set(source)), '\n\n'.join(set(comments)))
-
-        msg = MIMEText(email_text)
-        msg['Subject'] = 'Cross section update'
-        msg['From'] = '%s@%s' % (os.environ.get('USER', 'cmsprod'), socket.getfqdn().lower())
-        msg['To'] = ','.join(emails)
-
-        proc = subprocess.Popen(['sendmail', '-t'], stdin=subprocess.PIPE)
-        proc.communicate(input=msg.as_string())
+    notify.SendmailNotifier().notify(samples, cross_sections, uncertainties,
+                                     updated, source, comments, energy)
 
 
+@profiled('inserter.put_xsec')
 def put_xsec(samples, cross_sections, source, comments='', cnf=None, energy=13,
-             uncertainties=None, unc_type=ABS_UNCERTAINTY):
+             uncertainties=None, unc_type=ABS_UNCERTAINTY, notifier=None):
     """
     Places samples with parallel list, cross_sections into database.
     Source of the cross sections must be given.
@@ -124,6 +62,9 @@ def put_xsec(samples, cross_sections, source, comments='', cnf=None, energy=13,
       unc_type (enum) - The type of uncertainty that is being inserted. Valid options:
                         * ABS_UNCERTAINTY: For an absolute uncertainty in the cross section
                         * REL_UNCERTAINTY: For a relative uncertainty where 1.0 is 100%
+
+      notifier (CrossSecDB.notify.Notifier) - Reports the new entries.
+                                              (default None, which uses CrossSecDB.notify.get_notifier())
     """
 
     # Pass lists to keep rest of logic clean
@@ -160,12 +101,12 @@ def put_xsec(samples, cross_sections, source, comments='', cnf=None, energy=13,
     if len(samples) != len(comments):
         raise BadInput('Samples and comments are different length lists.')
 
-    if cnf and not os.path.exists(cnf):
+    if cnf and not os.path.exists(config_path(cnf)):
         raise BadInput('Configuration file %s does not exist' % cnf)
     for xs in cross_sections:
         if xs < 0:
             raise BadInput('Negative cross section %s detected' % xs)
-    if energy not in [7, 8, 13, 14]:
+    if energy not in ENERGIES:
         raise BadInput('Invalid energy %i' % energy)
 
     # Put the inputs together
@@ -173,44 +114,56 @@ def put_xsec(samples, cross_sections, source, comments='', cnf=None, energy=13,
     many_input = [(sample, cross_sections[index], uncertainties[index], source[index], comments[index]) \
                       for index, sample in enumerate(samples)]
 
-    # Open connection. cnf=None goes to a central location.
-
-    conn = XSecConnection(write=True, cnf=cnf)
-
     statement = """
                 REPLACE INTO xs_{0}TeV (sample, cross_section, uncertainty, last_updated, source, comments)
-                VALUES (%s, %s, %s, NOW(), %s, %s)
-                """.format(energy)
-
-    logger.debug('About to execute\n%s\nwith\n%s', statement, many_input)
-    
-    conn.curs.executemany(statement, many_input)
+                VALUES (%s, %s, %s, {1}, %s, %s)
+                """
 
-    # Now we want to copy into the new table.
+    # After the insert, we want to copy into the new table.
     # We do this copying to ensure that the update time is the same between the two.
 
     history_stmt = """
-                   INSERT INTO xs_{0}TeV_history SELECT * FROM xs_{0}TeV WHERE sample=%s
-                   """.format(energy)
+                   INSERT INTO xs_{0}TeV_history SELECT * FROM xs_{0}TeV WHERE sample IN ({1})
+                   """
 
     # At the same time, we count the number of entries for each sample,
     # so we know if the new entry is an update or not.
 
     count_stmt = """
-                 SELECT COUNT(*) FROM xs_{0}TeV_history WHERE sample=%s
-                 """.format(energy)
+                 SELECT sample, COUNT(*) FROM xs_{0}TeV_history WHERE sample IN ({1})
+                 GROUP BY sample
+                 """
+
+    updated = set()
+
+    # Get a pooled connection. cnf=None goes to a central location.
+
+    with get_connection(write=True, cnf=cnf) as conn:
+
+        # The backend knows how to ask for the current time
+        statement = statement.format(energy, conn.backend.now)
+
+        logger.debug('About to execute\n%s\nwith\n%s', statement, many_input)
+
+        conn.curs.executemany(statement, many_input)
+
+        for chunk in chunks(list(set(samples))):
+            placeholders = ', '.join(['%s'] * len(chunk))
+
+            conn.curs.execute(history_stmt.format(energy, placeholders), chunk)
+            conn.curs.execute(count_stmt.format(energy, placeholders), chunk)
+
+            # The database gives back its own case of each name
+            updated.update([sample.lower() for sample, count in conn.curs.fetchall() if count > 1])
 
-    updated = []
+        conn.conn.commit()
 
-    for sample in samples:
-        conn.curs.execute(history_stmt, (sample,))
-        conn.curs.execute(count_stmt, (sample,))
-        
-        if conn.curs.fetchone()[0] > 1:
-            updated.append(sample)
+    updated = set([sample for sample in samples if sample.lower() in updated])
 
-    conn.conn.commit()
+    # Don't let this process read old values from its cache
+    cache.invalidate(cnf, energy, samples)
 
-    # Send an email
+    # Send an email, or whatever the notifier wants
 
-    send_email(samples, cross_sections, uncertainties, updated, source, comments, energy)
+    (notifier or notify.get_notifier()).notify(samples, cross_sections, uncertainties,
+                                               updated, source, comments, energy)
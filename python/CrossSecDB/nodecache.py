@@ -0,0 +1,128 @@
+"""
+A cache of the cross sections shared by every process on a node.
+One refresher process keeps a snapshot file up to date (see CrossSecDB.snapshot),
+and every worker reads from it through mmap, so the node holds one copy in memory
+and only the refresher talks to the database.
+
+On the node, run the refresher, with the file on a local disk or in /dev/shm:
+
+    xs_refresher.py --interval=60 /dev/shm/xsec.snap
+
+Then point the workers at it:
+
+    export XSECSNAPSHOT=/dev/shm/xsec.snap
+
+New snapshots are written to a temporary file and renamed over the old one.
+Workers check for a new file at most once a second, and a lookup never waits on the refresher.
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import os
+import time
+import logging
+
+from . import reader
+from . import snapshot
+from .connection import ENERGIES
+
+logger = logging.getLogger(__name__)
+
+class Refresher(object):
+    """
+    Keeps a snapshot file in step with the database.
+    """
+
+    def __init__(self, file_name, energies=ENERGIES, cnf=None, interval=60):
+        """
+        Parameters:
+        -----------
+          file_name (str) - The location of the snapshot file to keep up to date.
+
+          energies (list) - The energies of the tables to put in the snapshot.
+                            (default ENERGIES in CrossSecDB.connection, which is all of them)
+
+          cnf (str) - Location of the MySQL connection configuration file.
+                      (default None, see XSecConnection.__init__)
+
+          interval (float) - The number of seconds between checks of the database. (default 60)
+        """
+
+        self.file_name = file_name
+        self.energies = sorted(set(energies))
+        self.cnf = cnf
+        self.interval = interval
+
+    def stale(self):
+        """
+        Returns:
+        --------
+          True if the snapshot file is missing, unreadable, or older than any of its tables in the database.
+        """
+
+        if not os.path.exists(self.file_name):
+            return True
+
+        try:
+            with snapshot.Snapshot(self.file_name) as snap:
+                if snap.energies != self.energies:
+                    return True
+                versions = dict([(energy, snap.version(energy)) for energy in self.energies])
+
+        except snapshot.SnapshotError as err:
+            logger.warning('Replacing %s: %s', self.file_name, err)
+            return True
+
+        for energy in self.energies:
+            if reader.get_table_version(self.cnf, energy) != versions[energy]:
+                return True
+
+        return False
+
+    def refresh(self, force=False):
+        """
+        Write a new snapshot, if the old one is stale.
+
+        Parameters:
+        -----------
+          force (bool) - If True, write a new snapshot even if the old one is up to date.
+
+        Returns:
+        --------
+          True if a new snapshot was written.
+        """
+
+        if not force and not self.stale():
+            return False
+
+        start = time.time()
+        counts = snapshot.export(self.file_name, self.energies, self.cnf)
+
+        logger.info('Wrote %s with %i samples in %.3f seconds',
+                    self.file_name, sum(counts.values()), time.time() - start)
+
+        return True
+
+    def run(self, iterations=None):
+        """
+        Refresh the snapshot every interval seconds.
+        Errors are logged, and the last good snapshot stays in place until the database can be read again.
+
+        Parameters:
+        -----------
+          iterations (int) - The number of times to check before returning. (default None, to run forever)
+        """
+
+        count = 0
+
+        while True:
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception('Could not refresh %s', self.file_name)
+
+            count += 1
+            if iterations is not None and count >= iterations:
+                return
+
+            time.sleep(self.interval)
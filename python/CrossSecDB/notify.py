@@ -0,0 +1,347 @@
+"""
+Notifiers that tell people about changes to the cross section database.
+
+By default, CrossSecDB.inserter.put_xsec sends an email right after each write.
+Long-running processes and bulk loads can collect writes into digests instead:
+
+    from CrossSecDB import notify
+    notify.set_notifier(notify.DigestNotifier(interval=600))
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import os
+import atexit
+import socket
+import logging
+import threading
+import subprocess
+
+from email.mime.text import MIMEText
+
+logger = logging.getLogger(__name__)
+
+class Notifier(object):
+    """
+    The interface for all notifiers.
+    """
+
+    def notify(self, samples, cross_sections, uncertainties, updated, source, comments, energy):
+        """
+        Report entries that were just written into the database.
+
+        Parameters:
+        -----------
+          samples (list) - The samples that were written.
+
+          cross_sections (list) - Cross sections parallel to samples.
+
+          uncertainties (list) - Absolute uncertainties parallel to samples.
+
+          updated (list or set) - The samples that already had entries before this write.
+                                  Names are compared without regard to case, like in the database.
+
+          source (list) - Sources parallel to samples.
+
+          comments (list) - Comments parallel to samples.
+
+          energy (int) - The energy of the table that was written to.
+        """
+
+        raise NotImplementedError
+
+    def flush(self):
+        """
+        Send anything that is waiting to be sent.
+        """
+
+        pass
+
+class NullNotifier(Notifier):
+    """
+    Drops all notifications.
+    """
+
+    def notify(self, samples, cross_sections, uncertainties, updated, source, comments, energy):
+        pass
+
+class SendmailNotifier(Notifier):
+    """
+    Sends one email for each notification, right away.
+    """
+
+    def __init__(self, emails=None, command=None):
+        """
+        Parameters:
+        -----------
+          emails (list) - The addresses to send to.
+                          (default None, which reads the emails.txt in this package)
+
+          command (list) - The command that reads the message from STDIN and sends it.
+                           (default None, which is the environment variable $XSECSENDMAIL, or 'sendmail -t')
+        """
+
+        self.emails = emails
+        self.command = command or os.environ.get('XSECSENDMAIL', 'sendmail -t').split()
+
+    def get_emails(self):
+        """
+        Returns:
+        --------
+          The list of email addresses to send to.
+        """
+
+        if self.emails is not None:
+            return self.emails
+
+        with open(os.path.join(os.path.dirname(__file__), 'emails.txt'), 'r') as email_file:
+            return [line.strip() for line in email_file \
+                        if line.strip() not in ['', 'email@example.com']]
+
+    def send(self, entries, users, sources, comments, energy):
+        """
+        Send a single email.
+
+        Parameters:
+        -----------
+          entries (list) - Tuples of (sample, cross section, uncertainty, whether it was updated).
+
+          users (list) - The users who made the entries.
+
+          sources (list) - The sources of the entries.
+
+          comments (list) - The comments for the entries.
+
+          energy (int) - The energy of the table that was written to.
+
+        Raises:
+        -------
+          OSError - If the command could not be run, or exited with an error.
+        """
+
+        emails = self.get_emails()
+
+        if not emails:
+            return
+
+        samples_string = '\n'
+        for sample, xs, unc, updated in entries:
+            if updated:
+                samples_string += 'UPDATED '
+            else:
+                samples_string += 'NEW     '
+
+            samples_string += '%s ---> %s +- %s\n' % (sample, xs, unc)
+
+        email_text = """
+User %s has made the following entries into the cross section database at energy %i TeV:
+%s
+SOURCE:
+
+%s
+
+COMMENTS:
+
+%s
+""" % (', '.join(users), energy, samples_string,
+       '\n\n'.join(sources), '\n\n'.join(comments))
+
+        msg = MIMEText(email_text)
+        msg['Subject'] = 'Cross section update'
+        msg['From'] = '%s@%s' % (os.environ.get('USER', 'cmsprod'), socket.getfqdn().lower())
+        msg['To'] = ','.join(emails)
+
+        logger.debug('Sending email with %s', self.command)
+
+        proc = subprocess.Popen(self.command, stdin=subprocess.PIPE, universal_newlines=True)
+        proc.communicate(input=msg.as_string())
+
+        if proc.returncode:
+            raise OSError('%s exited with code %i' % (self.command[0], proc.returncode))
+
+    def notify(self, samples, cross_sections, uncertainties, updated, source, comments, energy):
+        updated = set([sample.lower() for sample in updated])
+        entries = [(sample, xs, unc, sample.lower() in updated) for sample, xs, unc in \
+                       zip(samples, cross_sections, uncertainties)]
+
+        self.send(entries, [os.environ.get('USER', '???')],
+                  sorted(set(source)), sorted(set(comments)), energy)
+
+class DigestNotifier(Notifier):
+    """
+    Collects notifications in memory, and sends one digest for each energy
+    from a background thread every interval seconds.
+    Anything left is sent when flush() or close() is called, or when the process exits.
+    A notifier is kept until it is closed, so that nothing waiting is lost.
+    """
+
+    def __init__(self, sender=None, interval=600):
+        """
+        Parameters:
+        -----------
+          sender (SendmailNotifier) - The notifier that sends each digest.
+                                      (default None, which makes a SendmailNotifier with default settings)
+
+          interval (float) - The number of seconds between digests. If None, digests
+                             are only sent by flush() or close(). (default 600)
+        """
+
+        self.sender = sender or SendmailNotifier()
+        self.interval = interval
+
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+        if interval is not None:
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+
+        with _OPEN_LOCK:
+            _OPEN.add(self)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._stop.wait(self.interval)
+            try:
+                self.flush()
+            except Exception as err:
+                logger.error('Failed to send digest: %s', err)
+
+    def notify(self, samples, cross_sections, uncertainties, updated, source, comments, energy):
+        updated = set([sample.lower() for sample in updated])
+
+        with self._lock:
+            digest = self._pending.setdefault(energy, {
+                    'order': [],
+                    'entries': {},
+                    'users': set(),
+                    'sources': set(),
+                    'comments': set()
+                    })
+
+            for sample, xs, unc in zip(samples, cross_sections, uncertainties):
+                # A sample that was new at its first write stays new in the digest
+                if sample in digest['entries']:
+                    was_updated = digest['entries'][sample][3]
+                else:
+                    digest['order'].append(sample)
+                    was_updated = sample.lower() in updated
+
+                digest['entries'][sample] = (sample, xs, unc, was_updated)
+
+            digest['users'].add(os.environ.get('USER', '???'))
+            digest['sources'].update(source)
+            digest['comments'].update(comments)
+
+    def flush(self):
+        """
+        Send a digest for each energy with notifications waiting.
+        If sending fails, the digests that were not sent are kept to try again.
+        """
+
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+
+        energies = sorted(pending)
+
+        try:
+            while energies:
+                digest = pending[energies[0]]
+                self.sender.send([digest['entries'][sample] for sample in digest['order']],
+                                 sorted(digest['users']), sorted(digest['sources']),
+                                 sorted(digest['comments']), energies[0])
+                energies.pop(0)
+
+        finally:
+            if energies:
+                with self._lock:
+                    for energy in energies:
+                        self._pending[energy] = _merge_digests(pending[energy], self._pending.get(energy))
+
+    def close(self):
+        """
+        Stop the background thread and send whatever is left.
+        """
+
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self.flush()
+
+        with _OPEN_LOCK:
+            _OPEN.discard(self)
+
+
+def _merge_digests(old, new):
+    """
+    Put notifications that came in while a digest was being sent after the ones in the digest.
+    """
+
+    if new is None:
+        return old
+
+    for sample in new['order']:
+        if sample in old['entries']:
+            # Keep whether the sample was new at its first write
+            new['entries'][sample] = new['entries'][sample][:3] + (old['entries'][sample][3],)
+        else:
+            old['order'].append(sample)
+        old['entries'][sample] = new['entries'][sample]
+
+    for key in ['users', 'sources', 'comments']:
+        old[key].update(new[key])
+
+    return old
+
+
+# Digest notifiers that have not been closed yet
+_OPEN = set()
+
+_OPEN_LOCK = threading.Lock()
+
+def _close_open():
+    """
+    Send what is left in every digest notifier when the process exits.
+    """
+
+    with _OPEN_LOCK:
+        notifiers = list(_OPEN)
+
+    for notifier in notifiers:
+        try:
+            notifier.close()
+        except Exception as err:
+            logger.error('Failed to send digest at exit: %s', err)
+
+atexit.register(_close_open)
+
+
+_NOTIFIER = SendmailNotifier()
+
+def set_notifier(notifier):
+    """
+    Set the notifier used by CrossSecDB.inserter.put_xsec in this process.
+
+    Returns:
+    --------
+      The notifier that was in use before.
+    """
+
+    global _NOTIFIER
+    old = _NOTIFIER
+    _NOTIFIER = notifier
+
+    return old
+
+def get_notifier():
+    """
+    Returns:
+    --------
+      The notifier used by CrossSecDB.inserter.put_xsec in this process.
+    """
+
+    return _NOTIFIER
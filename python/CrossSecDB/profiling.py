@@ -0,0 +1,402 @@
+"""
+Optional profiling of the database access in this package.
+It is off by default. Turn it on with enable():
+
+    from CrossSecDB import profiling
+    profiler = profiling.enable()
+    ...
+    print profiler.summary()
+
+Or set the environment variable $XSECPROFILE to any non-empty value
+to profile a whole process, like one of the command line tools,
+and print the summary to STDERR when it exits.
+
+Four kinds of events are recorded:
+
+  connect - Opening a connection. The name is the configuration location and user.
+  execute - Running a statement. Rows are the ones affected, if the backend knows.
+  fetch - Getting the results of the last statement. Rows are the ones returned.
+  call - A whole reader or inserter function. Everything that is not
+         connect, execute, or fetch inside of it is Python-side processing.
+
+Statements are grouped after collapsing whitespace and the lists of placeholders
+in "IN (%s, %s, ...)", so the chunks of a large lookup are counted together.
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import os
+import re
+import sys
+import time
+import atexit
+import logging
+import threading
+
+from functools import wraps
+
+logger = logging.getLogger(__name__)
+
+KINDS = ['connect', 'execute', 'fetch', 'call']
+
+# Upper edges of the latency histogram bins in seconds. The last bin has everything slower.
+BUCKETS = [0.0001, 0.0003, 0.001, 0.003, 0.01, 0.03, 0.1, 0.3, 1.0, 3.0]
+
+_WHITESPACE = re.compile(r'\s+')
+_PLACEHOLDERS = re.compile(r'\(\s*%s(\s*,\s*%s)*\s*\)')
+
+def normalize(statement):
+    """
+    Get the name that a statement is grouped under.
+    """
+
+    return _PLACEHOLDERS.sub('(...)', _WHITESPACE.sub(' ', statement).strip())
+
+
+class StatementStats(object):
+    """
+    The counts, times, and rows for one name of one kind of event.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.db_seconds = 0.0
+        self.histogram = [0] * (len(BUCKETS) + 1)
+
+    def add(self, seconds, rows=None, db_seconds=None):
+        self.count += 1
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        if rows is not None and rows > 0:
+            self.rows += rows
+        if db_seconds is not None:
+            self.db_seconds += db_seconds
+
+        for index, edge in enumerate(BUCKETS):
+            if seconds <= edge:
+                self.histogram[index] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'seconds': self.seconds,
+            'mean_seconds': self.seconds/self.count if self.count else 0.0,
+            'max_seconds': self.max_seconds,
+            'rows': self.rows,
+            'db_seconds': self.db_seconds,
+            'histogram': [[edge, count] for edge, count in zip(BUCKETS + [None], self.histogram)]
+            }
+
+
+class Profiler(object):
+    """
+    A thread-safe collection of StatementStats, with optional callbacks for each event.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {}
+        self._callbacks = []
+        self.started = time.time()
+
+    def add_callback(self, callback):
+        """
+        Call a function for every event recorded.
+
+        Parameters:
+        -----------
+          callback (function) - Called as callback(kind, name, seconds, rows).
+                                Rows is None when they are not known.
+                                Exceptions raised by the callback are logged and ignored.
+        """
+
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        """
+        Stop calling a function added with add_callback.
+        """
+
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+
+        return stack
+
+    def record(self, kind, name, seconds, rows=None, db_seconds=None):
+        """
+        Add one event to the statistics.
+
+        Parameters:
+        -----------
+          kind (str) - One of KINDS.
+
+          name (str) - The statement, function, or connection.
+
+          seconds (float) - How long the event took.
+
+          rows (int) - The number of rows for the event, if known. (default None)
+
+          db_seconds (float) - For calls, the time spent in the other kinds of events.
+                               (default None)
+        """
+
+        if kind != 'call':
+            # Let the function calls this is inside of know how long the database took
+            stack = self._stack()
+            if stack:
+                stack[-1] += seconds
+
+        with self._lock:
+            key = (kind, name)
+            if key not in self._stats:
+                self._stats[key] = StatementStats()
+            self._stats[key].add(seconds, rows, db_seconds)
+            callbacks = list(self._callbacks)
+
+        for callback in callbacks:
+            try:
+                callback(kind, name, seconds, rows)
+            except Exception:
+                logger.exception('Profiling callback %s failed', callback)
+
+    def begin_call(self):
+        self._stack().append(0.0)
+
+    def end_call(self, name, seconds):
+        stack = self._stack()
+        db_seconds = stack.pop()
+        if stack:
+            stack[-1] += db_seconds
+
+        self.record('call', name, seconds, db_seconds=db_seconds)
+
+    def reset(self):
+        """
+        Drop all of the statistics, but keep the callbacks.
+        """
+
+        with self._lock:
+            self._stats = {}
+            self.started = time.time()
+
+    def stats(self):
+        """
+        Returns:
+        --------
+          A dictionary with a key for each kind of event.
+          Each value is a dictionary of names to their statistics.
+          Everything is plain lists, dictionaries, and numbers, so it can be dumped as JSON.
+        """
+
+        output = dict([(kind, {}) for kind in KINDS])
+
+        with self._lock:
+            for (kind, name), stats in self._stats.items():
+                output.setdefault(kind, {})[name] = stats.as_dict()
+
+        return output
+
+    def summary(self, width=70):
+        """
+        Returns:
+        --------
+          The statistics as a table to print, with the slowest names first for each kind.
+        """
+
+        lines = ['Profile of %.3f seconds' % (time.time() - self.started)]
+        header = '%-{0}s %7s %10s %10s %10s %9s'.format(width)
+
+        for kind, names in sorted(self.stats().items(), key=lambda item: KINDS.index(item[0])):
+            if not names:
+                continue
+
+            lines.append('')
+            lines.append(header % (kind, 'count', 'total s', 'mean ms', 'max ms',
+                                   'db %' if kind == 'call' else 'rows'))
+
+            for name, stats in sorted(names.items(), key=lambda item: -item[1]['seconds']):
+                if kind == 'call':
+                    last = '%8.1f%%' % (100.0 * stats['db_seconds']/stats['seconds'] if stats['seconds'] else 0.0)
+                else:
+                    last = '%9i' % stats['rows']
+
+                short = name if len(name) <= width else name[:width - 3] + '...'
+                lines.append('%-{0}s %7i %10.4f %10.3f %10.3f %s'.format(width) %
+                             (short, stats['count'], stats['seconds'],
+                              1000 * stats['mean_seconds'], 1000 * stats['max_seconds'], last))
+
+        return '\n'.join(lines)
+
+
+_PROFILER = None
+
+def enable():
+    """
+    Start profiling in this process. If a profiler is already running, it is kept.
+
+    Returns:
+    --------
+      The Profiler that is now in use.
+    """
+
+    global _PROFILER
+    if _PROFILER is None:
+        _PROFILER = Profiler()
+
+    return _PROFILER
+
+def disable():
+    """
+    Stop profiling and drop the statistics.
+    """
+
+    global _PROFILER
+    _PROFILER = None
+
+def current():
+    """
+    Returns:
+    --------
+      The Profiler in use, or None if profiling is not enabled.
+    """
+
+    return _PROFILER
+
+def profiled(name):
+    """
+    Decorator that records each call of a function under a name, if profiling is enabled.
+    """
+
+    def decorator(func):
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = _PROFILER
+            if profiler is None:
+                return func(*args, **kwargs)
+
+            profiler.begin_call()
+            start = time.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.end_call(name, time.time() - start)
+
+        return wrapper
+
+    return decorator
+
+
+class ProfiledCursor(object):
+    """
+    Wraps a cursor to record the time of each statement and fetch, if profiling is enabled.
+    """
+
+    def __init__(self, curs):
+        self.curs = curs
+        self._last = None
+
+    def execute(self, query, *args):
+        profiler = _PROFILER
+        if profiler is None:
+            return self.curs.execute(query, *args)
+
+        self._last = normalize(query)
+        start = time.time()
+        output = self.curs.execute(query, *args)
+        profiler.record('execute', self._last, time.time() - start, getattr(self.curs, 'rowcount', None))
+
+        return output
+
+    def executemany(self, query, seq_of_params):
+        profiler = _PROFILER
+        if profiler is None:
+            return self.curs.executemany(query, seq_of_params)
+
+        self._last = normalize(query)
+        start = time.time()
+        output = self.curs.executemany(query, seq_of_params)
+        profiler.record('execute', self._last, time.time() - start, getattr(self.curs, 'rowcount', None))
+
+        return output
+
+    def _fetch(self, method, *args):
+        profiler = _PROFILER
+        if profiler is None:
+            return getattr(self.curs, method)(*args)
+
+        start = time.time()
+        output = getattr(self.curs, method)(*args)
+        rows = len(output) if method != 'fetchone' else int(output is not None)
+        profiler.record('fetch', self._last or '(unknown)', time.time() - start, rows)
+
+        return output
+
+    def fetchone(self):
+        return self._fetch('fetchone')
+
+    def fetchmany(self, *args):
+        return self._fetch('fetchmany', *args)
+
+    def fetchall(self):
+        return self._fetch('fetchall')
+
+    def __getattr__(self, name):
+        return getattr(self.curs, name)
+
+    def __iter__(self):
+        profiler = _PROFILER
+        if profiler is None:
+            return iter(self.curs)
+
+        return self._iter_profiled(profiler)
+
+    def _iter_profiled(self, profiler):
+        """
+        Give rows from the wrapped cursor one at a time,
+        and record the time spent getting them once the iteration stops.
+        """
+
+        rows = 0
+        seconds = 0.0
+        iterator = iter(self.curs)
+
+        try:
+            while True:
+                start = time.time()
+                try:
+                    row = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    seconds += time.time() - start
+
+                rows += 1
+                yield row
+
+        finally:
+            profiler.record('fetch', self._last or '(unknown)', seconds, rows)
+
+
+def _print_summary():
+    profiler = _PROFILER
+    if profiler is not None:
+        sys.stderr.write(profiler.summary() + '\n')
+
+if os.environ.get('XSECPROFILE'):
+    enable()
+    atexit.register(_print_summary)
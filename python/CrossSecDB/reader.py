@@ -4,17 +4,73 @@ Author: Daniel Abercrombie <dabercro@mit.edu>
 
 import logging
 
-from .inserter import XSecConnection
+from . import asof
+from . import cache
+from . import sampleindex
+from . import snapshot
+from .backends import as_datetime
+from .profiling import profiled
+from .connection import get_connection, chunks, DEFAULT_CHUNK_SIZE, ENERGIES
 
 logger = logging.getLogger(__name__)
 
 class InvalidDataset(Exception):
-    pass
+    def __init__(self, message, samples=None):
+        Exception.__init__(self, message)
+        # The samples that have a cross section of 0
+        self.samples = samples or []
 
 class NoMatchingDataset(Exception):
-    pass
+    def __init__(self, message, samples=None):
+        Exception.__init__(self, message)
+        # The samples that were not found
+        self.samples = samples or []
 
-def dump_history(samples, cnf=None, energy=13):
+class Marker(object):
+    """
+    Placed in the output of multi-energy lookups where there is no valid cross section.
+    Markers are False, so they can be checked for like a cross section of 0.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+    def __bool__(self):
+        return False
+
+    __nonzero__ = __bool__
+
+# The sample is not in the table for that energy
+MISSING = Marker('MISSING')
+
+# The sample has a cross section of 0 for that energy
+INVALID = Marker('INVALID')
+
+def _match_case(chunk, results):
+    """
+    Sample names are not case sensitive in the database, so match them up the same way.
+
+    Returns:
+    --------
+      A dictionary from the samples in chunk to the values in results.
+    """
+
+    found = {}
+
+    lower = dict([(sample.lower(), value) for sample, value in results.items()])
+    for sample in chunk:
+        if sample in results:
+            found[sample] = results[sample]
+        elif sample.lower() in lower:
+            found[sample] = lower[sample.lower()]
+
+    return found
+
+@profiled('reader.dump_history')
+def dump_history(samples, cnf=None, energy=13, include_archive=False):
     """
     Get a list of historical information for each dataset.
 
@@ -28,6 +84,9 @@ def dump_history(samples, cnf=None, energy=13):
       energy (int) - Energy to determine the table to look up cross sections from.
                      (default 13)
 
+      include_archive (bool) - If True, also include old entries that were moved
+                               to the archive tables by CrossSecDB.archive. (default False)
+
     Returns:
     --------
       A dictionary of historical information for each dataset.
@@ -44,41 +103,47 @@ def dump_history(samples, cnf=None, energy=13):
     """
 
     if not isinstance(samples, list):
-        return dump_history([samples], cnf, energy)
-
-    conn = XSecConnection(write=False, cnf=cnf)
+        return dump_history([samples], cnf, energy, include_archive)
 
     output = {}
 
-    query = """
-            SELECT cross_section, last_updated, source, comments, uncertainty
-            FROM xs_{0}TeV_history WHERE sample=%s
-            ORDER BY last_updated DESC
-            """.format(energy)
+    select = """
+             SELECT cross_section, last_updated, source, comments, uncertainty
+             FROM xs_{0}TeV_history{1} WHERE sample=%s
+             """
 
-    for sample in samples:
-        conn.curs.execute(query, (sample,))
+    tables = ['', '_archive'] if include_archive else ['']
+
+    query = '{0} ORDER BY last_updated DESC'.format(
+        ' UNION ALL '.join([select.format(energy, table) for table in tables]))
+
+    with get_connection(write=False, cnf=cnf) as conn:
+        for sample in samples:
+            conn.curs.execute(query, (sample,) * len(tables))
 
-        to_add = [
-            {
-                'cross_section': result[0],
-                'last_updated': result[1],
-                'source': result[2],
-                'comments': result[3],
-                'uncertainty': result[4]
-            } for result in conn.curs.fetchall()
-        ]
+            to_add = [
+                {
+                    'cross_section': result[0],
+                    'last_updated': result[1],
+                    'source': result[2],
+                    'comments': result[3],
+                    'uncertainty': result[4]
+                } for result in conn.curs.fetchall()
+            ]
 
-        if to_add:
-            output[sample] = to_add
+            if to_add:
+                output[sample] = to_add
 
     return output
 
 
-def get_samples_like(patterns, cnf=None, energy=13, history=True):
+@profiled('reader.get_samples_like')
+def get_samples_like(patterns, cnf=None, energy=13, history=True, kind='like'):
     """
     Get the list of samples that are like a given patter or list of patterns.
     This searches the history table by default due to its use in revert_xs.py.
+    Samples are matched in memory with CrossSecDB.sampleindex,
+    which only reads the samples written since the last search from the database.
 
     Parameters:
     -----------
@@ -90,34 +155,269 @@ def get_samples_like(patterns, cnf=None, energy=13, history=True):
       energy (int) - Energy to determine the table to look up cross sections from.
                      (default 13)
 
+      history (bool) - If True, search every sample that has ever been in the table.
+                       Otherwise, only search the samples currently in the table. (default True)
+
+      kind (str) - The kind of pattern. 'like' for SQL LIKE patterns, 'glob' for shell patterns,
+                   'regex' for regular expressions, or 'prefix' for the start of sample names.
+                   (default 'like')
+
+    Returns:
+    --------
+      A sorted list of samples that match any of the patterns, without repeats.
+    """
+
+    return sampleindex.get_index(cnf, energy, history).match(patterns, kind)
+
+
+@profiled('reader.get_table_version')
+def get_table_version(cnf=None, energy=13):
+    """
+    Get information that changes whenever a table is written to.
+    Every write is copied into the history table, so that is the one checked.
+
+    Parameters:
+    -----------
+      cnf (str) - Location of the MySQL connection configuration file.
+                  (default None, see XSecConnection.__init__)
+
+      energy (int) - Energy to determine the table to check.
+                     (default 13)
+
+    Returns:
+    --------
+      A tuple of the last time the table was updated and the number of entries in the history.
+      The time is None if the table is empty.
+    """
+
+    with get_connection(write=False, cnf=cnf) as conn:
+        conn.curs.execute('SELECT MAX(last_updated), COUNT(*) FROM xs_{0}TeV_history'.format(energy))
+        last_updated, count = conn.curs.fetchone()
+
+    return as_datetime(last_updated), count
+
+
+@profiled('reader.lookup_xsec')
+def lookup_xsec(samples, cnf=None, energy=13, get_uncert=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Look up the cross sections of many samples, without checking that they exist or are valid.
+    Samples are looked up in chunks of chunk_size, with one query per chunk.
+    If caching is turned on with CrossSecDB.cache.enable, cached values are used first.
+    If a snapshot is enabled with CrossSecDB.snapshot.enable, only the snapshot is read.
+
+    Parameters:
+    -----------
+      samples (list) - A list of samples to get cross sections for.
+
+      cnf (str) - Location of the MySQL connection configuration file.
+                  (default None, see XSecConnection.__init__)
+
+      energy (int) - Energy to determine the table to look up cross sections from.
+                     (default 13)
+
+      get_uncert (bool) - Determines whether or not to fetch uncertainties from the database too.
+
+      chunk_size (int) - The maximum number of samples to look up in a single query.
+                         (default DEFAULT_CHUNK_SIZE in CrossSecDB.connection)
+
+    Returns:
+    --------
+      A dictionary with the samples that were found as keys.
+      The values are cross sections, or tuples of cross section and absolute uncertainty if get_uncert is True.
+    """
+
+    xs_snapshot = snapshot.current()
+    if xs_snapshot is not None:
+        return xs_snapshot.lookup_xsec(samples, energy, get_uncert)
+
+    values = 'cross_section, uncertainty' if get_uncert else 'cross_section'
+
+    # Each distinct sample only needs to be asked for once
+    to_query = list(set(samples))
+
+    found = {}
+
+    # If caching is turned on, only ask the database for what isn't cached
+
+    xs_cache = cache.current()
+
+    if xs_cache is not None:
+        not_cached = []
+        for sample in to_query:
+            cached = xs_cache.get(xs_cache.make_key(cnf, energy, sample, get_uncert))
+            if cached is cache.NOT_CACHED:
+                not_cached.append(sample)
+            elif cached is not cache.MISSING:
+                found[sample] = cached
+
+        to_query = not_cached
+
+    # Connect. Default to Dan's xsec configuration on the T3.
+    # Otherwise, use the passed cnf or the environment variable XSECCONF
+
+    if to_query:
+        with get_connection(write=False, cnf=cnf) as conn:
+            for chunk in chunks(to_query, chunk_size):
+                query = 'SELECT sample, {0} FROM xs_{1}TeV WHERE sample IN ({2})'.format(
+                    values, energy, ', '.join(['%s'] * len(chunk)))
+
+                logger.debug('About to execute: %s \nwith %s', query, chunk)
+                conn.curs.execute(query, chunk)
+
+                results = {}
+                for result in conn.curs.fetchall():
+                    results[result[0]] = result[1] if len(result) == 2 else tuple(result[1:])
+
+                found.update(_match_case(chunk, results))
+
+        if xs_cache is not None:
+            for sample in to_query:
+                xs_cache.put(xs_cache.make_key(cnf, energy, sample, get_uncert),
+                             found.get(sample, cache.MISSING))
+
+    logger.debug('Result: %s', found)
+
+    return found
+
+
+@profiled('reader.lookup_xsec_energies')
+def lookup_xsec_energies(samples, cnf=None, energies=ENERGIES, get_uncert=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Look up the cross sections of many samples at many energies, without checking that they exist or are valid.
+    Each chunk of samples is looked up in every energy's table with a single UNION ALL query.
+    If caching is turned on with CrossSecDB.cache.enable, cached values are used first.
+    If a snapshot is enabled with CrossSecDB.snapshot.enable, only the snapshot is read.
+
+    Parameters:
+    -----------
+      samples (list) - A list of samples to get cross sections for.
+
+      cnf (str) - Location of the MySQL connection configuration file.
+                  (default None, see XSecConnection.__init__)
+
+      energies (list) - The energies of the tables to look up cross sections from.
+                        (default ENERGIES in CrossSecDB.connection, which is all of them)
+
+      get_uncert (bool) - Determines whether or not to fetch uncertainties from the database too.
+
+      chunk_size (int) - The maximum number of samples to look up in a single query.
+                         (default DEFAULT_CHUNK_SIZE in CrossSecDB.connection)
+
     Returns:
     --------
-      A list of samples that matches the pattern.
+      A dictionary with a (sample, energy) key for each cross section that was found.
+      The values are cross sections, or tuples of cross section and absolute uncertainty if get_uncert is True.
+
+    Raises:
+    -------
+      ValueError - If there is no table for one of the energies.
+    """
+
+    for energy in energies:
+        if energy not in ENERGIES:
+            raise ValueError('There is no table for energy %s. Valid energies are %s' % (energy, ENERGIES))
+
+    xs_snapshot = snapshot.current()
+    if xs_snapshot is not None:
+        return xs_snapshot.lookup_xsec_energies(samples, energies, get_uncert)
+
+    values = 'cross_section, uncertainty' if get_uncert else 'cross_section'
+    energies = sorted(set(energies))
+
+    found = {}
+
+    # For each energy, the samples that need to come from the database
+
+    to_query = dict([(energy, set(samples)) for energy in energies])
+
+    xs_cache = cache.current()
+
+    if xs_cache is not None:
+        for energy in energies:
+            for sample in list(to_query[energy]):
+                cached = xs_cache.get(xs_cache.make_key(cnf, energy, sample, get_uncert))
+                if cached is not cache.NOT_CACHED:
+                    to_query[energy].remove(sample)
+                    if cached is not cache.MISSING:
+                        found[(sample, energy)] = cached
+
+    all_samples = sorted(set().union(*to_query.values()))
+
+    if all_samples:
+        with get_connection(write=False, cnf=cnf) as conn:
+            for chunk in chunks(all_samples, chunk_size):
+                selects = []
+                params = []
+
+                for energy in energies:
+                    in_energy = [sample for sample in chunk if sample in to_query[energy]]
+                    if in_energy:
+                        selects.append('SELECT {0}, sample, {1} FROM xs_{0}TeV WHERE sample IN ({2})'.format(
+                                energy, values, ', '.join(['%s'] * len(in_energy))))
+                        params.extend(in_energy)
+
+                query = ' UNION ALL '.join(selects)
+
+                logger.debug('About to execute: %s \nwith %s', query, params)
+                conn.curs.execute(query, params)
+
+                results = dict([(energy, {}) for energy in energies])
+                for result in conn.curs.fetchall():
+                    results[result[0]][result[1]] = result[2] if len(result) == 3 else tuple(result[2:])
+
+                for energy in energies:
+                    for sample, value in _match_case(chunk, results[energy]).items():
+                        found[(sample, energy)] = value
+
+        if xs_cache is not None:
+            for energy in energies:
+                for sample in to_query[energy]:
+                    xs_cache.put(xs_cache.make_key(cnf, energy, sample, get_uncert),
+                                 found.get((sample, energy), cache.MISSING))
+
+    logger.debug('Result: %s', found)
+
+    return found
+
+
+def mark_xsec(samples, energies, found):
     """
+    Turn the output of lookup_xsec_energies into the output of get_xsec for a list of energies.
 
-    if not isinstance(patterns, list):
-        return get_samples_like([patterns], cnf, energy)
+    Parameters:
+    -----------
+      samples (list) - The samples that were looked up.
+
+      energies (list) - The energies that were looked up.
 
-    conn = XSecConnection(write=False, cnf=cnf)
+      found (dict) - The cross sections that were found, from lookup_xsec_energies.
 
-    output = []
+    Returns:
+    --------
+      A dictionary with a (sample, energy) key for every pair of sample and energy.
+      Values are the same as lookup_xsec_energies, or MISSING or INVALID.
+    """
 
-    # Let's get which table we want to query
+    output = {}
 
-    table_suffix = '_history' if history else ''
-    query = 'SELECT sample FROM xs_{0}TeV{1} WHERE sample LIKE %s'.format(energy, table_suffix)
+    for sample in samples:
+        for energy in energies:
+            value = found.get((sample, energy), MISSING)
+            if value is not MISSING and not (value[0] if isinstance(value, tuple) else value):
+                value = INVALID
 
-    for pattern in patterns:
-        conn.curs.execute(query, (pattern,))
-        output.extend([result[0] for result in conn.curs.fetchall()])
+            output[(sample, energy)] = value
 
     return output
 
 
-def get_xsec(samples, cnf=None, energy=13, get_uncert=False):
+@profiled('reader.get_xsec')
+def get_xsec(samples, cnf=None, energy=13, get_uncert=False, chunk_size=DEFAULT_CHUNK_SIZE, as_of=None):
     """
     Get the cross sections from the central database.
     Can be a list or a single sample.
+    See lookup_xsec for how the samples are looked up.
+    With as_of, the cross sections are read from the history with CrossSecDB.asof instead.
 
     Parameters:
     -----------
@@ -126,50 +426,122 @@ def get_xsec(samples, cnf=None, energy=13, get_uncert=False):
       cnf (str) - Location of the MySQL connection configuration file.
                   (default None, see XSecConnection.__init__)
 
-      energy (int) - Energy to determine the table to look up cross sections from.
-                     (default 13)
+      energy (int or list) - Energy to determine the table to look up cross sections from.
+                             If this is a list, every energy is looked up at once
+                             with lookup_xsec_energies. (default 13)
 
       get_uncert (bool) - Determines whether or not to fetch uncertainties from the database too.
 
+      chunk_size (int) - The maximum number of samples to look up in a single query.
+                         (default DEFAULT_CHUNK_SIZE in CrossSecDB.connection)
+
+      as_of (datetime.datetime or str) - If given, get the cross sections as they were at this time,
+                                         like '2017-06-01 12:00:00'. Samples that did not exist yet are missing.
+                                         Caches and snapshots of the current values are not used.
+                                         (default None, for the current cross sections)
+
     Returns:
     --------
       By default, a list of cross sections, parallel to the list of samples.
       If the list is only one element long, or samples was not a list, just a float is returned.
       If get_uncertainties is set to True, this list is a list of tuples with cross section and absolute uncertainty.
       Or the lone float is a tuple.
+
+      If energy is a list, a dictionary with a (sample, energy) key for every sample at every energy.
+      Samples that are not in an energy's table have the value MISSING,
+      and samples with a cross section of 0 have the value INVALID.
+      See mark_xsec.
+
+    Raises:
+    -------
+      NoMatchingDataset - If any of the samples are not in the database.
+                          The message lists every missing sample.
+                          Not raised if energy is a list.
+
+      InvalidDataset - If any of the samples have a cross section of 0.
+                       The message lists every invalid sample.
+                       Not raised if energy is a list.
+
+      ValueError - If energy is a list with an energy that does not have a table,
+                   or as_of is not a valid time.
+
+      SnapshotError - If a snapshot is enabled, and it does not have the table for an energy.
     """
 
     if not isinstance(samples, list):
         samples = [samples]
 
-    # Connect. Default to Dan's xsec configuration on the T3.
-    # Otherwise, use the passed cnf or the environment variable XSECCONF
+    if as_of is not None:
+        return _get_xsec_as_of(samples, cnf, energy, get_uncert, chunk_size, as_of)
 
-    conn = XSecConnection(write=False, cnf=cnf)
+    if isinstance(energy, (list, tuple)):
+        return mark_xsec(samples, energy, lookup_xsec_energies(samples, cnf, energy, get_uncert, chunk_size))
 
-    output = []
+    return order_xsec(samples, lookup_xsec(samples, cnf, energy, get_uncert, chunk_size), energy)
 
-    values = 'cross_section, uncertainty' if get_uncert else 'cross_section'
-    query = 'SELECT {0} FROM xs_{1}TeV WHERE sample=%s'.format(values, energy)
 
-    for sample in samples:
-        logger.debug('About to execute: %s \nwith %s', query, sample)
-        conn.curs.execute(query, (sample,))
+def _get_xsec_as_of(samples, cnf, energy, get_uncert, chunk_size, as_of):
+    """
+    The part of get_xsec that reads the past cross sections.
+    """
+
+    if not isinstance(energy, (list, tuple)):
+        return order_xsec(samples, asof.lookup_xsec(samples, as_of, cnf, energy, get_uncert, chunk_size), energy)
+
+    for each in energy:
+        if each not in ENERGIES:
+            raise ValueError('There is no table for energy %s. Valid energies are %s' % (each, ENERGIES))
+
+    found = {}
+    for each in energy:
+        for sample, value in asof.lookup_xsec(samples, as_of, cnf, each, get_uncert, chunk_size).items():
+            found[(sample, each)] = value
+
+    return mark_xsec(samples, energy, found)
+
+
+def order_xsec(samples, found, energy=13):
+    """
+    Turn the output of lookup_xsec into the output of get_xsec.
 
-        check = conn.curs.fetchone()
-        logger.debug('Result: %s', check)
+    Parameters:
+    -----------
+      samples (list) - The samples in the order that they were asked for.
+
+      found (dict) - The cross sections that were found, from lookup_xsec.
+
+      energy (int) - The energy the samples were looked up at, for error messages.
+                     (default 13)
+
+    Returns:
+    --------
+      The same as get_xsec.
+
+    Raises:
+    -------
+      The same as get_xsec.
+    """
 
-        if check is None:
-            raise NoMatchingDataset('No matching dataset found for sample %s at energy %s TeV' % (sample, energy))
+    missing = [sample for sample in samples if sample not in found]
+    if missing:
+        raise NoMatchingDataset('No matching dataset found for sample%s %s at energy %s TeV' % \
+                                    ('s' if len(missing) > 1 else '', ', '.join(missing), energy),
+                                missing)
 
-        if len(check) == 1:
-            output.append(check[0])
-        else:
-            output.append(check)
+    # Put everything back in the order that was asked for
+    output = [found[sample] for sample in samples]
 
     # If there is a zero in the output, that means it is invalid
     if False in output:
-        raise InvalidDataset('Dataset %s is invalid! (cross section = 0)', samples[output.index(False)])
+        invalid = []
+        for sample, xs in zip(samples, output):
+            if xs == False and sample not in invalid:
+                invalid.append(sample)
+
+        raise InvalidDataset('Dataset%s %s %s invalid! (cross section = 0)' % \
+                                 ('s' if len(invalid) > 1 else '', ', '.join(invalid),
+                                  'are' if len(invalid) > 1 else 'is'),
+                             invalid)
 
     # Give people behavior they would expect
     if len(output) == 1:
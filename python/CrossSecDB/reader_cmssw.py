@@ -2,14 +2,138 @@
 Use this module for reading cross sections if you are running Python 2.7 with no MySQLdb.
 It will not work in Python 2.6.
 
+Lookups go to a single xs_helper.py process that is started on first use,
+and that is kept alive until this process exits.
+
 Author: Daniel Abercrombie <dabercro@mit.edu>
 """
 
+import json
+import atexit
+import threading
 import subprocess
 
+
+class HelperError(Exception):
+    """
+    An error reported by the helper process.
+    The subclasses match the exceptions from CrossSecDB.reader.
+    """
+
+    def __init__(self, message, samples=None):
+        Exception.__init__(self, message)
+        self.samples = samples or []
+
+class InvalidDataset(HelperError):
+    pass
+
+class NoMatchingDataset(HelperError):
+    pass
+
+ERRORS = {
+    'InvalidDataset': InvalidDataset,
+    'NoMatchingDataset': NoMatchingDataset
+    }
+
+
+class XSecHelper(object):
+    """
+    A client for one xs_helper.py process.
+    Requests are sent one at a time, so one helper can be shared between threads.
+    """
+
+    def __init__(self, command=None):
+        """
+        Parameters:
+        -----------
+          command (list) - The command to start the helper. (default ['xs_helper.py'])
+        """
+
+        self.command = command or ['xs_helper.py']
+        self.proc = None
+        self.next_id = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        """
+        Start the helper process, if it is not running already.
+        """
+
+        if self.proc is None or self.proc.poll() is not None:
+            self.proc = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                         universal_newlines=True)
+
+    def close(self):
+        """
+        Stop the helper process by closing its input.
+        """
+
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.stdin.close()
+            self.proc.wait()
+
+        self.proc = None
+
+    def _send(self, request):
+        self.start()
+
+        self.proc.stdin.write(json.dumps(request) + '\n')
+        self.proc.stdin.flush()
+
+        line = self.proc.stdout.readline()
+        if not line:
+            raise IOError('Helper process %s exited' % ' '.join(self.command))
+
+        return json.loads(line)
+
+    def call(self, method, **params):
+        """
+        Send a request to the helper and wait for the response.
+        If the helper died since the last request, it is restarted once.
+
+        Parameters:
+        -----------
+          method (str) - The name of the method for the helper to run.
+
+          params - The parameters passed to the method.
+
+        Returns:
+        --------
+          The result sent back by the helper.
+
+        Raises:
+        -------
+          NoMatchingDataset or InvalidDataset - For those errors from CrossSecDB.reader.
+
+          HelperError - For any other error in the helper.
+        """
+
+        with self.lock:
+            self.next_id += 1
+            request = {'id': self.next_id, 'method': method, 'params': params}
+
+            try:
+                response = self._send(request)
+            except (IOError, ValueError):
+                # Try once more with a fresh helper
+                self.close()
+                response = self._send(request)
+
+        error = response.get('error')
+        if error:
+            raise ERRORS.get(error['type'], HelperError)(
+                '%s: %s' % (error['type'], error['message']), error.get('samples'))
+
+        return response['result']
+
+
+_HELPER = XSecHelper()
+atexit.register(_HELPER.close)
+
+
 def get_xsec(samples, cnf=None, energy=13, get_uncert=False, on_lxplus=False):
     """
-    This is a wrapper for the get_xs.py script, which can be run no matter which python version you are using.
+    This is a wrapper for the xs_helper.py script, which can be run no matter which python version you are using.
 
     Parameters:
     -----------
@@ -24,6 +148,7 @@ def get_xsec(samples, cnf=None, energy=13, get_uncert=False, on_lxplus=False):
       get_uncert (bool) - Determines whether or not to fetch uncertainties from the database too.
 
       on_lxplus (bool) - If true, the script will use the web api instead of the local one.
+                         Uncertainties are not available from the web api.
       TODO Get the script to figure out by itself if it is on the T3 or not using the hostname.
 
     Returns:
@@ -37,13 +162,17 @@ def get_xsec(samples, cnf=None, energy=13, get_uncert=False, on_lxplus=False):
     if not isinstance(samples, list):
         samples = [samples]
 
-    cnf_str = 'XSECCONF=%s' % cnf if cnf else ''
-    samples_str = ' '.join(samples)
+    if on_lxplus:
+        samples_str = ' '.join(samples)
+
+        stdout = subprocess.check_output('ENERGY=%i web_get_xs.sh %s' % (energy, samples_str), shell=True)
+        output = [float(line) for line in stdout.split('\n') if line.strip()]
 
-    script = 'web_get_xs.sh' if on_lxplus else 'get_xs.py'
+    else:
+        output = _HELPER.call('get_xsec', samples=samples, cnf=cnf, energy=energy, get_uncert=get_uncert)
 
-    stdout = subprocess.check_output('ENERGY=%i %s %s %s' % (energy, cnf_str, script, samples_str), shell=True)
-    output = [float(line) for line in stdout.split('\n') if line.strip()]
+        if get_uncert:
+            output = [tuple(result) for result in output]
 
     # Give people behavior they would expect
     if len(output) == 1:
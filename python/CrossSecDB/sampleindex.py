@@ -0,0 +1,338 @@
+"""
+An in-memory index of the sample names in a table, for searching without a query per pattern.
+Each index is a sorted list of the distinct names, so a pattern that starts with plain text
+only looks at the names with that prefix. Matching is not case sensitive, like the database,
+except for regular expressions.
+
+    from CrossSecDB import sampleindex
+
+    index = sampleindex.get_index(energy=13)
+    print index.glob('DM*Mphi-1000*')
+
+An index is read from the database once, and then only the names written since the last refresh are read.
+If a write commits late, with a time before the last one already seen, the whole index is read again.
+CrossSecDB.reader.get_samples_like and the /like endpoint of CrossSecDB.service search through these indexes.
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import re
+import time
+import bisect
+import fnmatch
+import logging
+import threading
+
+from .backends import as_datetime
+from .connection import get_connection, default_cnf
+
+logger = logging.getLogger(__name__)
+
+# The kinds of patterns that can be matched
+KINDS = ('like', 'glob', 'regex', 'prefix')
+
+# Characters that end the plain text at the start of each kind of pattern
+_LIKE_SPECIAL = '%_'
+_GLOB_SPECIAL = '*?['
+_REGEX_SPECIAL = '.^$*+?{}[]\\|()'
+
+def _like_regex(pattern):
+    """
+    Returns:
+    --------
+      A tuple of the plain text at the start of a SQL LIKE pattern, and a compiled regex that matches the same names.
+    """
+
+    parts = []
+    prefix = []
+    escaped = False
+
+    for char in pattern:
+        if char == '\\' and not escaped:
+            escaped = True
+        elif char in _LIKE_SPECIAL and not escaped:
+            # Nothing after a wildcard is part of the prefix
+            prefix.append(None)
+            parts.append('.*' if char == '%' else '.')
+        else:
+            escaped = False
+            prefix.append(char)
+            parts.append(re.escape(char))
+
+    if None in prefix:
+        prefix = prefix[:prefix.index(None)]
+
+    return ''.join(prefix), re.compile('(?:%s)\\Z' % ''.join(parts), re.IGNORECASE | re.DOTALL)
+
+def _glob_prefix(pattern):
+    for index, char in enumerate(pattern):
+        if char in _GLOB_SPECIAL:
+            return pattern[:index]
+
+    return pattern
+
+def _regex_prefix(pattern):
+    """
+    Returns:
+    --------
+      Plain text that every match of the regex must start with, which can be empty.
+    """
+
+    if not pattern.startswith('^') or '|' in pattern:
+        return ''
+
+    for index, char in enumerate(pattern[1:], 1):
+        if char in _REGEX_SPECIAL:
+            # A quantifier makes the character before it optional
+            if char in '*?{':
+                index -= 1
+            return pattern[1:max(index, 1)]
+
+    return pattern[1:]
+
+def _contains(entries, entry):
+    index = bisect.bisect_left(entries, entry)
+    return index < len(entries) and entries[index] == entry
+
+
+class SampleIndex(object):
+    """
+    The distinct sample names in one table, sorted without regard to case.
+    Searches are thread safe, and can run while the index is refreshed.
+    """
+
+    def __init__(self, cnf=None, energy=13, history=True):
+        """
+        Parameters:
+        -----------
+          cnf (str) - Location of the MySQL connection configuration file.
+                      (default None, see XSecConnection.__init__)
+
+          energy (int) - Energy to determine the table to index. (default 13)
+
+          history (bool) - If True, index the history table, which includes every sample ever written.
+                           Otherwise, only index the samples in the current table. (default True)
+        """
+
+        self.cnf = cnf
+        self.energy = energy
+        self.table = 'xs_{0}TeV{1}'.format(energy, '_history' if history else '')
+
+        # Sorted list of (lower case name, name).
+        # It is replaced instead of changed, so searches never see a partial update.
+        self._entries = []
+        self._version = None
+        # The number of rows in the history at the latest time of the version
+        self._at_latest = 0
+        self._checked = None
+
+        self._lock = threading.Lock()
+
+    def refresh(self, max_age=0.0):
+        """
+        Bring the index up to date with the database.
+        Only samples written since the last refresh are read, unless the table shrank
+        or a write committed with a time before the latest one seen by the last refresh.
+
+        Parameters:
+        -----------
+          max_age (float) - Do not check the database if it was checked fewer than this many seconds ago.
+                            (default 0.0, to always check)
+        """
+
+        with self._lock:
+            now = time.time()
+            if self._checked is not None and now - self._checked < max_age:
+                return
+
+            old = self._version
+            since = old[0] if old is not None else None
+            history = 'xs_{0}TeV_history'.format(self.energy)
+
+            with get_connection(write=False, cnf=self.cnf) as conn:
+                # Everything is counted in one statement, so that the counts agree with each other
+                conn.curs.execute(
+                    """
+                    SELECT MAX(last_updated), COUNT(*), MIN(last_updated),
+                    SUM(CASE WHEN last_updated >= %s THEN 1 ELSE 0 END),
+                    (SELECT COUNT(*) FROM {0} WHERE last_updated = (SELECT MAX(last_updated) FROM {0}))
+                    FROM {0}
+                    """.format(history), (since,))
+                last_updated, count, first, in_window, at_latest = conn.curs.fetchone()
+                version = (as_datetime(last_updated), count, as_datetime(first))
+
+                if version != self._version:
+                    if old is None or old[0] is None or version[0] is None or \
+                            version[0] < old[0] or version[1] < old[1] or version[2] != old[2] or \
+                            version[1] - old[1] > (in_window or 0) - self._at_latest:
+                        # Start over, since history was removed, or some rows were written before old[0]
+                        conn.curs.execute('SELECT DISTINCT sample FROM {0}'.format(self.table))
+                        self._entries = sorted([(sample.lower(), sample) for sample, in conn.curs.fetchall()])
+
+                    else:
+                        # Writes can happen during the same second as the last one seen, so include that second
+                        conn.curs.execute('SELECT DISTINCT sample FROM {0} WHERE last_updated >= %s'.format(self.table),
+                                          (old[0],))
+                        written = set([(sample.lower(), sample) for sample, in conn.curs.fetchall()])
+                        new = [entry for entry in written if not _contains(self._entries, entry)]
+                        if new:
+                            self._entries = sorted(self._entries + new)
+
+                    logger.debug('Index of %s has %i samples', self.table, len(self._entries))
+                    self._version = version
+                    self._at_latest = at_latest
+
+            self._checked = now
+
+    def __len__(self):
+        return len(self._entries)
+
+    def names(self):
+        """
+        Returns:
+        --------
+          A list of every sample name in the index, in order.
+        """
+
+        return [name for _, name in self._entries]
+
+    def _search(self, prefix, test=None):
+        """
+        Get the names that start with prefix, regardless of case, and pass a test.
+        """
+
+        entries = self._entries
+        prefix = prefix.lower()
+
+        output = []
+        index = bisect.bisect_left(entries, (prefix,))
+
+        while index < len(entries) and entries[index][0].startswith(prefix):
+            name = entries[index][1]
+            if test is None or test(name):
+                output.append(name)
+            index += 1
+
+        return output
+
+    def prefix(self, prefix):
+        """
+        Returns:
+        --------
+          The names that start with prefix, regardless of case.
+        """
+
+        return self._search(prefix)
+
+    def like(self, pattern):
+        """
+        Returns:
+        --------
+          The names that match a SQL LIKE pattern, where % is any text and _ is any character.
+        """
+
+        prefix, regex = _like_regex(pattern)
+        return self._search(prefix, regex.match)
+
+    def glob(self, pattern):
+        """
+        Returns:
+        --------
+          The names that match a shell style pattern, with *, ?, and [].
+        """
+
+        regex = re.compile(fnmatch.translate(pattern), re.IGNORECASE)
+        return self._search(_glob_prefix(pattern), regex.match)
+
+    def regex(self, pattern):
+        """
+        Returns:
+        --------
+          The names with a match of a regular expression anywhere in them.
+          Unlike other searches, this is case sensitive.
+
+        Raises:
+        -------
+          re.error - If the pattern is not a valid regular expression.
+        """
+
+        return self._search(_regex_prefix(pattern), re.compile(pattern).search)
+
+    def match(self, patterns, kind='like'):
+        """
+        Parameters:
+        -----------
+          patterns (list or str) - A pattern or list of patterns.
+
+          kind (str) - The kind of patterns, one of KINDS. (default 'like')
+
+        Returns:
+        --------
+          A sorted list of the names that match any of the patterns, without repeats.
+
+        Raises:
+        -------
+          ValueError - If kind is not one of KINDS.
+        """
+
+        if kind not in KINDS:
+            raise ValueError('Kind of pattern must be one of %s, not %s' % (KINDS, kind))
+
+        if not isinstance(patterns, list):
+            patterns = [patterns]
+
+        search = getattr(self, kind)
+
+        if len(patterns) == 1:
+            return search(patterns[0])
+
+        found = set()
+        for pattern in patterns:
+            found.update(search(pattern))
+
+        return sorted(found, key=lambda name: (name.lower(), name))
+
+
+_INDEXES = {}
+
+_INDEXES_LOCK = threading.Lock()
+
+def get_index(cnf=None, energy=13, history=True, max_age=0.0):
+    """
+    Get the index of a table, which is kept for the life of the process.
+
+    Parameters:
+    -----------
+      cnf (str) - Location of the MySQL connection configuration file.
+                  (default None, see XSecConnection.__init__)
+
+      energy (int) - Energy to determine the table to index. (default 13)
+
+      history (bool) - Whether to index the history table. See SampleIndex.__init__. (default True)
+
+      max_age (float) - See SampleIndex.refresh. (default 0.0)
+
+    Returns:
+    --------
+      A SampleIndex that has been refreshed.
+    """
+
+    key = (default_cnf(cnf), energy, bool(history))
+
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(key)
+        if index is None:
+            index = SampleIndex(cnf, energy, history)
+            _INDEXES[key] = index
+
+    index.refresh(max_age)
+
+    return index
+
+def clear():
+    """
+    Drop every index. This is needed after tables are dropped and made again, like by create_tables.
+    """
+
+    with _INDEXES_LOCK:
+        _INDEXES.clear()
@@ -0,0 +1,281 @@
+"""
+A WSGI service for reading cross sections over HTTP.
+All responses are JSON. The endpoints are:
+
+  /xsec?energy=13&samples=sample1,sample2
+      Cross sections and uncertainties for each sample, in the order given.
+      Samples can also be given with repeated "sample" parameters, and keep the order of the query.
+      Missing samples and samples with a cross section of 0 have an error instead.
+
+  /history?energy=13&samples=sample1,sample2&archive=0
+      The output of CrossSecDB.reader.dump_history.
+      With archive=1, archived history is included too.
+
+  /like?energy=13&pattern=DM%&history=1&kind=like
+      The output of CrossSecDB.reader.get_samples_like.
+      The kind can be like, glob, regex, or prefix.
+
+  /version?energy=13
+      The last time that the energy was updated and the number of entries in its history.
+
+Every response has an ETag and Last-Modified header based on the last update of the energy's table.
+Clients that send the ETag back with If-None-Match get a 304 if nothing changed.
+If-Modified-Since is not used, since times only have a precision of one second,
+and a write during the same second as the last request would be missed.
+The ETag also has the number of entries, so it changes with every write.
+Responses are also kept in memory until the table changes.
+
+To run a server for testing, use xs_service.py or make_server.
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import re
+import json
+import time
+import logging
+
+from email.utils import formatdate
+from wsgiref.simple_server import make_server as wsgiref_server, WSGIServer, WSGIRequestHandler
+
+try:
+    from urlparse import parse_qsl
+    from SocketServer import ThreadingMixIn
+except ImportError:
+    from urllib.parse import parse_qsl
+    from socketserver import ThreadingMixIn
+
+from . import reader
+from . import sampleindex
+from .cache import XSecCache, NOT_CACHED
+from .connection import ENERGIES
+
+logger = logging.getLogger(__name__)
+
+STATUS = {
+    200: '200 OK',
+    304: '304 Not Modified',
+    400: '400 Bad Request',
+    404: '404 Not Found',
+    405: '405 Method Not Allowed',
+    500: '500 Internal Server Error'
+    }
+
+class BadRequest(Exception):
+    pass
+
+def _parse_query(query):
+    """
+    Parse a query string into a dictionary of lists, like parse_qs.
+    Values of "sample" and "samples" both go under "samples", in the order they were given.
+    """
+
+    params = {}
+    for name, value in parse_qsl(query):
+        if name == 'sample':
+            name = 'samples'
+        params.setdefault(name, []).append(value)
+
+    return params
+
+def _samples(params):
+    """
+    Get the list of samples from the "sample" and "samples" parameters.
+    """
+
+    samples = []
+    for listed in params.get('samples', []):
+        samples.extend([sample.strip() for sample in listed.split(',') if sample.strip()])
+
+    if not samples:
+        raise BadRequest('No samples given')
+
+    return samples
+
+class XSecService(object):
+    """
+    The WSGI application. Each instance keeps its own response cache.
+    """
+
+    def __init__(self, cnf=None, cache_size=1000, version_ttl=2.0):
+        """
+        Parameters:
+        -----------
+          cnf (str) - Location of the MySQL connection configuration file.
+                      (default None, see XSecConnection.__init__)
+
+          cache_size (int) - The maximum number of responses to keep in memory. (default 1000)
+
+          version_ttl (float) - The number of seconds to trust the last checked version of a table.
+                                Changes to the database can take this long to show up. (default 2.0)
+        """
+
+        self.cnf = cnf
+        self.version_ttl = version_ttl
+        self.responses = XSecCache(max_size=cache_size, ttl=None)
+
+        # Energy: (time checked, (last_updated, number of history entries))
+        self._versions = {}
+
+        self.handlers = {
+            '/xsec': self.xsec,
+            '/history': self.history,
+            '/like': self.like,
+            '/version': self.version
+            }
+
+    def table_version(self, energy):
+        """
+        Get the version of an energy's table, only checking the database every version_ttl seconds.
+        """
+
+        now = time.time()
+        checked = self._versions.get(energy)
+
+        if checked is None or now - checked[0] > self.version_ttl:
+            checked = (now, reader.get_table_version(self.cnf, energy))
+            self._versions[energy] = checked
+
+        return checked[1]
+
+    def xsec(self, params, energy):
+        samples = _samples(params)
+        found = reader.lookup_xsec(samples, self.cnf, energy, get_uncert=True)
+
+        output = []
+
+        for sample in samples:
+            entry = {'sample': sample, 'cross_section': None, 'uncertainty': None, 'error': None}
+
+            if sample not in found:
+                entry['error'] = 'missing'
+            else:
+                entry['cross_section'], entry['uncertainty'] = found[sample]
+                if not entry['cross_section']:
+                    entry['error'] = 'invalid'
+
+            output.append(entry)
+
+        return {'energy': energy, 'results': output}
+
+    def history(self, params, energy):
+        include_archive = params.get('archive', ['0'])[0] not in ['0', 'false', '']
+        return reader.dump_history(_samples(params), self.cnf, energy, include_archive)
+
+    def like(self, params, energy):
+        patterns = params.get('pattern')
+        if not patterns:
+            raise BadRequest('No pattern given')
+
+        history = params.get('history', ['1'])[0] not in ['0', 'false', '']
+
+        kind = params.get('kind', ['like'])[0]
+        if kind not in sampleindex.KINDS:
+            raise BadRequest('Invalid kind of pattern: %s' % kind)
+
+        index = sampleindex.get_index(self.cnf, energy, history)
+
+        try:
+            return index.match(patterns, kind)
+        except re.error as err:
+            raise BadRequest('Invalid regular expression: %s' % err)
+
+    def version(self, params, energy):
+        last_updated, count = self.table_version(energy)
+        return {'energy': energy, 'last_updated': last_updated, 'entries': count}
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '').rstrip('/')
+
+        def respond(code, headers, body=b''):
+            start_response(STATUS[code], headers + [('Content-Length', str(len(body)))])
+            return [body] if environ.get('REQUEST_METHOD') != 'HEAD' else []
+
+        def error(code, message):
+            body = json.dumps({'error': message}).encode('utf-8')
+            return respond(code, [('Content-Type', 'application/json')], body)
+
+        handler = self.handlers.get(path)
+
+        if handler is None:
+            return error(404, 'Unknown path %s' % path)
+
+        if environ.get('REQUEST_METHOD', 'GET') not in ['GET', 'HEAD']:
+            return error(405, 'Only GET is supported')
+
+        try:
+            params = _parse_query(environ.get('QUERY_STRING', ''))
+
+            try:
+                energy = int(params.get('energy', ['13'])[0])
+            except ValueError:
+                energy = None
+            if energy not in ENERGIES:
+                raise BadRequest('Invalid energy: %s' % params.get('energy', [''])[0])
+
+            version = self.table_version(energy)
+            last_updated, count = version
+
+            modified = int(time.mktime(last_updated.timetuple())) if last_updated else 0
+            headers = [('ETag', '"%i-%i-%i"' % (energy, modified, count)),
+                       ('Cache-Control', 'no-cache')]
+            if last_updated:
+                headers.append(('Last-Modified', formatdate(modified, usegmt=True)))
+
+            # Check if the client already has the latest version
+
+            if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+
+            if if_none_match is not None:
+                if headers[0][1] in [tag.strip() for tag in if_none_match.split(',')] or \
+                        if_none_match.strip() == '*':
+                    return respond(304, headers)
+
+            # Use the cached response if we have it
+
+            key = (path, tuple(sorted([(name, tuple(values)) for name, values in params.items()])), version)
+            body = self.responses.get(key)
+
+            if body is NOT_CACHED:
+                body = json.dumps(handler(params, energy), default=str).encode('utf-8')
+                self.responses.put(key, body)
+
+            return respond(200, [('Content-Type', 'application/json')] + headers, body)
+
+        except BadRequest as err:
+            return error(400, str(err))
+
+        except Exception as err:
+            logger.exception('Error handling %s?%s', path, environ.get('QUERY_STRING', ''))
+            return error(500, '%s: %s' % (err.__class__.__name__, err))
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+def make_server(host='localhost', port=8080, cnf=None, quiet=False, **kwargs):
+    """
+    Make a threaded HTTP server running the service.
+    Call serve_forever() on the result to start it.
+
+    Parameters:
+    -----------
+      host (str) - The host name to listen on. (default 'localhost')
+
+      port (int) - The port to listen on. (default 8080)
+
+      cnf (str) - Location of the MySQL connection configuration file.
+                  (default None, see XSecConnection.__init__)
+
+      quiet (bool) - If True, do not log every request to STDERR. (default False)
+
+      kwargs - Other arguments are passed to XSecService.__init__.
+    """
+
+    return wsgiref_server(host, port, XSecService(cnf=cnf, **kwargs),
+                          server_class=ThreadingWSGIServer,
+                          handler_class=QuietHandler if quiet else WSGIRequestHandler)
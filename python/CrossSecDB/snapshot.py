@@ -0,0 +1,521 @@
+"""
+Offline snapshots of the cross section tables, for jobs that cannot reach the database.
+A snapshot is a single binary file that is read through mmap,
+so opening it is fast no matter how large it is, and only the pages that are used are read.
+
+Make a snapshot with xs_snapshot.py or export, ship it with the job, and point the reader at it:
+
+    from CrossSecDB import snapshot
+    snapshot.enable('xsec.snap')
+
+    from CrossSecDB.reader import get_xsec
+    print get_xsec('WJetsToLNu_TuneCUETP8M1_13TeV-amcatnloFXFX-pythia8')
+
+Or set the environment variable $XSECSNAPSHOT to the location of the snapshot.
+While a snapshot is enabled, CrossSecDB.reader.get_xsec and lookup_xsec answer
+only from the snapshot, whatever the cnf argument is. Other reader functions still use the database.
+
+An enabled snapshot file can be replaced at any time, like by xs_refresher.py (see CrossSecDB.nodecache).
+Each process notices within a second and opens the new file, without blocking lookups.
+Every process on a node that maps the same file shares the same pages in memory.
+
+File format (version 1), with everything little-endian:
+
+  Header: magic (8 bytes), format version (uint32), number of energies (uint32), creation time (float64)
+  Directory: for each energy, the energy (uint32), number of samples N (uint32),
+             the table version as the last update time (float64, NaN for an empty table)
+             and number of history entries (uint64), then the positions (uint64) of the six arrays below
+  Arrays for each energy:
+    key offsets (N + 1 uint32) and key bytes - Lower case UTF-8 sample names, sorted
+    name offsets (N + 1 uint32) and name bytes - Sample names as they are in the database, parallel to the keys
+    cross sections (N float64) and uncertainties (N float64), parallel to the keys
+
+Samples are found by a binary search of the keys, so lookups are not case sensitive, like the database.
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import os
+import mmap
+import time
+import struct
+import logging
+import calendar
+import datetime
+import threading
+
+from .backends import as_datetime
+from .connection import get_connection, ENERGIES
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'XSECSNAP'
+
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct('<8sIId')
+
+_ENTRY = struct.Struct('<IIdQ6Q')
+
+_OFFSETS = struct.Struct('<II')
+
+_DOUBLE = struct.Struct('<d')
+
+class SnapshotError(Exception):
+    pass
+
+def _to_key(sample):
+    """
+    Returns:
+    --------
+      The bytes that a sample name is sorted and searched by.
+    """
+
+    key = sample.lower()
+    if not isinstance(key, bytes):
+        key = key.encode('utf-8')
+
+    return key
+
+def _to_bytes(sample):
+    return sample if isinstance(sample, bytes) else sample.encode('utf-8')
+
+def _to_timestamp(value):
+    return float('nan') if value is None else float(calendar.timegm(value.timetuple()))
+
+def _from_timestamp(value):
+    return None if value != value else datetime.datetime.utcfromtimestamp(value)
+
+def _pad(data):
+    """
+    Pad data to a multiple of 8 bytes, so the arrays after it line up.
+    """
+
+    return data + b'\0' * (-len(data) % 8)
+
+def _pack_strings(strings):
+    """
+    Returns:
+    --------
+      The packed offsets and the bytes of a list of strings.
+    """
+
+    offsets = [0]
+    for string in strings:
+        offsets.append(offsets[-1] + len(string))
+
+    return struct.pack('<%iI' % len(offsets), *offsets), b''.join(strings)
+
+def write_snapshot(file_name, tables, versions=None, created=None):
+    """
+    Write a snapshot file.
+    The file is written to a temporary location first and then renamed,
+    so readers never see a partly written snapshot.
+
+    Parameters:
+    -----------
+      file_name (str) - The location to write the snapshot to.
+
+      tables (dict) - For each energy, a list of (sample, cross section, uncertainty) tuples.
+
+      versions (dict) - For each energy, the tuple from CrossSecDB.reader.get_table_version.
+                        (default None, which records no version)
+
+      created (datetime.datetime) - The time the snapshot was made. (default None, for now)
+    """
+
+    versions = versions or {}
+    created = created or datetime.datetime.utcnow()
+
+    energies = sorted(tables)
+
+    header_size = _HEADER.size + _ENTRY.size * len(energies)
+    entries = []
+    blocks = []
+    position = header_size + (-header_size % 8)
+
+    for energy in energies:
+        rows = sorted([(_to_key(sample), _to_bytes(sample), xs, uncert or 0.0)
+                       for sample, xs, uncert in tables[energy]])
+
+        key_offsets, key_bytes = _pack_strings([row[0] for row in rows])
+        name_offsets, name_bytes = _pack_strings([row[1] for row in rows])
+
+        arrays = [key_offsets, key_bytes, name_offsets, name_bytes,
+                  struct.pack('<%id' % len(rows), *[row[2] for row in rows]),
+                  struct.pack('<%id' % len(rows), *[row[3] for row in rows])]
+
+        positions = []
+        for array in arrays:
+            positions.append(position)
+            blocks.append(_pad(array))
+            position += len(blocks[-1])
+
+        last_updated, count = versions.get(energy, (None, 0))
+        entries.append(_ENTRY.pack(energy, len(rows), _to_timestamp(last_updated), count, *positions))
+
+    tmp_name = '%s.tmp%i' % (file_name, os.getpid())
+
+    with open(tmp_name, 'wb') as output:
+        output.write(_pad(_HEADER.pack(MAGIC, FORMAT_VERSION, len(energies), _to_timestamp(created)) +
+                          b''.join(entries)))
+        for block in blocks:
+            output.write(block)
+
+    os.rename(tmp_name, file_name)
+
+def export(file_name, energies=ENERGIES, cnf=None):
+    """
+    Write the current cross sections in the database to a snapshot file.
+
+    Parameters:
+    -----------
+      file_name (str) - The location to write the snapshot to.
+
+      energies (list) - The energies of the tables to put in the snapshot.
+                        (default ENERGIES in CrossSecDB.connection, which is all of them)
+
+      cnf (str) - Location of the MySQL connection configuration file.
+                  (default None, see XSecConnection.__init__)
+
+    Returns:
+    --------
+      A dictionary of the number of samples written for each energy.
+
+    Raises:
+    -------
+      ValueError - If there is no table for one of the energies.
+    """
+
+    for energy in energies:
+        if energy not in ENERGIES:
+            raise ValueError('There is no table for energy %s. Valid energies are %s' % (energy, ENERGIES))
+
+    tables = {}
+    versions = {}
+
+    with get_connection(write=False, cnf=cnf) as conn:
+        for energy in sorted(set(energies)):
+            # The version is read first, so a write during the export makes the snapshot look older, not newer
+            conn.curs.execute('SELECT MAX(last_updated), COUNT(*) FROM xs_{0}TeV_history'.format(energy))
+            last_updated, count = conn.curs.fetchone()
+            versions[energy] = (as_datetime(last_updated), count)
+
+            conn.curs.execute('SELECT sample, cross_section, uncertainty FROM xs_{0}TeV'.format(energy))
+            tables[energy] = list(conn.curs.fetchall())
+
+    write_snapshot(file_name, tables, versions)
+
+    return dict([(energy, len(rows)) for energy, rows in tables.items()])
+
+
+class Snapshot(object):
+    """
+    A snapshot file, opened read-only through mmap.
+    Nothing but the header is read until samples are looked up.
+    """
+
+    def __init__(self, file_name):
+        """
+        Parameters:
+        -----------
+          file_name (str) - The location of a file written by write_snapshot or export.
+
+        Raises:
+        -------
+          SnapshotError - If the file is not a snapshot, or has a different format version.
+        """
+
+        self.file_name = file_name
+
+        with open(file_name, 'rb') as input_file:
+            try:
+                self._map = mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise SnapshotError('%s is empty' % file_name)
+
+        try:
+            self._read_header()
+        except (SnapshotError, struct.error):
+            self._map.close()
+            raise SnapshotError('%s is not a version %i snapshot' % (file_name, FORMAT_VERSION))
+
+    def _read_header(self):
+        magic, version, num_energies, created = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise SnapshotError()
+
+        self.created = _from_timestamp(created)
+
+        # Energy: (number of samples, positions of arrays)
+        self._tables = {}
+        self._versions = {}
+
+        for index in range(num_energies):
+            entry = _ENTRY.unpack_from(self._map, _HEADER.size + index * _ENTRY.size)
+            energy, size, last_updated, count = entry[:4]
+
+            if max(entry[4:]) > len(self._map):
+                raise SnapshotError()
+
+            self._tables[energy] = (size, entry[4:])
+            self._versions[energy] = (_from_timestamp(last_updated), count)
+
+        self.energies = sorted(self._tables)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._map.close()
+
+    def _table(self, energy):
+        table = self._tables.get(energy)
+        if table is None:
+            raise SnapshotError('Snapshot %s has no table for energy %s. It has %s' %
+                                (self.file_name, energy, self.energies))
+        return table
+
+    def _string(self, offsets, strings, index):
+        start, end = _OFFSETS.unpack_from(self._map, offsets + 4 * index)
+        return self._map[strings + start:strings + end]
+
+    def version(self, energy=13):
+        """
+        Returns:
+        --------
+          The version of the table when the snapshot was made,
+          in the same format as CrossSecDB.reader.get_table_version.
+        """
+
+        self._table(energy)
+        return self._versions[energy]
+
+    def size(self, energy=13):
+        """
+        Returns:
+        --------
+          The number of samples at an energy.
+        """
+
+        return self._table(energy)[0]
+
+    def find(self, sample, energy=13):
+        """
+        Find the position of a sample in the arrays of an energy.
+        If there are samples that only differ by case, the one that matches exactly is used.
+
+        Returns:
+        --------
+          The position, or None if the sample is not in the snapshot.
+        """
+
+        size, (key_offsets, key_bytes, name_offsets, name_bytes, _, _) = self._table(energy)
+
+        key = _to_key(sample)
+
+        low, high = 0, size
+        while low < high:
+            middle = (low + high) // 2
+            if self._string(key_offsets, key_bytes, middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low == size or self._string(key_offsets, key_bytes, low) != key:
+            return None
+
+        name = _to_bytes(sample)
+
+        for index in range(low, size):
+            if self._string(key_offsets, key_bytes, index) != key:
+                break
+            if self._string(name_offsets, name_bytes, index) == name:
+                return index
+
+        return low
+
+    def value(self, index, energy=13, get_uncert=False):
+        """
+        Returns:
+        --------
+          The cross section at a position from find, or a tuple with its uncertainty if get_uncert is True.
+        """
+
+        arrays = self._table(energy)[1]
+
+        xs = _DOUBLE.unpack_from(self._map, arrays[4] + 8 * index)[0]
+        if not get_uncert:
+            return xs
+
+        return xs, _DOUBLE.unpack_from(self._map, arrays[5] + 8 * index)[0]
+
+    def lookup_xsec(self, samples, energy=13, get_uncert=False):
+        """
+        Returns:
+        --------
+          The same as CrossSecDB.reader.lookup_xsec, but from the snapshot.
+        """
+
+        found = {}
+
+        for sample in set(samples):
+            index = self.find(sample, energy)
+            if index is not None:
+                found[sample] = self.value(index, energy, get_uncert)
+
+        return found
+
+    def lookup_xsec_energies(self, samples, energies=ENERGIES, get_uncert=False):
+        """
+        Returns:
+        --------
+          The same as CrossSecDB.reader.lookup_xsec_energies, but from the snapshot.
+        """
+
+        found = {}
+
+        for energy in sorted(set(energies)):
+            for sample, value in self.lookup_xsec(samples, energy, get_uncert).items():
+                found[(sample, energy)] = value
+
+        return found
+
+    def samples(self, energy=13):
+        """
+        Generator of the names of all of the samples at an energy.
+        """
+
+        size, arrays = self._table(energy)
+
+        for index in range(size):
+            name = self._string(arrays[2], arrays[3], index)
+            yield name if isinstance(name, str) else name.decode('utf-8')
+
+
+class FollowedSnapshot(object):
+    """
+    A snapshot file that can be replaced by renaming a new file over it while it is being read.
+    Lookups never wait: each one reads from whichever snapshot was current when it started.
+    The old mapping is dropped once no lookup is using it.
+    """
+
+    def __init__(self, file_name, check_interval=1.0):
+        """
+        Parameters:
+        -----------
+          file_name (str) - The location of the snapshot file.
+
+          check_interval (float) - The number of seconds between checks for a new file. (default 1.0)
+
+        Raises:
+        -------
+          SnapshotError - If the file is not a snapshot, or has a different format version.
+        """
+
+        self.file_name = file_name
+        self.check_interval = check_interval
+
+        self._file_id = self._stat()
+        self._snapshot = Snapshot(file_name)
+        self._checked = time.time()
+
+        # Only one thread opens a new file. The others keep reading the old one in the meantime.
+        self._reopen_lock = threading.Lock()
+
+    def _stat(self):
+        stat = os.stat(self.file_name)
+        return stat.st_ino, stat.st_mtime, stat.st_size
+
+    def current(self):
+        """
+        Returns:
+        --------
+          The Snapshot to read from, after opening the file again if it was replaced.
+          If the new file cannot be read, the old snapshot is kept.
+        """
+
+        now = time.time()
+
+        if now - self._checked >= self.check_interval and self._reopen_lock.acquire(False):
+            try:
+                self._checked = now
+                file_id = self._stat()
+
+                if file_id != self._file_id:
+                    logger.info('Opening new snapshot %s', self.file_name)
+                    self._snapshot = Snapshot(self.file_name)
+                    self._file_id = file_id
+
+            except (OSError, SnapshotError) as err:
+                logger.error('Keeping the old snapshot, since the new one could not be opened: %s', err)
+
+            finally:
+                self._reopen_lock.release()
+
+        return self._snapshot
+
+    def lookup_xsec(self, samples, energy=13, get_uncert=False):
+        """
+        See Snapshot.lookup_xsec
+        """
+
+        return self.current().lookup_xsec(samples, energy, get_uncert)
+
+    def lookup_xsec_energies(self, samples, energies=ENERGIES, get_uncert=False):
+        """
+        See Snapshot.lookup_xsec_energies
+        """
+
+        return self.current().lookup_xsec_energies(samples, energies, get_uncert)
+
+
+_SNAPSHOT = None
+
+def enable(file_name, check_interval=1.0):
+    """
+    Answer CrossSecDB.reader lookups from a snapshot file in this process.
+
+    Parameters:
+    -----------
+      file_name (str) - The location of the snapshot file.
+
+      check_interval (float) - The number of seconds between checks for a replaced file.
+                               If None, the file is never opened again. (default 1.0)
+
+    Returns:
+    --------
+      The Snapshot or FollowedSnapshot that is now in use.
+    """
+
+    global _SNAPSHOT
+
+    if check_interval is None:
+        _SNAPSHOT = Snapshot(file_name)
+    else:
+        _SNAPSHOT = FollowedSnapshot(file_name, check_interval)
+
+    return _SNAPSHOT
+
+def disable():
+    """
+    Go back to reading from the database.
+    """
+
+    global _SNAPSHOT
+    _SNAPSHOT = None
+
+def current():
+    """
+    Returns:
+    --------
+      The Snapshot or FollowedSnapshot in use, or None if no snapshot is enabled.
+    """
+
+    return _SNAPSHOT
+
+if os.environ.get('XSECSNAPSHOT'):
+    enable(os.environ['XSECSNAPSHOT'])
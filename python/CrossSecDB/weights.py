@@ -0,0 +1,124 @@
+"""
+Weights that normalize Monte Carlo samples to a luminosity.
+For each sample, weight = cross section * luminosity / sum of generator weights.
+Needs NumPy, like CrossSecDB.arrays.
+
+    from CrossSecDB.weights import get_weights
+
+    weights, uncertainties = get_weights(samples, sum_weights, lumi=35900.0)
+
+Cross sections in the database are in pb, so the luminosity should be in pb^-1.
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import logging
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .arrays import get_xsec_arrays, as_str
+from .connection import DEFAULT_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+class BadWeightInput(Exception):
+    def __init__(self, message, samples=None):
+        Exception.__init__(self, message)
+        # The samples with bad inputs
+        self.samples = samples or []
+
+def _as_array(values, name, shape):
+    """
+    Broadcast a scalar or array input to the shape of the samples.
+    """
+
+    try:
+        array = numpy.broadcast_to(numpy.asarray(values, dtype=numpy.float64), shape)
+    except ValueError:
+        raise BadWeightInput('The shape of %s %s does not match the samples %s' %
+                             (name, numpy.shape(values), shape))
+
+    return array
+
+def get_weights(samples, sum_weights, lumi, cnf=None, energy=13,
+                lumi_uncert=0.0, sum_weights_uncert=0.0, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Calculate the luminosity weight of each sample, and its uncertainty.
+    All of the inputs are checked before anything is calculated,
+    and all cross sections are looked up together.
+
+    Parameters:
+    -----------
+      samples (list or numpy.ndarray) - The sample names.
+
+      sum_weights (list or numpy.ndarray) - The sum of generator weights of each sample.
+
+      lumi (float) - The target luminosity, in pb^-1.
+
+      cnf (str) - Location of the MySQL connection configuration file.
+                  (default None, see XSecConnection.__init__)
+
+      energy (int) - Energy to determine the table to look up cross sections from.
+                     (default 13)
+
+      lumi_uncert (float) - The absolute uncertainty on the luminosity. (default 0.0)
+
+      sum_weights_uncert (float or numpy.ndarray) - The absolute uncertainty on each sum of weights.
+                                                    (default 0.0)
+
+      chunk_size (int) - The maximum number of samples to look up in a single query.
+                         (default DEFAULT_CHUNK_SIZE in CrossSecDB.connection)
+
+    Returns:
+    --------
+      A tuple of two float64 arrays, the weights and their absolute uncertainties, parallel to samples.
+      The relative uncertainties of the cross section, luminosity, and sum of weights
+      are added in quadrature.
+
+    Raises:
+    -------
+      ImportError - If NumPy is not installed.
+
+      BadWeightInput - If the luminosity is not positive, any sum of weights is not positive,
+                       or any input is not finite or does not line up with the samples.
+                       The samples attribute lists every sample with a bad sum of weights.
+
+      NoMatchingDataset - If any of the samples are not in the database.
+                          The message lists every missing sample.
+
+      InvalidDataset - If any of the samples have a cross section of 0.
+                       The message lists every invalid sample.
+    """
+
+    if numpy is None:
+        raise ImportError('NumPy is needed for CrossSecDB.weights. Install it with "pip install numpy".')
+
+    names = numpy.asarray(samples)
+
+    sum_weights = _as_array(sum_weights, 'sum_weights', names.shape)
+    sum_weights_uncert = _as_array(sum_weights_uncert, 'sum_weights_uncert', names.shape)
+
+    if not numpy.isfinite(lumi) or lumi <= 0:
+        raise BadWeightInput('The luminosity must be positive, not %s' % lumi)
+
+    if not numpy.isfinite(lumi_uncert) or lumi_uncert < 0:
+        raise BadWeightInput('The luminosity uncertainty must be non-negative, not %s' % lumi_uncert)
+
+    bad = numpy.logical_not(numpy.isfinite(sum_weights) & (sum_weights > 0) &
+                            numpy.isfinite(sum_weights_uncert) & (sum_weights_uncert >= 0))
+
+    if bad.any():
+        bad_samples = [as_str(sample) for sample in names[bad]]
+        raise BadWeightInput('Sums of weights must be positive, with non-negative uncertainties. Bad samples: %s' %
+                             ', '.join(bad_samples), bad_samples)
+
+    xs, xs_uncert = get_xsec_arrays(names, cnf, energy, on_error='raise', chunk_size=chunk_size)
+
+    weights = xs * lumi / sum_weights
+
+    relative = numpy.sqrt((xs_uncert/xs)**2 + (lumi_uncert/lumi)**2 + (sum_weights_uncert/sum_weights)**2)
+
+    return weights, weights * relative
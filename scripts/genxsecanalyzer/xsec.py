@@ -0,0 +1,138 @@
+#! /usr/bin/python
+
+"""
+Usage:
+
+  xsec.py [--workers=N] [--files-per-job=N] [--timeout=SECONDS] [--limit=N] [--dry-run[=FILE]]
+          [--cmsrun=EXE] [--das-client=EXE] [--config=CONFIG] INPUT [INPUT ...]
+  xsec.py --logs [--dry-run[=FILE]] DATASET LOG [LOG ...]
+
+Runs the GenXSecAnalyzer on a dataset or list of datasets in parallel,
+and puts the cross sections with their uncertainties into the database.
+
+Each INPUT is either a dataset in CMS notation (/Process/Conditions/DataTier),
+a dataset in MIT notation (Process+Conditions+DataTier),
+or the name of a file with one dataset per line.
+
+The files of each dataset are split into cmsRun jobs of at most N files (default 50),
+and N jobs (default 4) run at once.
+A dataset that takes longer than SECONDS, from when its files start being listed, is stopped,
+and it is not put into the database.
+Datasets with the same process name would be the same sample in the database,
+so they are refused before anything runs.
+With --limit, only N files of each dataset are used.
+The cross sections of the jobs of a dataset are averaged, weighted by the number of events in each job.
+
+With --logs, cmsRun is not run. Instead, the cross section of DATASET is
+the combination of every job in the LOG files, which can have any number of jobs each.
+Give '-' as LOG to read from STDIN, so compressed logs can be piped in.
+
+With --dry-run, nothing is put into the database.
+Instead, put_xs.py commands are written to FILE (default xsec_output.txt) to run later,
+which is useful when the CMSSW Python does not have MySQLdb.
+
+By default, the executables cmsRun and das_client from the $PATH are used,
+with genxsec.py from the same directory as this script.
+
+By default, the my.cnf configuration file is a centrally maintained one.
+To point to your own file, set the environment variable $XSECCONF to the location.
+To put the cross sections in a different energy table, set the environment variable $ENERGY.
+
+Examples:
+
+  xsec.py --workers=8 --timeout=3600 datasets.txt
+  zcat job_*.log.gz | xsec.py --logs /TTJets_TuneCUETP8M1_13TeV-madgraphMLM-pythia8/RunIISummer16MiniAODv2-PUMoriond17_80X_mcRun2_asymptotic_2016_TrancheIV_v6-v1/MINIAODSIM -
+  xsec.py --limit=10 --dry-run /DM_ScalarWH_Mphi-1000_Mchi-1_gSM-1p0_gDM-1p0_v2_13TeV-JHUGen/RunIISummer16MiniAODv2-PUMoriond17_80X_mcRun2_asymptotic_2016_TrancheIV_v6-v1/MINIAODSIM
+
+Author:
+
+  Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import os
+import sys
+import logging
+
+from CrossSecDB import genxsec
+
+
+def read_inputs(inputs):
+    """
+    Get the list of datasets from the command line arguments.
+    """
+
+    datasets = []
+    for arg in inputs:
+        if os.path.isfile(arg):
+            with open(arg, 'r') as input_file:
+                datasets.extend([line.strip() for line in input_file if line.strip()])
+        else:
+            datasets.append(arg)
+
+    return datasets
+
+
+def write_commands(results, file_name):
+    """
+    Write put_xs.py commands for the results that worked.
+    """
+
+    with open(file_name, 'a') as output_file:
+        for result in results:
+            if result['error'] is None:
+                output_file.write('put_xs.py --comments="%s" "%s" %s %r+-%r\n' %
+                                  (result['comments'], genxsec.SOURCE, result['sample'],
+                                   result['cross_section'], result['uncertainty']))
+
+
+if __name__ == '__main__':
+
+    options = {}
+    while len(sys.argv) > 1 and sys.argv[1].startswith('--'):
+        flag = sys.argv.pop(1).split('=')
+        options[flag[0]] = '='.join(flag[1:])
+
+    if len(sys.argv) < 2 or '--help' in options:
+        print __doc__
+        exit(0)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    timeout = options.get('--timeout')
+    limit = options.get('--limit')
+
+    if '--logs' in options:
+        if len(sys.argv) < 3:
+            print __doc__
+            exit(0)
+
+        results = [genxsec.read_logs(sys.argv[1], sys.argv[2:])]
+
+    else:
+        try:
+            results = genxsec.run_datasets(
+                read_inputs(sys.argv[1:]),
+                workers=int(options.get('--workers', 4)),
+                files_per_job=int(options.get('--files-per-job', 50)),
+                timeout=float(timeout) if timeout else None,
+                cmsrun=options.get('--cmsrun') or 'cmsRun',
+                das_client=options.get('--das-client') or 'das_client',
+                config=options.get('--config') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'genxsec.py'),
+                limit=int(limit) if limit else None)
+        except genxsec.GenXSecError as err:
+            print err
+            exit(1)
+
+    for result in results:
+        if result['error'] is None:
+            print '%s %s +- %s' % (result['sample'], result['cross_section'], result['uncertainty'])
+        else:
+            print '%s FAILED: %s' % (result['dataset'], result['error'])
+
+    if '--dry-run' in options:
+        write_commands(results, options['--dry-run'] or 'xsec_output.txt')
+    else:
+        genxsec.ingest(results, energy=int(os.environ.get('ENERGY', 13)))
+
+    # Exit with the number of failed datasets
+    exit(len([result for result in results if result['error'] is not None]))
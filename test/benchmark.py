@@ -0,0 +1,268 @@
+#! /usr/bin/python
+
+"""
+Usage:
+
+  benchmark.py [options]
+
+Times the reader and inserter functions, and the command line tools,
+against a database filled with a synthetic catalogue of samples.
+The results are written as JSON, so runs can be compared with --compare.
+
+WARNING: --fill drops and recreates all of the tables in the database
+pointed to by $XSECCONF. Only use it with a test database.
+
+Examples:
+
+  XSECCONF=test/my.cnf test/benchmark.py --fill --samples=100000 --depth=5 --output=before.json
+  XSECCONF=test/my.cnf test/benchmark.py --output=after.json --compare=before.json
+  XSECCONF=test/my.cnf test/benchmark.py --no-cli --profile > /dev/null
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import logging
+import datetime
+import subprocess
+
+from optparse import OptionParser
+
+from CrossSecDB import reader
+from CrossSecDB import inserter
+from CrossSecDB import notify
+from CrossSecDB import profiling
+from CrossSecDB.connection import get_connection, chunks, create_tables
+
+logger = logging.getLogger(__name__)
+
+def sample_name(index):
+    return 'BenchSample_%07i_TuneCUETP8M1_13TeV-madgraphMLM-pythia8' % index
+
+def fill(num_samples, depth, energy=13):
+    """
+    Recreate the tables and fill them with num_samples samples, each with depth entries of history.
+    """
+
+    create_tables()
+
+    with get_connection(write=True) as conn:
+        # A second back, so the update benchmarks do not clash with the newest history entries
+        now = datetime.datetime.now().replace(microsecond=0) - datetime.timedelta(seconds=1)
+
+        for chunk in chunks(list(range(num_samples)), 5000):
+            current = []
+            history = []
+
+            for index in chunk:
+                for version in range(depth):
+                    row = (sample_name(index), 1.0 + index + version, 0.1 * version,
+                           now - datetime.timedelta(days=version), 'benchmark', 'version %i' % version)
+                    history.append(row)
+                    if not version:
+                        current.append(row)
+
+            for table, rows in [('xs_{0}TeV', current), ('xs_{0}TeV_history', history)]:
+                conn.curs.executemany(
+                    'INSERT INTO %s (sample, cross_section, uncertainty, last_updated, source, comments) ' \
+                        'VALUES (%%s, %%s, %%s, %%s, %%s, %%s)' % table.format(energy), rows)
+
+            conn.conn.commit()
+
+def timed(func, repeat, setup=None):
+    """
+    Run func repeat times, and return a summary of the times in seconds.
+    If setup is given, it is called before each run, and is not timed.
+    """
+
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+
+    times.sort()
+
+    return {
+        'repeat': repeat,
+        'min': times[0],
+        'median': times[len(times)//2],
+        'mean': sum(times)/len(times),
+        'max': times[-1]
+        }
+
+def benchmarks(num_samples, repeat, cli):
+    """
+    Generator of (name, parameters, function to time, setup function or None)
+    """
+
+    rand = random.Random(42)
+
+    def some_samples(num):
+        return [sample_name(rand.randrange(num_samples)) for _ in range(num)]
+
+    yield 'get_xsec', {'samples': 1}, lambda: reader.get_xsec(some_samples(1)[0]), None
+
+    for size in [100, 1000, 10000]:
+        if size <= num_samples:
+            yield 'get_xsec', {'samples': size}, lambda size=size: reader.get_xsec(some_samples(size)), None
+
+    yield 'get_xsec', {'samples': 100, 'get_uncert': True}, \
+        lambda: reader.get_xsec(some_samples(100), get_uncert=True), None
+
+    yield 'dump_history', {'samples': 10}, lambda: reader.dump_history(some_samples(10)), None
+
+    yield 'get_samples_like', {'pattern': 'prefix'}, \
+        lambda: reader.get_samples_like(sample_name(rand.randrange(num_samples))[:-20] + '%'), None
+
+    yield 'get_samples_like', {'pattern': 'prefix', 'history': False}, \
+        lambda: reader.get_samples_like(sample_name(rand.randrange(num_samples))[:-20] + '%', history=False), None
+
+    new_index = [num_samples]
+    def put_new(size):
+        samples = [sample_name(index) for index in range(new_index[0], new_index[0] + size)]
+        new_index[0] += size
+        inserter.put_xsec(samples, [1.0] * size, 'benchmark')
+
+    update_index = [0]
+    def wrap_update(size):
+        # Walk through the catalogue, since updating a sample twice
+        # in the same second would clash in the history table.
+        # This is the setup of each update, so the wait is not timed.
+        if update_index[0] + min(size, num_samples) > num_samples:
+            time.sleep(1)
+            update_index[0] = 0
+
+    def put_update(size):
+        size = min(size, num_samples)
+        samples = [sample_name(index) for index in range(update_index[0], update_index[0] + size)]
+        update_index[0] += size
+        inserter.put_xsec(samples, [2.0] * size, 'benchmark')
+
+    for size in [1, 100, 1000]:
+        yield 'put_xsec_new', {'samples': size}, lambda size=size: put_new(size), None
+        yield 'put_xsec_update', {'samples': size}, lambda size=size: put_update(size), \
+            lambda size=size: wrap_update(size)
+
+    if cli:
+        devnull = open(os.devnull, 'w')
+        yield 'get_xs.py', {'samples': 1}, \
+            lambda: subprocess.check_call(['get_xs.py', some_samples(1)[0]], stdout=devnull), None
+        yield 'get_xs.py', {'samples': 100}, \
+            lambda: subprocess.check_call(['get_xs.py'] + some_samples(100), stdout=devnull), None
+
+        def put_cli():
+            sample = sample_name(new_index[0])
+            new_index[0] += 1
+            # The notifier set below is only for this process, so tell put_xs.py not to send an email
+            subprocess.check_call(['put_xs.py', '--no-email', 'benchmark', sample, '1.0'], stdout=devnull)
+
+        yield 'put_xs.py', {'samples': 1}, put_cli, None
+
+def compare(results, old_results, threshold):
+    """
+    Print the ratio of median times compared to an old run.
+
+    Returns:
+    --------
+      The number of benchmarks slower than threshold times the old median.
+    """
+
+    old = dict([((result['name'], json.dumps(result['params'], sort_keys=True)), result)
+                for result in old_results['results']])
+
+    regressions = 0
+
+    for result in results['results']:
+        previous = old.get((result['name'], json.dumps(result['params'], sort_keys=True)))
+        if previous is None:
+            continue
+
+        ratio = result['times']['median']/previous['times']['median'] if previous['times']['median'] else 0.0
+        flag = ''
+        if ratio > threshold:
+            regressions += 1
+            flag = '  <--- REGRESSION'
+
+        sys.stderr.write('%-20s %-40s %8.4f s -> %8.4f s (x%.2f)%s\n' %
+                         (result['name'], json.dumps(result['params'], sort_keys=True),
+                          previous['times']['median'], result['times']['median'], ratio, flag))
+
+    return regressions
+
+if __name__ == '__main__':
+
+    parser = OptionParser(usage=__doc__)
+    parser.add_option('--fill', action='store_true', help='Recreate and fill the database first')
+    parser.add_option('--samples', type='int', default=1000, help='Number of samples in the catalogue')
+    parser.add_option('--depth', type='int', default=3, help='Number of history entries for each sample')
+    parser.add_option('--repeat', type='int', default=5, help='Number of times to run each benchmark')
+    parser.add_option('--no-cli', action='store_false', dest='cli', default=True,
+                      help='Do not time the command line tools')
+    parser.add_option('--output', help='File to write the JSON results to (default STDOUT)')
+    parser.add_option('--compare', help='JSON results of an older run to compare to')
+    parser.add_option('--threshold', type='float', default=1.2,
+                      help='Ratio of median times that counts as a regression')
+    parser.add_option('--profile', action='store_true',
+                      help='Store the database profile of each benchmark, and print them to STDERR')
+    parser.add_option('--debug', action='store_true', help='Turn on debug logging')
+
+    opts, args = parser.parse_args()
+
+    if opts.debug:
+        logging.basicConfig(level=logging.DEBUG)
+
+    # Don't send emails about the writes
+    notify.set_notifier(notify.NullNotifier())
+
+    results = {
+        'meta': {
+            'samples': opts.samples,
+            'depth': opts.depth,
+            'repeat': opts.repeat,
+            'python': sys.version.split()[0],
+            'host': socket.getfqdn(),
+            'time': datetime.datetime.now().isoformat()
+            },
+        'results': []
+        }
+
+    if opts.fill:
+        start = time.time()
+        fill(opts.samples, opts.depth)
+        results['meta']['fill_seconds'] = time.time() - start
+
+    profiler = profiling.enable() if opts.profile else None
+
+    for name, params, func, setup in benchmarks(opts.samples, opts.repeat, opts.cli):
+        logger.debug('Running %s with %s', name, params)
+
+        if profiler is not None:
+            profiler.reset()
+
+        result = {'name': name, 'params': params, 'times': timed(func, opts.repeat, setup)}
+
+        if profiler is not None:
+            result['profile'] = profiler.stats()
+            sys.stderr.write('\n%s %s\n%s\n' % (name, json.dumps(params, sort_keys=True), profiler.summary()))
+
+        results['results'].append(result)
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+
+    if opts.output:
+        with open(opts.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+
+    if opts.compare:
+        with open(opts.compare, 'r') as old_file:
+            exit(1 if compare(results, json.load(old_file), opts.threshold) else 0)
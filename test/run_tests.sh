@@ -6,7 +6,8 @@
 
 TESTDIR=`dirname $0`
 
-export XSECCONF=$TESTDIR/my.cnf
+# Set XSECCONF to a .db file to run the tests against SQLite instead of the MySQL server
+export XSECCONF=${XSECCONF:-$TESTDIR/my.cnf}
 
 COUNTFAIL=0
 
@@ -15,7 +16,14 @@ COUNTFAIL=0
 for TESTSCRIPT in $TESTDIR/test_*.??
 do
 
-    mysql --defaults-file=$TESTDIR/my.cnf --defaults-group-suffix=-crosssec-writer -Dcross_sections < $TESTDIR/../db/cross_sections.sql
+    # The PHP page only talks to MySQL
+    if [ "$TESTSCRIPT" = "$TESTDIR/test_php.sh" ] && python -c "import sys; from CrossSecDB.backends import is_sqlite; sys.exit(not is_sqlite('$XSECCONF'))"
+    then
+        echo "SKIPPED: $TESTSCRIPT with $XSECCONF"
+        continue
+    fi
+
+    python -c 'from CrossSecDB.connection import create_tables; create_tables()'
     $TESTSCRIPT
 
     # Check the results
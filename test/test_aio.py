@@ -0,0 +1,131 @@
+#! /usr/bin/env python
+
+"""
+Tests the asyncio reader. Skipped on Python versions without asyncio.
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import os
+import sys
+import unittest
+import logging
+
+try:
+    import asyncio
+    from CrossSecDB import aio
+except (ImportError, SyntaxError):
+    sys.stderr.write('Skipping asyncio tests for Python %s\n' % sys.version.split()[0])
+    exit(0)
+
+from CrossSecDB import archive
+from CrossSecDB import connection
+from CrossSecDB import inserter
+from CrossSecDB import reader
+from CrossSecDB import sampleindex
+
+logger = logging.getLogger(__name__)
+
+class TestAsyncReader(unittest.TestCase):
+
+    cnf = os.environ.get('XSECCONF', os.path.join(os.path.dirname(__file__), 'my.cnf'))
+
+    def setUp(self):
+        """
+        At the beginning of each test, start with a fresh database and event loop
+        """
+        connection.create_tables(self.cnf)
+        sampleindex.clear()
+
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.xs_reader = aio.AsyncReader(max_workers=2, chunk_size=2)
+
+    def tearDown(self):
+        self.xs_reader.close()
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def run_loop(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def test_energies(self):
+        """
+        Chunks and energies can be looked up at the same time
+        """
+        samples = ['Test%i' % index for index in range(5)]
+        inserter.put_xsec(samples, [float(index) + 1 for index in range(5)], 'test', cnf=self.cnf)
+        inserter.put_xsec(samples, [float(index) + 11 for index in range(5)], 'test', cnf=self.cnf, energy=8)
+
+        xs_13, xs_8 = self.run_loop(asyncio.gather(
+                self.xs_reader.get_xsec(samples, cnf=self.cnf),
+                self.xs_reader.get_xsec(samples, cnf=self.cnf, energy=8)))
+
+        self.assertEqual(xs_13, [1.0, 2.0, 3.0, 4.0, 5.0])
+        self.assertEqual(xs_8, [11.0, 12.0, 13.0, 14.0, 15.0])
+
+        self.assertEqual(self.run_loop(self.xs_reader.get_xsec('Test0', cnf=self.cnf, get_uncert=True)), (1.0, 0.0))
+
+        by_energy = self.run_loop(self.xs_reader.get_xsec(samples + ['Fake'], cnf=self.cnf, energy=[8, 13]))
+        self.assertEqual(by_energy[('Test4', 8)], 15.0)
+        self.assertEqual(by_energy[('Test4', 13)], 5.0)
+        self.assertTrue(by_energy[('Fake', 8)] is reader.MISSING)
+
+        self.assertEqual(sorted(self.run_loop(self.xs_reader.dump_history(samples, cnf=self.cnf)).keys()), samples)
+        self.assertEqual(sorted(self.run_loop(self.xs_reader.get_samples_like(['Test1', 'Test2%'], cnf=self.cnf))),
+                         ['Test1', 'Test2'])
+
+    def test_archive(self):
+        """
+        The module level functions can read the archive too
+        """
+        inserter.put_xsec('Test1', 1.0, 'test', cnf=self.cnf)
+
+        with connection.get_connection(write=True, cnf=self.cnf) as conn:
+            conn.curs.execute(
+                """
+                INSERT INTO xs_13TeV_history (sample, cross_section, uncertainty, last_updated, source, comments)
+                VALUES ('Test1', 0.5, 0.0, '2017-01-01 00:00:00', 'old test', '')
+                """)
+            conn.conn.commit()
+
+        self.assertEqual(archive.archive_history(self.cnf, [13], days=365, keep=1), {13: 1})
+
+        self.assertEqual(len(self.run_loop(aio.dump_history('Test1', cnf=self.cnf))['Test1']), 1)
+        self.assertEqual([entry['cross_section'] for entry in
+                          self.run_loop(aio.dump_history('Test1', cnf=self.cnf, include_archive=True))['Test1']],
+                         [1.0, 0.5])
+
+    def test_errors(self):
+        """
+        The same errors are raised as the blocking reader
+        """
+        inserter.put_xsec(['Test1', 'Invalid'], [1.0, 0.0], 'test', cnf=self.cnf)
+
+        with self.assertRaises(reader.NoMatchingDataset) as context:
+            self.run_loop(self.xs_reader.get_xsec(['Fake1', 'Test1', 'Fake2'], cnf=self.cnf))
+        self.assertEqual(context.exception.samples, ['Fake1', 'Fake2'])
+
+        self.assertRaises(reader.InvalidDataset, self.run_loop,
+                          self.xs_reader.get_xsec(['Test1', 'Invalid'], cnf=self.cnf))
+
+    def test_cancel(self):
+        """
+        Cancelled lookups do not use up the concurrency limit
+        """
+        inserter.put_xsec('Test1', 1.0, 'test', cnf=self.cnf)
+
+        for _ in range(5):
+            task = self.loop.create_task(self.xs_reader.get_xsec(['Test1'] * 10, cnf=self.cnf))
+            self.loop.call_soon(task.cancel)
+            self.assertRaises(asyncio.CancelledError, self.run_loop, task)
+
+        self.assertEqual(self.run_loop(self.xs_reader.get_xsec('Test1', cnf=self.cnf)), 1.0)
+
+
+if __name__ == '__main__':
+
+    if len(sys.argv) > 1:
+        logging.basicConfig(level=logging.DEBUG)
+
+    unittest.main()
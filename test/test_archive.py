@@ -0,0 +1,87 @@
+#! /usr/bin/env python
+
+"""
+Tests moving old history into the archive tables.
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import os
+import datetime
+import unittest
+import logging
+
+from CrossSecDB import archive
+from CrossSecDB import connection
+from CrossSecDB import inserter
+from CrossSecDB import notify
+from CrossSecDB import reader
+
+logger = logging.getLogger(__name__)
+
+class TestArchive(unittest.TestCase):
+
+    cnf = os.environ.get('XSECCONF', os.path.join(os.path.dirname(__file__), 'my.cnf'))
+
+    def setUp(self):
+        connection.create_tables(self.cnf)
+
+        inserter.put_xsec(['Old', 'Few', 'Recent'], [1.0, 2.0, 3.0], 'test',
+                          cnf=self.cnf, notifier=notify.NullNotifier())
+
+        # Sample name, days ago
+        self.add_history([('Old', 500), ('old', 600), ('OLD', 700), ('Old', 800),
+                          ('Few', 900),
+                          ('Recent', 10), ('Recent', 20)])
+
+    def add_history(self, entries):
+        now = datetime.datetime.now().replace(microsecond=0)
+
+        with connection.get_connection(write=True, cnf=self.cnf) as conn:
+            conn.curs.executemany(
+                """
+                INSERT INTO xs_13TeV_history (sample, cross_section, uncertainty, last_updated, source, comments)
+                VALUES (%s, %s, 0.0, %s, 'old test', '')
+                """,
+                [(sample, float(days), now - datetime.timedelta(days=days)) for sample, days in entries])
+            conn.conn.commit()
+
+    def test_archive(self):
+        """
+        Only entries older than the window, and not among the newest of their sample, are moved
+        """
+
+        self.assertEqual(archive.archive_history(self.cnf, [13], days=365, keep=2, dry_run=True), {13: 3})
+        self.assertEqual(archive.table_sizes(self.cnf, [13]), {13: (10, 0)})
+
+        self.assertEqual(archive.archive_history(self.cnf, [13], days=365, keep=2), {13: 3})
+        self.assertEqual(archive.table_sizes(self.cnf, [13]), {13: (7, 3)})
+
+        # Nothing is left to move
+        self.assertEqual(archive.archive_history(self.cnf, [13], days=365, keep=2), {13: 0})
+
+        self.assertEqual([entry['cross_section'] for entry in reader.dump_history('Old', self.cnf)['Old']],
+                         [1.0, 500.0])
+        self.assertEqual([entry['cross_section'] for entry in
+                          reader.dump_history('Old', self.cnf, include_archive=True)['Old']],
+                         [1.0, 500.0, 600.0, 700.0, 800.0])
+        self.assertEqual(len(reader.dump_history('Few', self.cnf)['Few']), 2)
+        self.assertEqual(len(reader.dump_history('Recent', self.cnf)['Recent']), 3)
+
+        # Current values do not change
+        self.assertEqual(reader.get_xsec(['Old', 'Few', 'Recent'], self.cnf), [1.0, 2.0, 3.0])
+
+    def test_keep(self):
+        """
+        The newest entry of each sample is always kept, even with no retention window
+        """
+
+        self.assertEqual(archive.archive_history(self.cnf, [13], days=0, keep=1), {13: 7})
+        self.assertEqual(archive.table_sizes(self.cnf, [13]), {13: (3, 7)})
+
+        self.assertRaises(archive.BadArchiveInput, archive.archive_history, self.cnf, [13], keep=0)
+        self.assertRaises(archive.BadArchiveInput, archive.archive_history, self.cnf, [13], days=-1)
+
+
+if __name__ == '__main__':
+    unittest.main()
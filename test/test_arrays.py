@@ -0,0 +1,119 @@
+#! /usr/bin/env python
+
+"""
+Tests the NumPy interface. Skipped if NumPy is not installed.
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import os
+import sys
+import unittest
+import logging
+
+try:
+    import numpy
+except ImportError:
+    sys.stderr.write('Skipping NumPy tests, since it is not installed\n')
+    exit(0)
+
+from CrossSecDB import arrays
+from CrossSecDB import connection
+from CrossSecDB import inserter
+from CrossSecDB import reader
+from CrossSecDB import weights
+
+logger = logging.getLogger(__name__)
+
+class TestArrays(unittest.TestCase):
+
+    cnf = os.environ.get('XSECCONF', os.path.join(os.path.dirname(__file__), 'my.cnf'))
+
+    def setUp(self):
+        """
+        At the beginning of each test, start with a fresh database
+        """
+        connection.create_tables(self.cnf)
+
+        inserter.put_xsec(['Test1', 'Test2', 'Invalid'], [10.0, 20.0, 0.0], 'test', cnf=self.cnf,
+                          uncertainties=[1.0, 2.0, 0.0])
+
+    def test_arrays(self):
+        """
+        Arrays line up with the samples, even when samples repeat
+        """
+        xs, uncert = arrays.get_xsec_arrays(numpy.array([['Test2', 'Test1'], ['Test2', 'Test2']]), cnf=self.cnf)
+
+        self.assertEqual(xs.tolist(), [[20.0, 10.0], [20.0, 20.0]])
+        self.assertEqual(uncert.tolist(), [[2.0, 1.0], [2.0, 2.0]])
+
+        # Arrays of bytes work too
+        xs, uncert = arrays.get_xsec_arrays(numpy.array([b'Test2', b'Test1']), cnf=self.cnf)
+        self.assertEqual(xs.tolist(), [20.0, 10.0])
+
+        with self.assertRaises(reader.NoMatchingDataset) as context:
+            arrays.get_xsec_arrays(['Test1', 'Fake2', 'Fake1'], cnf=self.cnf)
+        self.assertEqual(context.exception.samples, ['Fake2', 'Fake1'])
+
+        self.assertRaises(reader.InvalidDataset, arrays.get_xsec_arrays, ['Test1', 'Invalid'], cnf=self.cnf)
+
+        xs, uncert = arrays.get_xsec_arrays(['Test1', 'Fake', 'Invalid'], cnf=self.cnf, on_error='nan')
+        self.assertEqual(xs[0], 10.0)
+        self.assertTrue(numpy.isnan(xs[1:]).all())
+        self.assertTrue(numpy.isnan(uncert[1:]).all())
+
+    def test_gather(self):
+        """
+        Events get the cross section of their sample code
+        """
+        table = arrays.XSecTable(['Test1', 'Test2'], cnf=self.cnf)
+
+        codes = table.encode(['Test2', 'Test2', 'Test1'])
+        self.assertEqual(codes.tolist(), [1, 1, 0])
+        self.assertEqual(table.encode(numpy.array([b'Test1', b'Test2'])).tolist(), [0, 1])
+
+        xs, uncert = table.gather(numpy.array([0, 1, 1, 0, 1]))
+        self.assertEqual(xs.tolist(), [10.0, 20.0, 20.0, 10.0, 20.0])
+        self.assertEqual(uncert.tolist(), [1.0, 2.0, 2.0, 1.0, 2.0])
+
+        self.assertEqual(arrays.gather([2, 0], numpy.array([1.0, 2.0, 3.0])).tolist(), [3.0, 1.0])
+
+        self.assertRaises(IndexError, table.gather, [0, 2])
+        self.assertRaises(IndexError, table.gather, [-1])
+        self.assertRaises(TypeError, table.gather, [0.0, 1.0])
+        self.assertRaises(KeyError, table.encode, ['Fake'])
+
+    def test_weights(self):
+        """
+        Weights are xs * lumi / sum of weights, with uncertainties added in quadrature
+        """
+        output, uncert = weights.get_weights(['Test1', 'Test2'], [100.0, 400.0], 1000.0, cnf=self.cnf,
+                                             lumi_uncert=100.0)
+
+        self.assertEqual(output.tolist(), [100.0, 50.0])
+        self.assertAlmostEqual(uncert[0], 100.0 * numpy.sqrt(0.1**2 + 0.1**2))
+        self.assertAlmostEqual(uncert[1], 50.0 * numpy.sqrt(0.1**2 + 0.1**2))
+
+        # Every bad sample is listed before any query is made
+        with self.assertRaises(weights.BadWeightInput) as context:
+            weights.get_weights(['Test1', 'Fake', 'Test2'], [0.0, numpy.nan, 1.0], 1000.0, cnf=self.cnf)
+        self.assertEqual(context.exception.samples, ['Test1', 'Fake'])
+
+        self.assertRaises(weights.BadWeightInput, weights.get_weights, ['Test1'], [1.0, 2.0], 1000.0, cnf=self.cnf)
+        self.assertRaises(weights.BadWeightInput, weights.get_weights, ['Test1'], [1.0], 0.0, cnf=self.cnf)
+
+        with self.assertRaises(reader.NoMatchingDataset) as context:
+            weights.get_weights(['Fake1', 'Test1', 'Fake2'], [1.0, 1.0, 1.0], 1000.0, cnf=self.cnf)
+        self.assertEqual(context.exception.samples, ['Fake1', 'Fake2'])
+
+        with self.assertRaises(reader.InvalidDataset) as context:
+            weights.get_weights(['Invalid', 'Test1'], [1.0, 1.0], 1000.0, cnf=self.cnf)
+        self.assertEqual(context.exception.samples, ['Invalid'])
+
+
+if __name__ == '__main__':
+
+    if len(sys.argv) > 1:
+        logging.basicConfig(level=logging.DEBUG)
+
+    unittest.main()
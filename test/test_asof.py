@@ -0,0 +1,126 @@
+#! /usr/bin/env python
+
+"""
+Tests reading the cross sections as they were at some time in the past.
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import os
+import time
+import datetime
+import unittest
+import logging
+
+from CrossSecDB import archive
+from CrossSecDB import asof
+from CrossSecDB import connection
+from CrossSecDB import inserter
+from CrossSecDB import notify
+from CrossSecDB import reader
+
+logger = logging.getLogger(__name__)
+
+class TestAsOf(unittest.TestCase):
+
+    cnf = os.environ.get('XSECCONF', os.path.join(os.path.dirname(__file__), 'my.cnf'))
+
+    def setUp(self):
+        connection.create_tables(self.cnf)
+        asof.clear()
+
+        self.now = datetime.datetime.now().replace(microsecond=0)
+
+        inserter.put_xsec(['Past', 'New'], [3.0, 4.0], 'test', uncertainties=[0.3, 0.4],
+                          cnf=self.cnf, notifier=notify.NullNotifier())
+
+        with connection.get_connection(write=True, cnf=self.cnf) as conn:
+            conn.curs.executemany(
+                """
+                INSERT INTO xs_13TeV_history (sample, cross_section, uncertainty, last_updated, source, comments)
+                VALUES (%s, %s, %s, %s, 'old test', '')
+                """,
+                [('Past', 1.0, 0.1, self.days_ago(100)),
+                 ('Past', 2.0, 0.2, self.days_ago(50))])
+            conn.conn.commit()
+
+    def days_ago(self, days):
+        return self.now - datetime.timedelta(days=days)
+
+    def test_as_of(self):
+        """
+        The latest entry at or before the time is used
+        """
+
+        self.assertEqual(reader.get_xsec('Past', self.cnf, as_of=self.days_ago(75)), 1.0)
+        self.assertEqual(reader.get_xsec('past', self.cnf, as_of=self.days_ago(50)), 2.0)
+        self.assertEqual(reader.get_xsec(['Past', 'New'], self.cnf, get_uncert=True, as_of=self.days_ago(-1)),
+                         [(3.0, 0.3), (4.0, 0.4)])
+
+        # Strings work too
+        self.assertEqual(reader.get_xsec('Past', self.cnf, as_of=self.days_ago(25).strftime('%Y-%m-%d %H:%M:%S')),
+                         2.0)
+        self.assertRaises(ValueError, reader.get_xsec, 'Past', self.cnf, as_of='last week')
+        self.assertRaises(ValueError, asof.parse_time, 1497312000)
+
+        # Samples that did not exist yet are missing
+        self.assertRaises(reader.NoMatchingDataset, reader.get_xsec, ['Past', 'New'], self.cnf,
+                          as_of=self.days_ago(75))
+        self.assertRaises(reader.NoMatchingDataset, reader.get_xsec, 'Past', self.cnf, as_of=self.days_ago(200))
+
+        self.assertEqual(reader.get_xsec(['Past', 'New'], self.cnf, energy=[8, 13], as_of=self.days_ago(75)),
+                         {('Past', 8): reader.MISSING, ('Past', 13): 1.0,
+                          ('New', 8): reader.MISSING, ('New', 13): reader.MISSING})
+
+    def test_cached(self):
+        """
+        Times before the last write are kept, and later times are read again
+        """
+
+        self.assertEqual(reader.get_xsec('Past', self.cnf, as_of=self.days_ago(75)), 1.0)
+        self.assertEqual(reader.get_xsec('Past', self.cnf, as_of=self.days_ago(-1)), 3.0)
+
+        with connection.get_connection(write=True, cnf=self.cnf) as conn:
+            conn.curs.execute('UPDATE xs_13TeV_history SET cross_section = 5.0 WHERE sample = %s', ('Past',))
+            conn.conn.commit()
+
+        # Only a write to the history changes past values, so this one is still remembered
+        self.assertEqual(reader.get_xsec('Past', self.cnf, as_of=self.days_ago(75)), 1.0)
+        self.assertEqual(reader.get_xsec('Past', self.cnf, as_of=self.days_ago(-1)), 5.0)
+
+        time.sleep(1)
+        inserter.put_xsec('Past', 6.0, 'test', cnf=self.cnf, notifier=notify.NullNotifier())
+        self.assertEqual(reader.get_xsec('Past', self.cnf, as_of=self.days_ago(-1)), 6.0)
+
+    def test_late_commit(self):
+        """
+        Times right before the last write are not kept, since a write from then can still commit
+        """
+
+        as_of = self.now - datetime.timedelta(seconds=2)
+        self.assertEqual(reader.get_xsec('Past', self.cnf, as_of=as_of), 2.0)
+
+        with connection.get_connection(write=True, cnf=self.cnf) as conn:
+            conn.curs.execute(
+                """
+                INSERT INTO xs_13TeV_history (sample, cross_section, uncertainty, last_updated, source, comments)
+                VALUES ('Past', 7.0, 0.7, %s, 'late test', '')
+                """, (as_of - datetime.timedelta(seconds=1),))
+            conn.conn.commit()
+
+        self.assertEqual(reader.get_xsec('Past', self.cnf, as_of=as_of), 7.0)
+
+    def test_archive(self):
+        """
+        Entries moved to the archive are still found
+        """
+
+        self.assertEqual(archive.archive_history(self.cnf, [13], days=10, keep=1), {13: 2})
+
+        self.assertEqual(reader.get_xsec('Past', self.cnf, as_of=self.days_ago(75)), 1.0)
+        self.assertEqual(reader.get_xsec('Past', self.cnf, as_of=self.days_ago(25)), 2.0)
+        self.assertEqual(reader.get_xsec('Past', self.cnf, as_of=self.days_ago(-1)), 3.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
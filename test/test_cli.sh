@@ -23,7 +23,45 @@ test `ENERGY=8 get_xs.py TestDataset` = "45.0" && ERRORS=$((ERRORS + 1))
 ENERGY=8 put_xs.py "test" TestDataset 45.0 || ERRORS=$((ERRORS + 1))
 test `ENERGY=8 get_xs.py TestDataset` = "45.0" || ERRORS=$((ERRORS + 1))
 
+# Nothing existed before the tests, but everything exists tomorrow
+get_xs.py --as-of=2000-01-01 TestDataset && ERRORS=$((ERRORS + 1))
+test `get_xs.py --as-of="$(date -d tomorrow '+%Y-%m-%d')" TestDataset` = "45.0" || ERRORS=$((ERRORS + 1))
+get_xs.py --as-of=bad TestDataset > /dev/null && ERRORS=$((ERRORS + 1))
+get_xs.py --as-of=bad TestDataset | grep -q "Usage:" || ERRORS=$((ERRORS + 1))
+
 # This should pass, but I'm too lazy to check the results
 get_xs.py test1 test2 || ERRORS=$((ERRORS + 1))
 
+# Load from files, with a source for rows that don't have one
+printf "sample,cross_section,uncertainty,source\nbulk1,1.5,0.5\nbulk2,2.5,,from file\nbulk3,3.5\n" | \
+    put_xs.py --file=- --chunk-size=2 "test bulk" || ERRORS=$((ERRORS + 1))
+test "`get_xs.py bulk1 bulk2 bulk3`" = "`printf '1.5\n2.5\n3.5'`" || ERRORS=$((ERRORS + 1))
+
+printf '{"sample": "bulk4", "cross_section": 4.5, "source": "json"}\n' > bulk_test.jsonl
+put_xs.py --file=bulk_test.jsonl || ERRORS=$((ERRORS + 1))
+rm bulk_test.jsonl
+test `get_xs.py bulk4` = "4.5" || ERRORS=$((ERRORS + 1))
+
+# Bad rows should fail
+printf "bulk5,-1.0,0.0,test\n" | put_xs.py --file=- --format=csv && ERRORS=$((ERRORS + 1))
+printf "bulk6,1.0,0.0,test\nbulk7,nan,0.0,test\n" | put_xs.py --file=- --format=csv && ERRORS=$((ERRORS + 1))
+printf "bulk8,inf\n" | put_xs.py --file=- --format=csv "test" && ERRORS=$((ERRORS + 1))
+printf "bulk9,1.0\n" | put_xs.py --file=- --chunk-size=many "test" && ERRORS=$((ERRORS + 1))
+
+# Nothing from a file with a bad row is written
+get_xs.py bulk6 && ERRORS=$((ERRORS + 1))
+
+# The change feed has everything so far, and nothing new after the cursor is saved
+test `xs_changes.py --lag=0 | wc -l` -eq 8 || ERRORS=$((ERRORS + 1))
+test `xs_changes.py --lag=0 --energies=8 | wc -l` -eq 1 || ERRORS=$((ERRORS + 1))
+rm -f changes_test.cursor
+test `xs_changes.py --lag=0 --cursor-file=changes_test.cursor | wc -l` -eq 8 || ERRORS=$((ERRORS + 1))
+test `xs_changes.py --lag=0 --cursor-file=changes_test.cursor | wc -l` -eq 0 || ERRORS=$((ERRORS + 1))
+sleep 1
+put_xs.py "test" TestDataset 46.0 || ERRORS=$((ERRORS + 1))
+xs_changes.py --lag=0 --cursor-file=changes_test.cursor | grep -q '"cross_section": 46.0' || ERRORS=$((ERRORS + 1))
+rm changes_test.cursor
+
+# Changes that could still be committing are left for later
+test `xs_changes.py --lag=60 | wc -l` -eq 0 || ERRORS=$((ERRORS + 1))
 exit $ERRORS
@@ -1,7 +1,7 @@
 #! /usr/bin/env python
 
 """
-Test only actually works on Python 2.7 with MySQLdb installed.
+Test only actually works on Python 2.7.
 
 Author: Daniel Abercrombie <dabercro@mit.edu>
 """
@@ -10,9 +10,9 @@ import os
 import sys
 import time
 import unittest
-import MySQLdb
 import logging
 
+from CrossSecDB import connection
 from CrossSecDB import inserter
 from CrossSecDB import reader_cmssw as reader
 
@@ -26,21 +26,7 @@ class TestInsertRead(unittest.TestCase):
         """
         At the beginning of each test, start with a fresh database
         """
-        conn = MySQLdb.connect(read_default_file=self.cnf,
-                               read_default_group='mysql-crosssec-writer',
-                               db='cross_sections')
-
-        curs = conn.cursor()
-
-        # Quickly parse our .sql file to setup a database for tests
-        with open(os.path.join(os.path.dirname(__file__), '../db/cross_sections.sql'),'r') as sql_file:
-            for line in \
-                    ''.join([line.strip() for line in sql_file if line[:2] != '--']).split(';'):
-                if line:
-                    logger.debug('About to execute line:\n%s', line)
-                    curs.execute(line)
-
-        conn.close()
+        connection.create_tables(self.cnf)
 
     def test_defaults(self):
         """
@@ -89,6 +75,27 @@ class TestInsertRead(unittest.TestCase):
         inserter.put_xsec('TestDataset', 11.0, 'test', cnf=self.cnf)
         self.assertEqual(reader.get_xsec('TestDataset', cnf=self.cnf), 11.0)
 
+    def test_uncertainties_and_errors(self):
+        """
+        The helper process gives back uncertainties and the errors from the reader
+        """
+        inserter.put_xsec(['Test1', 'Test2'], [10.0, 20.0], 'test', cnf=self.cnf, uncertainties=[2.0, 3.0])
+
+        self.assertEqual(reader.get_xsec(['Test1', 'Test2'], cnf=self.cnf, get_uncert=True),
+                         [(10.0, 2.0), (20.0, 3.0)])
+
+        try:
+            reader.get_xsec(['Test1', 'Fake1', 'Fake2'], cnf=self.cnf)
+            self.fail('Missing datasets did not raise an exception')
+        except reader.NoMatchingDataset as err:
+            self.assertEqual(sorted(err.samples), ['Fake1', 'Fake2'])
+
+        inserter.put_xsec('Invalid', 0.0, 'test', cnf=self.cnf)
+        self.assertRaises(reader.InvalidDataset, reader.get_xsec, 'Invalid', cnf=self.cnf)
+
+        # The same helper is still answering
+        self.assertEqual(reader.get_xsec('Test2', cnf=self.cnf), 20.0)
+
 if __name__ == '__main__':
     
     if len(sys.argv) > 1:
@@ -0,0 +1,219 @@
+#! /usr/bin/env python
+
+"""
+Tests the GenXSecAnalyzer driver, with stub scripts in place of das_client and cmsRun.
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import os
+import stat
+import shutil
+import tempfile
+import unittest
+import logging
+
+from CrossSecDB import connection
+from CrossSecDB import genxsec
+from CrossSecDB import notify
+from CrossSecDB import reader
+
+logger = logging.getLogger(__name__)
+
+# Lists five files, except for empty and slow datasets
+DAS_CLIENT = """#! /bin/sh
+case "$2" in
+    *Empty*) exit 0 ;;
+    *Slow*) sleep 10 ;;
+esac
+echo "Showing 1-5 out of 5 results"
+for NUM in 1 2 3 4 5
+do
+    echo "/store/mc/$(echo $2 | cut -d/ -f2)/file$NUM.root"
+done
+"""
+
+# The cross section is the number of input files, with 100 events per file, and jobs with broken files fail.
+# Each job of a sluggish dataset takes a second.
+# Jobs of a garbled dataset write their process ID, print a line that cannot be read, and then hang.
+CMSRUN = """#! /bin/sh
+shift
+case "$*" in
+    *Broken*) echo "Fatal Exception"; exit 65 ;;
+    *Sluggish*) sleep 1 ;;
+    *Garbled*) echo $$ >> $(dirname $0)/garbled.pid; echo "After filter: final cross section = lots pb"; sleep 30 ;;
+esac
+echo "Begin processing the 1st record"
+echo "Before Filter: total cross section = $#.000e+00 +- 1.000e-01 pb"
+echo "Filter efficiency (taking into account weights)= ($#00) / ($#00) = 1.000e+00 +- 0.000e+00"
+echo "Filter efficiency (event-level)= ($#00) / ($#00) = 1.000e+00 +- 0.000e+00    [TO BE USED IN MCM]"
+echo "After filter: final cross section = $#.000e+00 +- 1.000e-01 pb"
+"""
+
+LOG = """Begin processing the 1st record
+Before Filter: total cross section = 6.000e+04 +- 2.000e+02 pb
+Filter efficiency (event-level)= (150) / (300) = 5.000e-01 +- 1.000e-02    [TO BE USED IN MCM]
+After filter: final cross section = 3.000e+04 +- 1.000e+02 pb
+After filter: final fraction of events with negative weights = 1.592e-01 +- 9.143e-04
+Begin processing the 1st record
+Filter efficiency (event-level)= (50) / (100) = 5.000e-01 +- 1.000e-02    [TO BE USED IN MCM]
+After filter: final cross section = 3.400e+04 +- 2.000e+02 pb
+"""
+
+class TestGenXSec(unittest.TestCase):
+
+    cnf = os.environ.get('XSECCONF', os.path.join(os.path.dirname(__file__), 'my.cnf'))
+
+    def setUp(self):
+        connection.create_tables(self.cnf)
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.das_client = self.stub('das_client', DAS_CLIENT)
+        self.cmsrun = self.stub('cmsRun', CMSRUN)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def stub(self, name, contents):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'w') as output:
+            output.write(contents)
+        os.chmod(path, stat.S_IRWXU)
+        return path
+
+    def run_datasets(self, datasets, **kwargs):
+        return genxsec.run_datasets(datasets, workers=3, files_per_job=2,
+                                    cmsrun=self.cmsrun, das_client=self.das_client, **kwargs)
+
+    def test_names(self):
+        self.assertEqual(genxsec.cms_name('Proc+Cond-v1+MINIAODSIM'), '/Proc/Cond-v1/MINIAODSIM')
+        self.assertEqual(genxsec.sample_name('/Proc/Cond-v1/MINIAODSIM'), 'Proc')
+        self.assertEqual(genxsec.split_files(list(range(5)), 2), [[0, 1], [2, 3], [4]])
+
+    def test_parse(self):
+        """
+        Each job in a log is read, and jobs are weighted by their events
+        """
+
+        jobs = list(genxsec.parse_log(iter(LOG.split('\n'))))
+
+        self.assertEqual([(job['cross_section'], job['uncertainty'], job['events']) for job in jobs],
+                         [(30000.0, 100.0, 300), (34000.0, 200.0, 100)])
+
+        xs, uncert, events = genxsec.combine(jobs)
+        self.assertAlmostEqual(xs, 31000.0)
+        self.assertAlmostEqual(uncert, (300.0**2 * 100**2 + 100.0**2 * 200**2)**0.5/400)
+        self.assertEqual(events, 400)
+
+        # Without every number of events, jobs are weighted equally
+        jobs[1]['events'] = None
+        self.assertEqual(genxsec.combine(jobs)[::2], (32000.0, None))
+
+        self.assertEqual(list(genxsec.parse_log(['Nothing here'])), [])
+        self.assertRaises(genxsec.GenXSecError, list,
+                          genxsec.parse_log(['After filter: final cross section = nan? pb']))
+        self.assertRaises(genxsec.GenXSecError, genxsec.combine, [])
+
+    def test_read_logs(self):
+        log = os.path.join(self.tmpdir, 'job.log')
+        with open(log, 'w') as output:
+            output.write(LOG)
+
+        result = genxsec.read_logs('Logged+Cond+MINIAODSIM', [log])
+
+        self.assertEqual(result['sample'], 'Logged')
+        self.assertEqual(result['jobs'], 2)
+        self.assertEqual(result['events'], 400)
+        self.assertAlmostEqual(result['cross_section'], 31000.0)
+
+        self.assertEqual(genxsec.ingest([result], cnf=self.cnf, notifier=notify.NullNotifier()), ['Logged'])
+        self.assertAlmostEqual(reader.get_xsec('Logged', self.cnf), 31000.0)
+
+        # Logs without cross sections give an error instead of a result
+        empty = os.path.join(self.tmpdir, 'empty.log')
+        open(empty, 'w').close()
+        self.assertEqual(genxsec.read_logs('/Empty/Cond/MINIAODSIM', [empty])['error'], 'No jobs to combine')
+
+    def test_run(self):
+        """
+        Files are split into jobs, and failed datasets are reported without stopping the others
+        """
+
+        results = self.run_datasets(['/Good/Cond/MINIAODSIM', 'Broken+Cond+MINIAODSIM',
+                                     '/Empty/Cond/MINIAODSIM', '/Good/Cond/MINIAODSIM'])
+
+        self.assertEqual([result['dataset'] for result in results],
+                         ['/Good/Cond/MINIAODSIM', '/Broken/Cond/MINIAODSIM', '/Empty/Cond/MINIAODSIM'])
+
+        good, broken, empty = results
+
+        self.assertEqual(good['jobs'], 3)
+        self.assertEqual(good['error'], None)
+        self.assertEqual(good['events'], 500)
+        self.assertAlmostEqual(good['cross_section'], 1.8)
+        self.assertAlmostEqual(good['uncertainty'], 0.06)
+
+        self.assertEqual(broken['jobs'], 3)
+        self.assertTrue('exited with code 65' in broken['error'])
+        self.assertEqual(broken['cross_section'], None)
+
+        self.assertEqual(empty['error'], 'No files found')
+
+        # Only the good dataset goes into the database
+        self.assertEqual(genxsec.ingest(results, cnf=self.cnf, notifier=notify.NullNotifier()), ['Good'])
+        self.assertAlmostEqual(reader.get_xsec('Good', self.cnf), 1.8)
+        self.assertRaises(reader.NoMatchingDataset, reader.get_xsec, 'Broken', self.cnf)
+
+    def test_timeout(self):
+        results = self.run_datasets(['/Slow/Cond/MINIAODSIM', '/Fast/Cond/MINIAODSIM'], timeout=1)
+
+        self.assertTrue('timed out' in results[0]['error'])
+        self.assertEqual(results[1]['error'], None)
+
+        # Every job is quicker than the limit, but not all of them together
+        results = genxsec.run_datasets(['/Sluggish/Cond/MINIAODSIM'], workers=1, files_per_job=2, timeout=1.5,
+                                       cmsrun=self.cmsrun, das_client=self.das_client)
+
+        self.assertTrue('timed out after 1.5 seconds' in results[0]['error'])
+
+    def test_same_sample(self):
+        """
+        Datasets that would be the same sample are refused
+        """
+
+        self.assertRaises(genxsec.GenXSecError, self.run_datasets,
+                          ['/Good/CondA/MINIAODSIM', '/good/CondB/MINIAODSIM'])
+
+        log = os.path.join(self.tmpdir, 'log.txt')
+        with open(log, 'w') as output:
+            output.write(LOG)
+
+        results = [genxsec.read_logs('/Good/CondA/MINIAODSIM', [log]),
+                   genxsec.read_logs('/Good/CondB/MINIAODSIM', [log])]
+        self.assertRaises(genxsec.GenXSecError, genxsec.ingest, results,
+                          cnf=self.cnf, notifier=notify.NullNotifier())
+        self.assertRaises(reader.NoMatchingDataset, reader.get_xsec, 'Good', self.cnf)
+
+    def test_bad_output(self):
+        """
+        Jobs are stopped when their output cannot be read
+        """
+
+        results = self.run_datasets(['/Garbled/Cond/MINIAODSIM'])
+        self.assertTrue('Could not read cross section' in results[0]['error'])
+
+        with open(os.path.join(self.tmpdir, 'garbled.pid'), 'r') as pid_file:
+            pids = [int(line) for line in pid_file]
+
+        self.assertEqual(len(pids), 3)
+        for pid in pids:
+            self.assertRaises(OSError, os.kill, pid, 0)
+
+    def test_missing_executable(self):
+        results = genxsec.run_datasets(['/Good/Cond/MINIAODSIM'], das_client=os.path.join(self.tmpdir, 'fake'))
+
+        self.assertTrue('Could not run' in results[0]['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
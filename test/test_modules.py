@@ -7,12 +7,20 @@ Author: Daniel Abercrombie <dabercro@mit.edu>
 import os
 import sys
 import time
+import datetime
 import unittest
-import MySQLdb
+import threading
 import logging
 
 from CrossSecDB import inserter
 from CrossSecDB import reader
+from CrossSecDB import connection
+from CrossSecDB import cache
+from CrossSecDB import changes
+from CrossSecDB import history
+from CrossSecDB import notify
+from CrossSecDB import profiling
+from CrossSecDB import sampleindex
 
 logger = logging.getLogger(__name__)
 
@@ -24,21 +32,8 @@ class TestInsertRead(unittest.TestCase):
         """
         At the beginning of each test, start with a fresh database
         """
-        conn = MySQLdb.connect(read_default_file=self.cnf,
-                               read_default_group='mysql-crosssec-writer',
-                               db='cross_sections')
-
-        curs = conn.cursor()
-
-        # Quickly parse our .sql file to setup a database for tests
-        with open(os.path.join(os.path.dirname(__file__), '../db/cross_sections.sql'),'r') as sql_file:
-            for line in \
-                    ''.join([line.strip() for line in sql_file if line[:2] != '--']).split(';'):
-                if line:
-                    logger.debug('About to execute line:\n%s', line)
-                    curs.execute(line)
-
-        conn.close()
+        connection.create_tables(self.cnf)
+        sampleindex.clear()
 
     def test_defaults(self):
         """
@@ -88,6 +83,54 @@ class TestInsertRead(unittest.TestCase):
         """
         self.assertRaises(reader.NoMatchingDataset, reader.get_xsec, 'FakeDataset', cnf=self.cnf)
 
+    def test_chunked_lookup(self):
+        """
+        Make sure lookups spread over several queries come back in order,
+        and that every missing dataset is reported
+        """
+        samples = ['Test%i' % index for index in range(5)]
+        inserter.put_xsec(samples, [float(index + 1) for index in range(5)], 'test', cnf=self.cnf)
+
+        self.assertEqual(reader.get_xsec(list(reversed(samples)) + ['Test1'], cnf=self.cnf, chunk_size=2),
+                         [5.0, 4.0, 3.0, 2.0, 1.0, 2.0])
+
+        try:
+            reader.get_xsec(['Test0', 'Fake1', 'Test1', 'Fake2'], cnf=self.cnf, chunk_size=2)
+            self.fail('Missing datasets did not raise an exception')
+        except reader.NoMatchingDataset as err:
+            self.assertTrue('Fake1' in str(err))
+            self.assertTrue('Fake2' in str(err))
+
+    def test_lookup_case(self):
+        """
+        Sample names are not case sensitive, so the chunked query has to match names the same way
+        """
+        inserter.put_xsec(['TestCase1', 'TestCase2'], [1.0, 2.0], 'test', cnf=self.cnf)
+
+        self.assertEqual(reader.get_xsec('testcase1', cnf=self.cnf), 1.0)
+        self.assertEqual(reader.get_xsec(['TESTCASE2', 'TestCase1', 'testCase2'], cnf=self.cnf, chunk_size=2),
+                         [2.0, 1.0, 2.0])
+        self.assertEqual(reader.get_xsec(['testcase1'], cnf=self.cnf, energy=[13]),
+                         {('testcase1', 13): 1.0})
+
+    def test_update_case(self):
+        """
+        An update in a different case is still reported as an update, with the name that was given
+        """
+        class Recorder(notify.Notifier):
+            def notify(self, samples, cross_sections, uncertainties, updated, source, comments, energy):
+                self.updated = updated
+
+        recorder = Recorder()
+
+        inserter.put_xsec('TestCase', 1.0, 'test', cnf=self.cnf, notifier=recorder)
+        self.assertEqual(recorder.updated, set())
+
+        time.sleep(1)
+
+        inserter.put_xsec(['testcase', 'TestNew'], [2.0, 3.0], 'test', cnf=self.cnf, notifier=recorder)
+        self.assertEqual(recorder.updated, set(['testcase']))
+
     def test_mismatched_lists(self):
         """
         Make sure bad stuff happens when the list lengths don't match
@@ -107,10 +150,8 @@ class TestInsertRead(unittest.TestCase):
         """
         inserter.put_xsec('TestDataset', 10.0, 'test', 'Here is a comment', cnf=self.cnf)
 
-        conn = MySQLdb.connect(read_default_file=self.cnf,
-                               read_default_group='mysql-crosssec-reader',
-                               db='cross_sections')
-        curs = conn.cursor()
+        conn = connection.XSecConnection(cnf=self.cnf)
+        curs = conn.curs
         curs.execute('SELECT sample, cross_section, last_updated, source, comments FROM xs_13TeV')
 
         stored = curs.fetchone()
@@ -143,10 +184,8 @@ class TestInsertRead(unittest.TestCase):
 
         inserter.put_xsec('TestDataset', 11.0, 'test', cnf=self.cnf)
 
-        conn = MySQLdb.connect(read_default_file=self.cnf,
-                               read_default_group='mysql-crosssec-reader',
-                               db='cross_sections')
-        curs = conn.cursor()
+        conn = connection.XSecConnection(cnf=self.cnf)
+        curs = conn.curs
 
         curs.execute('SELECT sample, cross_section, source, comments FROM xs_13TeV_history ORDER BY last_updated DESC')
 
@@ -183,6 +222,10 @@ class TestInsertRead(unittest.TestCase):
         self.assertRaises(reader.InvalidDataset, reader.get_xsec, 'Invalid', cnf=self.cnf)
         self.assertRaises(reader.InvalidDataset, reader.get_xsec, ['Valid', 'Invalid'], cnf=self.cnf)
 
+        # With uncertainties, the zero is given back for the user to check
+        self.assertEqual(reader.get_xsec(['Valid', 'Invalid'], cnf=self.cnf, get_uncert=True),
+                         [(10.0, 0.0), (0.0, 0.0)])
+
     def test_history_dump(self):
         """
         Test the history dump
@@ -199,6 +242,260 @@ class TestInsertRead(unittest.TestCase):
         self.assertEqual(history['TestDataset'][0]['cross_section'], 11.0)
         self.assertEqual(history['TestDataset'][1]['cross_section'], 10.0)
 
+    def test_connection_pool(self):
+        """
+        Check that connections are reused and that dead ones are replaced
+        """
+        pool = connection.ConnectionPool(max_size=1)
+
+        with pool.connection(cnf=self.cnf) as conn:
+            first = conn
+
+        with pool.connection(cnf=self.cnf) as conn:
+            self.assertTrue(conn is first)
+            conn.curs.execute('SELECT COUNT(*) FROM xs_13TeV')
+            self.assertEqual(conn.curs.fetchone()[0], 0)
+
+        # Writers are kept separately from readers
+        with pool.connection(write=True, cnf=self.cnf) as conn:
+            self.assertFalse(conn is first)
+
+        # Kill the pooled connection behind the pool's back
+        first.conn.close()
+
+        with pool.connection(cnf=self.cnf) as conn:
+            self.assertFalse(conn is first)
+            conn.curs.execute('SELECT COUNT(*) FROM xs_13TeV')
+
+        pool.clear()
+
+    def test_connection_limit(self):
+        """
+        Check that max_open limits the connections in use, not just the idle ones
+        """
+        pool = connection.ConnectionPool(max_open=1, wait_timeout=0.1)
+
+        first = pool.acquire(cnf=self.cnf)
+        self.assertRaises(connection.PoolTimeout, pool.acquire, cnf=self.cnf)
+
+        # A waiting thread gets the connection once it is released
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(pool.acquire(cnf=self.cnf)))
+        pool.wait_timeout = 5
+        waiter.start()
+        pool.release(first)
+        waiter.join()
+
+        self.assertTrue(got[0] is first)
+
+        # Closing a connection frees its slot too
+        pool.release(got[0], broken=True)
+        second = pool.acquire(cnf=self.cnf)
+        self.assertFalse(second is first)
+        pool.release(second)
+
+        pool.clear()
+
+    def test_cache(self):
+        """
+        Check that cached reads are used, and that writes from this process invalidate them
+        """
+        xs_cache = cache.enable(max_size=2)
+
+        try:
+            # Fill the table without touching the history, so the update below is the only
+            # history entry of Test1, and does not collide with it in the same second
+            with connection.get_connection(write=True, cnf=self.cnf) as conn:
+                conn.curs.executemany(
+                    """
+                    INSERT INTO xs_13TeV (sample, cross_section, uncertainty, last_updated, source, comments)
+                    VALUES (%s, %s, 0.0, '2017-01-01 00:00:00', 'test', '')
+                    """, [('Test1', 10.0), ('Test2', 20.0)])
+                conn.conn.commit()
+
+            self.assertEqual(reader.get_xsec('Test1', cnf=self.cnf), 10.0)
+            self.assertEqual(reader.get_xsec('Test1', cnf=self.cnf), 10.0)
+            self.assertEqual(xs_cache.stats()['hits'], 1)
+
+            # Uncertainties are cached separately
+            self.assertEqual(reader.get_xsec('Test1', cnf=self.cnf, get_uncert=True), (10.0, 0.0))
+
+            inserter.put_xsec('Test1', 11.0, 'test', cnf=self.cnf)
+            self.assertEqual(reader.get_xsec('Test1', cnf=self.cnf), 11.0)
+
+            # Missing samples are remembered until they are written
+            self.assertRaises(reader.NoMatchingDataset, reader.get_xsec, 'Test3', cnf=self.cnf)
+            self.assertRaises(reader.NoMatchingDataset, reader.get_xsec, 'Test3', cnf=self.cnf)
+            inserter.put_xsec('Test3', 30.0, 'test', cnf=self.cnf)
+            self.assertEqual(reader.get_xsec('Test3', cnf=self.cnf), 30.0)
+
+            self.assertEqual(xs_cache.stats()['size'], 2)
+
+        finally:
+            cache.disable()
+
+    def test_cache_case(self):
+        """
+        A write with one case drops cached values read with any case
+        """
+        cache.enable()
+
+        try:
+            inserter.put_xsec('Test1', 1.0, 'test', cnf=self.cnf)
+            self.assertEqual(reader.get_xsec('test1', cnf=self.cnf), 1.0)
+
+            time.sleep(1)
+            inserter.put_xsec('TEST1', 2.0, 'test', cnf=self.cnf)
+            self.assertEqual(reader.get_xsec('test1', cnf=self.cnf), 2.0)
+            self.assertEqual(reader.get_xsec('Test1', cnf=self.cnf), 2.0)
+
+            self.assertRaises(reader.NoMatchingDataset, reader.get_xsec, 'new', cnf=self.cnf)
+            inserter.put_xsec('New', 3.0, 'test', cnf=self.cnf)
+            self.assertEqual(reader.get_xsec('new', cnf=self.cnf), 3.0)
+
+        finally:
+            cache.disable()
+
+    def test_profiling(self):
+        """
+        Check that statements, fetches, and function calls are recorded when profiling
+        """
+        events = []
+
+        profiler = profiling.enable()
+        profiler.add_callback(lambda kind, name, seconds, rows: events.append((kind, name)))
+
+        try:
+            samples = ['Test%i' % index for index in range(5)]
+            inserter.put_xsec(samples, [1.0] * 5, 'test', cnf=self.cnf)
+            reader.get_xsec(samples, cnf=self.cnf, chunk_size=2)
+
+            stats = profiler.stats()
+
+            # The chunks of the lookup are grouped under one statement
+            lookups = [stats['fetch'][name] for name in stats['fetch'] if name.startswith('SELECT sample, cross_section')]
+            self.assertEqual(len(lookups), 1)
+            self.assertEqual(lookups[0]['count'], 3)
+            self.assertEqual(lookups[0]['rows'], 5)
+            self.assertEqual(sum([count for _, count in lookups[0]['histogram']]), 3)
+
+            self.assertEqual(stats['call']['reader.get_xsec']['count'], 1)
+            self.assertEqual(stats['call']['reader.lookup_xsec']['count'], 1)
+            self.assertTrue(stats['call']['reader.get_xsec']['db_seconds'] <= stats['call']['reader.get_xsec']['seconds'])
+            self.assertTrue(('call', 'inserter.put_xsec') in events)
+            self.assertTrue('reader.get_xsec' in profiler.summary())
+
+            # Iterating over a cursor reads one row at a time, and is recorded as one fetch
+            with connection.get_connection(cnf=self.cnf) as conn:
+                conn.curs.execute('SELECT sample FROM xs_13TeV WHERE cross_section > 0')
+                rows = iter(conn.curs)
+                self.assertFalse(isinstance(rows, list))
+                self.assertEqual(len(list(rows)), 5)
+
+            iterated = profiler.stats()['fetch']['SELECT sample FROM xs_13TeV WHERE cross_section > 0']
+            self.assertEqual((iterated['count'], iterated['rows']), (1, 5))
+
+        finally:
+            profiling.disable()
+
+    def test_energies(self):
+        """
+        Look up many energies at once, with markers for missing and invalid cross sections
+        """
+        inserter.put_xsec(['Test1', 'Test2'], [10.0, 20.0], 'test', cnf=self.cnf, uncertainties=[1.0, 2.0])
+        inserter.put_xsec(['Test1', 'Test2'], [8.0, 0.0], 'test', cnf=self.cnf, energy=8)
+
+        output = reader.get_xsec(['Test1', 'Test2', 'Test3'], cnf=self.cnf, energy=[8, 13], chunk_size=2)
+
+        self.assertEqual(len(output), 6)
+        self.assertEqual(output[('Test1', 8)], 8.0)
+        self.assertEqual(output[('Test1', 13)], 10.0)
+        self.assertTrue(output[('Test2', 8)] is reader.INVALID)
+        self.assertEqual(output[('Test2', 13)], 20.0)
+        self.assertTrue(output[('Test3', 8)] is reader.MISSING)
+        self.assertTrue(output[('Test3', 13)] is reader.MISSING)
+
+        output = reader.get_xsec('test1', cnf=self.cnf, energy=[7, 13], get_uncert=True)
+        self.assertEqual(output, {('test1', 7): reader.MISSING, ('test1', 13): (10.0, 1.0)})
+
+        self.assertRaises(ValueError, reader.get_xsec, 'Test1', cnf=self.cnf, energy=[4, 13])
+
+    def test_changes(self):
+        """
+        The change feed gives every write in order, and continues from cursors
+        """
+        inserter.put_xsec(['Test1', 'Test2', 'Test3'], [1.0, 2.0, 3.0], 'test', cnf=self.cnf)
+        inserter.put_xsec(['Test1', 'Test2'], [8.0, 9.0], 'test', cnf=self.cnf, energy=8)
+
+        feed = list(changes.get_changes(cnf=self.cnf, page_size=2, lag=0))
+        self.assertEqual([(change['energy'], change['sample']) for change in feed],
+                         [(8, 'Test1'), (8, 'Test2'), (13, 'Test1'), (13, 'Test2'), (13, 'Test3')])
+
+        # Continuing from any cursor gives the rest of the feed
+        for index, change in enumerate(feed):
+            self.assertEqual(list(changes.get_changes(cursor=change['cursor'], cnf=self.cnf, page_size=2, lag=0)),
+                             feed[index + 1:])
+
+        self.assertEqual(len(list(changes.get_changes(cnf=self.cnf, energies=[13], lag=0))), 3)
+
+        last = feed[-1]['last_updated']
+        self.assertFalse(list(changes.get_changes(since=last, cnf=self.cnf, lag=0)))
+
+        time.sleep(2)
+        inserter.put_xsec('Test3', 4.0, 'test', cnf=self.cnf)
+
+        new = list(changes.get_changes(since=last, cnf=self.cnf, lag=0))
+        self.assertEqual([(change['sample'], change['cross_section']) for change in new], [('Test3', 4.0)])
+
+        self.assertRaises(changes.BadCursor, changes.get_changes, cursor='not a cursor', cnf=self.cnf)
+        self.assertRaises(ValueError, changes.get_changes, energies=[4], cnf=self.cnf)
+
+    def test_changes_late(self):
+        """
+        A write that commits after a later one has been read is not skipped
+        """
+        now = datetime.datetime.now().replace(microsecond=0)
+
+        def add_history(sample, seconds_ago):
+            with connection.get_connection(write=True, cnf=self.cnf) as conn:
+                conn.curs.execute(
+                    """
+                    INSERT INTO xs_13TeV_history (sample, cross_section, uncertainty, last_updated, source, comments)
+                    VALUES (%s, 1.0, 0.0, %s, 'test', '')
+                    """, (sample, now - datetime.timedelta(seconds=seconds_ago)))
+                conn.conn.commit()
+
+        add_history('Settled', 60)
+        add_history('Recent', 2)
+
+        feed = list(changes.get_changes(energies=[13], cnf=self.cnf, lag=10))
+        self.assertEqual([change['sample'] for change in feed], ['Settled'])
+
+        # Started before Recent, but only committed now
+        add_history('Late', 5)
+
+        self.assertEqual([change['sample'] for change in
+                          changes.get_changes(cursor=feed[-1]['cursor'], energies=[13], cnf=self.cnf, lag=0)],
+                         ['Late', 'Recent'])
+
+    def test_history_prefetch(self):
+        """
+        Histories are given out in order, skipping samples without any
+        """
+        samples = ['Test%i' % index for index in range(12)]
+        inserter.put_xsec(samples, [float(index) + 1 for index in range(12)], 'test', cnf=self.cnf)
+
+        prefetcher = history.HistoryPrefetcher(samples[:6] + ['Fake'] + samples[6:], cnf=self.cnf,
+                                               lookahead=3, chunk_size=2)
+
+        try:
+            output = [(index, sample, entries[0]['cross_section']) for index, sample, entries in prefetcher]
+        finally:
+            prefetcher.close()
+
+        self.assertEqual([sample for _, sample, _ in output], samples)
+        self.assertEqual(output[6], (7, 'Test6', 7.0))
+
     def test_uncertainties(self):
         """
         This is a test for the uncertainty fetching and retrieval.
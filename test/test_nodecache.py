@@ -0,0 +1,104 @@
+#! /usr/bin/env python
+
+"""
+Tests the refresher of the node-local cache, and following a replaced snapshot.
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import logging
+
+from CrossSecDB import connection
+from CrossSecDB import inserter
+from CrossSecDB import nodecache
+from CrossSecDB import notify
+from CrossSecDB import reader
+from CrossSecDB import snapshot
+
+logger = logging.getLogger(__name__)
+
+class TestNodeCache(unittest.TestCase):
+
+    cnf = os.environ.get('XSECCONF', os.path.join(os.path.dirname(__file__), 'my.cnf'))
+
+    def setUp(self):
+        connection.create_tables(self.cnf)
+
+        inserter.put_xsec(['Test1', 'Test2'], [10.0, 20.0], 'test', cnf=self.cnf, notifier=notify.NullNotifier())
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.tmpdir, 'xsec.snap')
+        self.refresher = nodecache.Refresher(self.file_name, [13], cnf=self.cnf)
+
+    def tearDown(self):
+        snapshot.disable()
+        shutil.rmtree(self.tmpdir)
+
+    def test_refresh(self):
+        """
+        The snapshot is only written again when the database changes
+        """
+
+        self.assertTrue(self.refresher.stale())
+        self.assertTrue(self.refresher.refresh())
+        self.assertFalse(self.refresher.stale())
+        self.assertFalse(self.refresher.refresh())
+
+        inserter.put_xsec('Test3', 30.0, 'test', cnf=self.cnf, notifier=notify.NullNotifier())
+
+        self.assertTrue(self.refresher.stale())
+        self.assertTrue(self.refresher.refresh())
+        self.assertFalse(self.refresher.stale())
+
+        # A different set of energies needs a new file too
+        self.assertTrue(nodecache.Refresher(self.file_name, [8, 13], cnf=self.cnf).stale())
+
+        # So does a broken file
+        with open(self.file_name, 'w') as output:
+            output.write('broken')
+        self.assertTrue(self.refresher.stale())
+
+    def test_follow(self):
+        """
+        Workers see a new snapshot, and lookups that already started keep the old one
+        """
+
+        self.refresher.refresh()
+        followed = snapshot.enable(self.file_name, check_interval=0)
+
+        old = followed.current()
+        self.assertEqual(reader.get_xsec(['Test1', 'Test2']), [10.0, 20.0])
+        self.assertRaises(reader.NoMatchingDataset, reader.get_xsec, 'Test3')
+
+        inserter.put_xsec('Test3', 30.0, 'test', cnf=self.cnf, notifier=notify.NullNotifier())
+        self.refresher.refresh()
+
+        self.assertEqual(reader.get_xsec('Test3'), 30.0)
+        self.assertFalse(followed.current() is old)
+        self.assertEqual(old.lookup_xsec(['Test1', 'Test3']), {'Test1': 10.0})
+
+        # A bad file does not replace a good snapshot
+        good = followed.current()
+        with open(self.file_name + '.new', 'w') as output:
+            output.write('broken')
+        os.rename(self.file_name + '.new', self.file_name)
+
+        self.assertTrue(followed.current() is good)
+        self.assertEqual(reader.get_xsec('Test3'), 30.0)
+
+    def test_interval(self):
+        self.refresher.refresh()
+        followed = snapshot.enable(self.file_name, check_interval=3600)
+
+        old = followed.current()
+        self.refresher.refresh(force=True)
+
+        self.assertTrue(followed.current() is old)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+#! /usr/bin/python
+
+"""
+Tests the notifiers with a stand-in for sendmail that writes to a file.
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import logging
+
+from CrossSecDB import notify
+
+logger = logging.getLogger(__name__)
+
+class TestNotify(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Make a fake sendmail that appends each message to a file
+        """
+        self.tmpdir = tempfile.mkdtemp()
+        self.mailbox = os.path.join(self.tmpdir, 'mailbox')
+
+        sendmail = os.path.join(self.tmpdir, 'sendmail')
+        with open(sendmail, 'w') as script:
+            script.write('#! /bin/sh\n\ncat >> %s\necho "---END---" >> %s\n' % (self.mailbox, self.mailbox))
+        os.chmod(sendmail, 0o755)
+
+        self.sender = notify.SendmailNotifier(emails=['test@example.com'], command=[sendmail, '-t'])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def messages(self):
+        if not os.path.exists(self.mailbox):
+            return []
+
+        with open(self.mailbox, 'r') as mailbox:
+            return [msg for msg in mailbox.read().split('---END---\n') if msg]
+
+    def test_sendmail(self):
+        """
+        Each notification is sent right away
+        """
+        self.sender.notify(['Test1', 'Test2'], [10.0, 20.0], [1.0, 2.0], ['Test2'],
+                           ['test', 'test'], ['', ''], 13)
+
+        messages = self.messages()
+        self.assertEqual(len(messages), 1)
+        self.assertTrue('NEW     Test1 ---> 10.0 +- 1.0' in messages[0])
+        self.assertTrue('UPDATED Test2 ---> 20.0 +- 2.0' in messages[0])
+        self.assertTrue('energy 13 TeV' in messages[0])
+
+    def test_case(self):
+        """
+        Updated samples are matched without regard to case, like in the database
+        """
+        self.sender.notify(['test1'], [10.0], [1.0], ['TEST1'], ['test'], [''], 13)
+
+        self.assertTrue('UPDATED test1 ---> 10.0 +- 1.0' in self.messages()[0])
+
+    def test_digest(self):
+        """
+        Notifications are collected into one message per energy
+        """
+        digest = notify.DigestNotifier(self.sender, interval=None)
+
+        digest.notify(['Test1'], [10.0], [0.0], [], ['first'], [''], 13)
+        digest.notify(['Test1', 'Test2'], [11.0, 20.0], [0.0, 0.0], ['Test1'], ['second', 'second'], ['', ''], 13)
+        digest.notify(['Test3'], [30.0], [0.0], [], ['other'], [''], 8)
+
+        self.assertEqual(self.messages(), [])
+
+        digest.flush()
+
+        messages = self.messages()
+        self.assertEqual(len(messages), 2)
+
+        # Energies are sent in order
+        self.assertTrue('NEW     Test3 ---> 30.0' in messages[0])
+        self.assertTrue('NEW     Test1 ---> 11.0' in messages[1])
+        self.assertTrue('NEW     Test2 ---> 20.0' in messages[1])
+        self.assertTrue('first' in messages[1] and 'second' in messages[1])
+
+        # Nothing left to send
+        digest.close()
+        self.assertEqual(len(self.messages()), 2)
+
+    def test_digest_failure(self):
+        """
+        A digest that fails to send is kept, and sent with later notifications
+        """
+        class FlakySender(object):
+            def __init__(self):
+                self.sent = []
+                self.fail = True
+
+            def send(self, entries, users, sources, comments, energy):
+                if self.fail:
+                    raise OSError('sendmail is broken')
+                self.sent.append((entries, sources, energy))
+
+        sender = FlakySender()
+        digest = notify.DigestNotifier(sender, interval=None)
+        self.assertTrue(digest in notify._OPEN)
+
+        digest.notify(['Test1'], [10.0], [0.0], [], ['first'], [''], 13)
+        self.assertRaises(OSError, digest.flush)
+
+        digest.notify(['Test1', 'Test2'], [11.0, 20.0], [0.0, 0.0], ['Test1'], ['second', 'second'], ['', ''], 13)
+
+        sender.fail = False
+        digest.close()
+
+        self.assertEqual(sender.sent, [([('Test1', 11.0, 0.0, False), ('Test2', 20.0, 0.0, False)],
+                                        ['first', 'second'], 13)])
+
+        # Closed notifiers are not kept for the end of the process
+        self.assertFalse(digest in notify._OPEN)
+
+    def test_sendmail_failure(self):
+        """
+        A digest is kept when sendmail exits with an error
+        """
+        sendmail = os.path.join(self.tmpdir, 'broken_sendmail')
+        with open(sendmail, 'w') as script:
+            script.write('#! /bin/sh\n\ncat > /dev/null\nexit 75\n')
+        os.chmod(sendmail, 0o755)
+
+        old_command = os.environ.get('XSECSENDMAIL')
+        os.environ['XSECSENDMAIL'] = sendmail
+        try:
+            sender = notify.SendmailNotifier(emails=['test@example.com'])
+        finally:
+            if old_command is None:
+                del os.environ['XSECSENDMAIL']
+            else:
+                os.environ['XSECSENDMAIL'] = old_command
+
+        digest = notify.DigestNotifier(sender, interval=None)
+        digest.notify(['Test1'], [10.0], [0.0], [], ['test'], [''], 13)
+        self.assertRaises(OSError, digest.flush)
+
+        # Now it works, and the digest is still there to send
+        with open(sendmail, 'w') as script:
+            script.write('#! /bin/sh\n\ncat >> %s\necho "---END---" >> %s\n' % (self.mailbox, self.mailbox))
+
+        digest.close()
+
+        messages = self.messages()
+        self.assertEqual(len(messages), 1)
+        self.assertTrue('NEW     Test1 ---> 10.0' in messages[0])
+
+    def test_null(self):
+        """
+        The null notifier sends nothing
+        """
+        notify.NullNotifier().notify(['Test1'], [10.0], [0.0], [], ['test'], [''], 13)
+        self.assertEqual(self.messages(), [])
+
+
+if __name__ == '__main__':
+
+    if len(sys.argv) > 1:
+        logging.basicConfig(level=logging.DEBUG)
+
+    unittest.main()
@@ -38,6 +38,29 @@ export QUERY_STRING="sample=TestDataset&energy=8"
 RESULT=`php -r 'parse_str($_SERVER["QUERY_STRING"], $_GET); include "$_SERVER['INDEX_SCRIPT']";'`
 test "$RESULT" = "36.5" || ERRORS=$((ERRORS + 1))
 
+# Ask for many samples at once
+put_xs.py "test" TestDataset2 20.0+-2.0
+export QUERY_STRING="samples=TestDataset,FakeDataset,TestDataset2&format=text"
+RESULT=`php -r 'parse_str($_SERVER["QUERY_STRING"], $_GET); include "$_SERVER['INDEX_SCRIPT']";'`
+test "$RESULT" = "`printf '45.5\nERROR: cross section missing for FakeDataset at energy 13 TeV.\n20'`" || ERRORS=$((ERRORS + 1))
+
+# Names in a different case than stored are still found
+export QUERY_STRING="samples=testdataset,TESTDATASET2&format=text"
+RESULT=`php -r 'parse_str($_SERVER["QUERY_STRING"], $_GET); include "$_SERVER['INDEX_SCRIPT']";'`
+test "$RESULT" = "`printf '45.5\n20'`" || ERRORS=$((ERRORS + 1))
+
+# A cross section of zero is not the same as a missing sample
+put_xs.py "test" InvalidDataset 0.0
+export QUERY_STRING="samples=InvalidDataset,FakeDataset&format=text"
+RESULT=`php -r 'parse_str($_SERVER["QUERY_STRING"], $_GET); include "$_SERVER['INDEX_SCRIPT']";'`
+test "$RESULT" = "`printf 'ERROR: Dataset InvalidDataset is invalid! (cross section = 0)\nERROR: cross section missing for FakeDataset at energy 13 TeV.'`" || ERRORS=$((ERRORS + 1))
+
+# The default is JSON, with uncertainties and errors
+export QUERY_STRING="samples[]=TestDataset2&samples[]=FakeDataset"
+RESULT=`php -r 'parse_str($_SERVER["QUERY_STRING"], $_GET); include "$_SERVER['INDEX_SCRIPT']";'`
+echo $RESULT | grep '"sample":"TestDataset2","cross_section":20' > /dev/null || ERRORS=$((ERRORS + 1))
+echo $RESULT | grep '"sample":"FakeDataset","cross_section":null,"uncertainty":null,"error":"missing"' > /dev/null || ERRORS=$((ERRORS + 1))
+
 # Check that we still get webpage for sample
 export QUERY_STRING="sample=TestDataset&browse=true"
 PAGE=`php -r 'parse_str($_SERVER["QUERY_STRING"], $_GET); include "$_SERVER['INDEX_SCRIPT']";'`
@@ -0,0 +1,134 @@
+#! /usr/bin/env python
+
+"""
+Tests the in-memory index of sample names.
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import os
+import re
+import time
+import unittest
+import logging
+
+from CrossSecDB import connection
+from CrossSecDB import inserter
+from CrossSecDB import notify
+from CrossSecDB import profiling
+from CrossSecDB import reader
+from CrossSecDB import sampleindex
+
+logger = logging.getLogger(__name__)
+
+class TestSampleIndex(unittest.TestCase):
+
+    cnf = os.environ.get('XSECCONF', os.path.join(os.path.dirname(__file__), 'my.cnf'))
+
+    def setUp(self):
+        connection.create_tables(self.cnf)
+        sampleindex.clear()
+
+        self.put(['DM_Mphi-100_Mchi-1', 'DM_Mphi-1000_Mchi-1', 'dm_lower', 'TTJets', 'WJets_HT-100', 'Under_score'])
+
+    def put(self, samples):
+        inserter.put_xsec(samples, [1.0] * len(samples), 'test', cnf=self.cnf, notifier=notify.NullNotifier())
+
+    def test_kinds(self):
+        index = sampleindex.get_index(self.cnf)
+
+        self.assertEqual(len(index), 6)
+        self.assertEqual(index.prefix('dm_'), ['dm_lower', 'DM_Mphi-1000_Mchi-1', 'DM_Mphi-100_Mchi-1'])
+        self.assertEqual(index.like('DM\\_Mphi-100\\_%'), ['DM_Mphi-100_Mchi-1'])
+        self.assertEqual(index.like('%Jets%'), ['TTJets', 'WJets_HT-100'])
+        self.assertEqual(index.like('Under_score'), ['Under_score'])
+        self.assertEqual(index.like('Under\\_scor_'), ['Under_score'])
+        self.assertEqual(index.glob('DM_Mphi-1??_*'), ['DM_Mphi-100_Mchi-1'])
+        self.assertEqual(index.glob('*jets*'), ['TTJets', 'WJets_HT-100'])
+        self.assertEqual(index.regex('^DM_Mphi-10+_'), ['DM_Mphi-1000_Mchi-1', 'DM_Mphi-100_Mchi-1'])
+        self.assertEqual(index.regex('^D?M_'), ['DM_Mphi-1000_Mchi-1', 'DM_Mphi-100_Mchi-1'])
+        self.assertEqual(index.regex('HT-\\d+$'), ['WJets_HT-100'])
+
+        self.assertRaises(re.error, index.regex, '(')
+        self.assertRaises(ValueError, index.match, 'DM%', 'sql')
+
+    def test_reader(self):
+        """
+        Results are sorted and have no repeats, even though the history table does
+        """
+
+        # History has one entry per second for each sample
+        time.sleep(1)
+        self.put(['TTJets'])
+        self.assertEqual(reader.get_samples_like(['TT%', '%Jets%'], cnf=self.cnf), ['TTJets', 'WJets_HT-100'])
+        self.assertEqual(reader.get_samples_like('dm*', cnf=self.cnf, kind='glob'),
+                         ['dm_lower', 'DM_Mphi-1000_Mchi-1', 'DM_Mphi-100_Mchi-1'])
+
+    def test_refresh(self):
+        """
+        After the first read, only new samples are read from the database
+        """
+
+        index = sampleindex.get_index(self.cnf)
+        self.assertEqual(index.prefix('New'), [])
+
+        time.sleep(1)
+
+        profiler = profiling.enable()
+        try:
+            self.put(['New1', 'TTJets'])
+            self.assertTrue(sampleindex.get_index(self.cnf) is index)
+            self.assertEqual(index.prefix('New'), ['New1'])
+            self.assertEqual(len(index), 7)
+
+            statements = [name for name in profiler.stats()['execute'] if 'DISTINCT' in name]
+            self.assertEqual(len(statements), 1)
+            self.assertTrue('last_updated >=' in statements[0])
+
+            # Without a change, the database is only asked for the version
+            self.assertEqual(sampleindex.get_index(self.cnf).prefix('New'), ['New1'])
+            self.assertEqual(len([name for name in profiler.stats()['execute'] if 'DISTINCT' in name]), 1)
+
+        finally:
+            profiling.disable()
+
+        # The current table and the history table have separate indexes
+        self.assertEqual(len(sampleindex.get_index(self.cnf, history=False)), 7)
+
+    def add_history(self, sample, last_updated):
+        with connection.get_connection(write=True, cnf=self.cnf) as conn:
+            conn.curs.execute(
+                """
+                INSERT INTO xs_13TeV_history (sample, cross_section, uncertainty, last_updated, source, comments)
+                VALUES (%s, 1.0, 0.0, %s, 'test', '')
+                """, (sample, last_updated))
+            conn.conn.commit()
+
+    def test_late_commit(self):
+        """
+        A sample written with a time before the latest one already seen is still found
+        """
+
+        self.add_history('Old', '2017-01-01 00:00:00')
+
+        index = sampleindex.get_index(self.cnf)
+        self.assertEqual(len(index), 7)
+
+        # Between the first and last times, so only the number of rows changes
+        self.add_history('Late', '2017-06-01 00:00:00')
+
+        self.assertEqual(sampleindex.get_index(self.cnf).prefix('Late'), ['Late'])
+        self.assertEqual(len(index), 8)
+
+    def test_large(self):
+        samples = ['Sample_%05i' % index for index in range(5000)]
+        for chunk in connection.chunks(samples, 1000):
+            self.put(chunk)
+
+        index = sampleindex.get_index(self.cnf)
+        self.assertEqual(index.like('Sample\\_0012_'), ['Sample_%05i' % num for num in range(120, 130)])
+        self.assertEqual(len(index.glob('sample_*')), 5000)
+
+
+if __name__ == '__main__':
+    unittest.main()
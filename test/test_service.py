@@ -0,0 +1,122 @@
+#! /usr/bin/python
+
+"""
+Tests the WSGI read service by calling the application directly.
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import os
+import sys
+import json
+import time
+import unittest
+import logging
+
+from wsgiref.util import setup_testing_defaults
+
+from CrossSecDB import connection
+from CrossSecDB import inserter
+from CrossSecDB import sampleindex
+from CrossSecDB import service
+
+logger = logging.getLogger(__name__)
+
+class TestService(unittest.TestCase):
+
+    cnf = os.environ.get('XSECCONF', os.path.join(os.path.dirname(__file__), 'my.cnf'))
+
+    def setUp(self):
+        """
+        At the beginning of each test, start with a fresh database
+        """
+        connection.create_tables(self.cnf)
+        sampleindex.clear()
+
+        self.app = service.XSecService(cnf=self.cnf, version_ttl=0)
+
+    def get(self, path, query='', **headers):
+        """
+        Make a request to the service and return the status, headers, and parsed body
+        """
+        environ = {'PATH_INFO': path, 'QUERY_STRING': query}
+        environ.update(headers)
+        setup_testing_defaults(environ)
+
+        response = {}
+        def start_response(status, headers):
+            response['status'] = status
+            response['headers'] = dict(headers)
+
+        body = b''.join(self.app(environ, start_response))
+
+        return response['status'], response['headers'], json.loads(body.decode('utf-8')) if body else None
+
+    def test_xsec(self):
+        """
+        Lookups give each sample back in order, with errors for missing ones
+        """
+        inserter.put_xsec(['Test1', 'Test2'], [10.0, 20.0], 'test', cnf=self.cnf, uncertainties=[1.0, 2.0])
+
+        status, _, body = self.get('/xsec', 'samples=Test2,Fake&sample=Test1')
+
+        self.assertEqual(status, '200 OK')
+        self.assertEqual([(entry['sample'], entry['cross_section'], entry['uncertainty'], entry['error'])
+                          for entry in body['results']],
+                         [('Test2', 20.0, 2.0, None), ('Fake', None, None, 'missing'), ('Test1', 10.0, 1.0, None)])
+
+        self.assertEqual(self.get('/xsec', 'samples=Test1&energy=4')[0], '400 Bad Request')
+        self.assertEqual(self.get('/nothing')[0], '404 Not Found')
+
+    def test_conditional(self):
+        """
+        Clients get a 304 until the table changes
+        """
+        inserter.put_xsec('Test1', 10.0, 'test', cnf=self.cnf)
+
+        status, headers, _ = self.get('/xsec', 'samples=Test1')
+        self.assertEqual(status, '200 OK')
+
+        status, _, _ = self.get('/xsec', 'samples=Test1', HTTP_IF_NONE_MATCH=headers['ETag'])
+        self.assertEqual(status, '304 Not Modified')
+
+        # Times only have a precision of one second, so they are not enough to skip a response
+        status, _, _ = self.get('/xsec', 'samples=Test1', HTTP_IF_MODIFIED_SINCE=headers['Last-Modified'])
+        self.assertEqual(status, '200 OK')
+
+        time.sleep(2)
+        inserter.put_xsec('Test1', 11.0, 'test', cnf=self.cnf)
+
+        status, _, body = self.get('/xsec', 'samples=Test1', HTTP_IF_NONE_MATCH=headers['ETag'])
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(body['results'][0]['cross_section'], 11.0)
+
+    def test_history_and_like(self):
+        """
+        The other reader functions are available too
+        """
+        inserter.put_xsec(['Like1', 'Like2'], [1.0, 2.0], 'test', cnf=self.cnf)
+
+        status, _, body = self.get('/like', 'pattern=Like%')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(sorted(body), ['Like1', 'Like2'])
+
+        status, _, body = self.get('/like', 'pattern=like*&pattern=Like2&kind=glob')
+        self.assertEqual(body, ['Like1', 'Like2'])
+
+        status, _, body = self.get('/like', 'pattern=(&kind=regex')
+        self.assertEqual(status, '400 Bad Request')
+
+        status, _, body = self.get('/history', 'samples=Like1')
+        self.assertEqual(body['Like1'][0]['cross_section'], 1.0)
+
+        status, _, body = self.get('/history', 'samples=Like1&archive=1')
+        self.assertEqual(len(body['Like1']), 1)
+
+
+if __name__ == '__main__':
+
+    if len(sys.argv) > 1:
+        logging.basicConfig(level=logging.DEBUG)
+
+    unittest.main()
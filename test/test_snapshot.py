@@ -0,0 +1,103 @@
+#! /usr/bin/env python
+
+"""
+Tests offline snapshots.
+
+Author: Daniel Abercrombie <dabercro@mit.edu>
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import logging
+
+from CrossSecDB import connection
+from CrossSecDB import inserter
+from CrossSecDB import notify
+from CrossSecDB import reader
+from CrossSecDB import snapshot
+
+logger = logging.getLogger(__name__)
+
+class TestSnapshot(unittest.TestCase):
+
+    cnf = os.environ.get('XSECCONF', os.path.join(os.path.dirname(__file__), 'my.cnf'))
+
+    def setUp(self):
+        connection.create_tables(self.cnf)
+
+        inserter.put_xsec(['Test1', 'Test2', 'Invalid'], [10.0, 20.0, 0.0], 'test', cnf=self.cnf,
+                          uncertainties=[1.0, 2.0, 0.0], notifier=notify.NullNotifier())
+        inserter.put_xsec('Test1', 5.0, 'test', cnf=self.cnf, energy=8, notifier=notify.NullNotifier())
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.tmpdir, 'xsec.snap')
+
+    def tearDown(self):
+        snapshot.disable()
+        shutil.rmtree(self.tmpdir)
+
+    def test_export(self):
+        self.assertEqual(snapshot.export(self.file_name, [8, 13], cnf=self.cnf), {8: 1, 13: 3})
+
+        with snapshot.Snapshot(self.file_name) as snap:
+            self.assertEqual(snap.energies, [8, 13])
+            self.assertEqual(snap.version(13), reader.get_table_version(self.cnf, 13))
+            self.assertEqual(sorted(snap.samples(13)), ['Invalid', 'Test1', 'Test2'])
+
+            self.assertEqual(snap.lookup_xsec(['Test2', 'test1', 'Fake'], get_uncert=True),
+                             {'Test2': (20.0, 2.0), 'test1': (10.0, 1.0)})
+            self.assertEqual(snap.lookup_xsec_energies(['Test1', 'Test2'], [8, 13]),
+                             {('Test1', 8): 5.0, ('Test1', 13): 10.0, ('Test2', 13): 20.0})
+
+            self.assertRaises(snapshot.SnapshotError, snap.lookup_xsec, ['Test1'], 7)
+
+    def test_reader(self):
+        """
+        While a snapshot is enabled, the reader does not need the database
+        """
+
+        snapshot.export(self.file_name, cnf=self.cnf)
+        snapshot.enable(self.file_name)
+
+        inserter.put_xsec('New', 30.0, 'test', cnf=self.cnf, notifier=notify.NullNotifier())
+
+        self.assertEqual(reader.get_xsec(['Test1', 'Test2'], cnf='/does/not/exist.db'), [10.0, 20.0])
+        self.assertEqual(reader.get_xsec('Test1', energy=[8, 13]), {('Test1', 8): 5.0, ('Test1', 13): 10.0})
+
+        self.assertRaises(reader.NoMatchingDataset, reader.get_xsec, 'New', self.cnf)
+        self.assertRaises(reader.InvalidDataset, reader.get_xsec, 'Invalid')
+
+        snapshot.disable()
+        self.assertEqual(reader.get_xsec('New', cnf=self.cnf), 30.0)
+
+    def test_cases(self):
+        """
+        Samples that only differ by case match exactly first, and many samples are all found
+        """
+
+        samples = ['sample_%i' % index for index in range(1000)] + ['Case', 'CASE']
+        snapshot.write_snapshot(self.file_name, {13: [(sample, float(index + 1), 0.5)
+                                                      for index, sample in enumerate(samples)]})
+
+        with snapshot.Snapshot(self.file_name) as snap:
+            self.assertEqual(snap.size(), 1002)
+            self.assertEqual(snap.version(), (None, 0))
+            self.assertEqual(snap.lookup_xsec(samples), dict([(sample, float(index + 1))
+                                                              for index, sample in enumerate(samples)]))
+            self.assertEqual(snap.lookup_xsec(['Case', 'CASE']), {'Case': 1001.0, 'CASE': 1002.0})
+            self.assertTrue(snap.lookup_xsec(['case'])['case'] in [1001.0, 1002.0])
+
+    def test_bad_file(self):
+        with open(self.file_name, 'w') as output:
+            output.write('not a snapshot at all')
+
+        self.assertRaises(snapshot.SnapshotError, snapshot.Snapshot, self.file_name)
+
+        open(self.file_name, 'w').close()
+        self.assertRaises(snapshot.SnapshotError, snapshot.Snapshot, self.file_name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,11 +9,32 @@ ini_set('display_startup_errors', 1);
 error_reporting(E_ALL);
 mysqli_report(MYSQLI_REPORT_STRICT);
 
+// Parameters for bulk requests can be sent with POST or GET
+
+function get_param($name, $default) {
+
+  if (isset($_POST[$name]))
+    return $_POST[$name];
+
+  return isset($_GET[$name]) ? $_GET[$name] : $default;
+
+}
+
+// Many samples can be asked for at once with "samples",
+// either as an array or as a list separated by commas or whitespace
+
+$samples = get_param('samples', NULL);
+if ($samples !== NULL && ! is_array($samples))
+  $samples = preg_split('/[\s,]+/', $samples, -1, PREG_SPLIT_NO_EMPTY);
+
+$bulk = $samples !== NULL;
+$format = get_param('format', 'json');
+
 // Get the parameters and take a guess whether or not this is in a browser
 
 $sample = isset($_GET['sample']) ? $_GET['sample'] : '';
-$inbrowser = isset($_GET['browse']) || $sample === '';
-$energy = isset($_GET['energy']) ? $_GET['energy'] : '13';
+$inbrowser = ! $bulk && (isset($_GET['browse']) || $sample === '');
+$energy = get_param('energy', '13');
 $history = isset($_GET['history']);
 
 // Make sure we use a valid table
@@ -64,6 +85,72 @@ if ($inbrowser) {
 
   include 'body.html';
 
+} elseif ($bulk) {
+
+  // Get all the samples with one query for each chunk
+
+  $found = array();
+
+  foreach (array_chunk(array_values(array_unique($samples)), 500) as $chunk) {
+
+    $quoted = array();
+    foreach ($chunk as $to_quote)
+      array_push($quoted, "'" . $conn->real_escape_string($to_quote) . "'");
+
+    $result = $conn->query('SELECT sample, cross_section, uncertainty FROM ' . $table .
+                           ' WHERE sample IN (' . implode(', ', $quoted) . ')');
+
+    // Sample names are not case sensitive in the database, so match them the same way
+    while($row = $result->fetch_assoc())
+      $found[strtolower($row['sample'])] = $row;
+
+  }
+
+  // Give results back in the order they were asked for
+
+  $output = array();
+
+  foreach ($samples as $to_output) {
+
+    $entry = array('sample' => $to_output, 'cross_section' => NULL, 'uncertainty' => NULL, 'error' => NULL);
+
+    $key = strtolower($to_output);
+
+    if (! isset($found[$key]))
+      $entry['error'] = 'missing';
+    else {
+      $entry['cross_section'] = (float) $found[$key]['cross_section'];
+      $entry['uncertainty'] = (float) $found[$key]['uncertainty'];
+      if (! $entry['cross_section'])
+        $entry['error'] = 'invalid';
+    }
+
+    array_push($output, $entry);
+
+  }
+
+  if ($format === 'text') {
+
+    // One line per sample, just like a series of single sample requests
+
+    header('Content-Type: text/plain');
+
+    foreach ($output as $entry) {
+      if ($entry['error'] === NULL)
+        echo $entry['cross_section'] . "\n";
+      elseif ($entry['error'] === 'invalid')
+        printf("ERROR: Dataset %s is invalid! (cross section = 0)\n", $entry['sample']);
+      else
+        printf("ERROR: cross section missing for %s at energy %s TeV.\n", $entry['sample'], $energy);
+    }
+
+  } else {
+
+    header('Content-Type: application/json');
+    echo json_encode(array('energy' => (int) $energy, 'results' => $output));
+
+  }
+
 } else {
 
   // Get single sample, and return it